@@ -1,16 +1,15 @@
 import discord
 from src.bot.bot import DiscordBot
+from src.bot.config_store import ConfigStore
 import os
 from dotenv import load_dotenv
-import json
 
-config_path = 'config.json'
-
-with open(config_path, 'r', encoding='utf-8') as file:
-    config = json.load(file)
+config = ConfigStore('config.json')
 
 load_dotenv("./.env")
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
+#number of shards recommended by discord is used when not set
+SHARD_COUNT = os.getenv('SHARD_COUNT')
 
 intents = discord.Intents.default()
 intents.messages = True
@@ -18,6 +17,6 @@ intents.guilds = True
 intents.members = True
 intents.message_content = True
 
-bot = DiscordBot(command_prefix='!', intents=intents, config=config, config_path=config_path)
+bot = DiscordBot(command_prefix='!', intents=intents, config=config, shard_count=int(SHARD_COUNT) if SHARD_COUNT else None)
 
 bot.run(DISCORD_TOKEN)
\ No newline at end of file
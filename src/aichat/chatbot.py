@@ -1,32 +1,130 @@
-from openai import OpenAI
-import os 
+from openai import AsyncOpenAI
+import os
+import time
 from pathlib import Path
 from dotenv import load_dotenv
+from .response_cache import ResponseCache
+from .router import ModelRouter
+from ..monitoring.metrics import AI_SECONDS
 
 class AiChat():
-    def __init__(self):
+
+    PROMPT_TEMPLATE = "{query}. Use max of 1500 characters in response"
+
+    def __init__(self, cache: ResponseCache = None):
+        """
+        Models are read from .env: AI_BASE_URL of openai compatible api, AI_MODELS as comma separated list
+        and AI_HEDGE_AFTER seconds after which slow request is hedged with next model
+
+        :param cache: cache of responses, responses are not cached when None
+        :type cache: ResponseCache
+        """
         #gets path to .env file
         env_path = Path(__file__).resolve().parent.parent / '.env'
         load_dotenv(dotenv_path=env_path)
 
         self.APIKEY = os.getenv('AI_API_KEY')
 
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+        models = [model.strip() for model in os.getenv('AI_MODELS', "deepseek/deepseek-r1:free").split(',') if model.strip()]
+
+        #async client, requests never block event loop, with more models failed request goes to next model instead of retry
+        self.client = AsyncOpenAI(
+            base_url=os.getenv('AI_BASE_URL', "https://openrouter.ai/api/v1"),
             api_key=self.APIKEY,
+            max_retries=0 if len(models) > 1 else 2
         )
+        self.router = ModelRouter(self.client, models, hedge_after=float(os.getenv('AI_HEDGE_AFTER', 3)))
+        self.cache = cache
 
-    async def get_response(self, query):
-        completion = self.client.chat.completions.create(
-            model="deepseek/deepseek-r1:free",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f'{query}. Use max of 1500 characters in response'
-                }
-            ]
-        )
+    async def stream_response(self, query, use_cache: bool = True, history: list[dict] = None):
+        """
+        Streams response of model, cached response is returned as one part
+
+        :param query: question of user
+        :type query: str
+        :param use_cache: if False cached response is not read, new response is still cached
+        :type use_cache: bool
+        :param history: earlier messages of conversation, responses with history are not cached
+        :type history: list[dict]
+        :return: async generator of text parts as they arrive
+        """
+        #answer depends on conversation, so it can not be shared through cache
+        cacheable = self.cache is not None and not history
+
+        start = time.perf_counter()
+
+        if cacheable and use_cache:
+            response = await self.cache.get(query, self.router.name, self.PROMPT_TEMPLATE)
+            if response is not None:
+                AI_SECONDS.labels(source="cache").observe(time.perf_counter() - start)
+                yield response
+                return
+
+        messages = list(history or []) + [
+            {
+                "role": "user",
+                "content": self.PROMPT_TEMPLATE.format(query=query)
+            }
+        ]
+
+        parts = []
+        try:
+            async for part in self.router.stream(messages):
+                parts.append(part)
+                yield part
+        except Exception:
+            AI_SECONDS.labels(source="error").observe(time.perf_counter() - start)
+            raise
+        AI_SECONDS.labels(source="model").observe(time.perf_counter() - start)
+
+        #only complete responses are cached
+        if cacheable and parts:
+            await self.cache.put(query, self.router.name, self.PROMPT_TEMPLATE, "".join(parts))
+
+    async def get_response(self, query, use_cache: bool = True):
+        """
+        Gets whole response of model
+
+        :param query: question of user
+        :type query: str
+        :param use_cache: if False cached response is not read
+        :type use_cache: bool
+        :return: response
+        :rtype: str
+        """
+        parts = []
+        async for part in self.stream_response(query, use_cache):
+            parts.append(part)
+
+        return "".join(parts)
+
+    async def summarize(self, text: str, max_tokens: int) -> str:
+        """
+        Summarizes conversation, used by conversation memory to compact older turns
+
+        :param text: turns of conversation
+        :type text: str
+        :param max_tokens: max length of summary in tokens
+        :type max_tokens: int
+        :return: summary
+        :rtype: str
+        """
+        messages = [
+            {
+                "role": "user",
+                "content": f"Summarize the conversation below in at most {max_tokens * 3 // 4} words, "
+                           f"keep facts needed to answer follow-up questions.\n\n{text}"
+            }
+        ]
+
+        parts = []
+        async for part in self.router.stream(messages):
+            parts.append(part)
 
-        response = completion.choices[0].message.content
+        return "".join(parts).strip()
 
-        return response
\ No newline at end of file
+    async def close(self):
+        """
+        Closes http client
+        """
+        await self.client.close()
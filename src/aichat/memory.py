@@ -0,0 +1,225 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from ..database.pool import DatabasePool, get_pool
+from ..monitoring.metrics import register_queries
+
+@dataclass
+class Conversation:
+    """
+    Context of one conversation
+
+    :param summary: summary of compacted older turns
+    :type summary: str
+    :param turns: newest turns as [question, answer] lists
+    :type turns: list[list[str]]
+    """
+    summary: str = ""
+    turns: list[list[str]] = field(default_factory=list)
+
+class ConversationMemory:
+    """
+    Conversation memory of /ask kept per user or per channel with hard token budget.
+
+    When summary and turns of conversation are over max_tokens, older half of turns is compacted
+    into summary by summarize callback, so prompt never grows over budget however long conversation is.
+    At most max_conversations conversations are kept in memory, least recently used are dropped
+    and conversations idle for idle_ttl seconds are forgotten. With persistent memory conversations
+    are saved to ai_conversations table and loaded from it after eviction or restart.
+    Tokens are estimated as 4 characters per token.
+    """
+
+    #persistent idle conversations are deleted after this many saves
+    CLEANUP_EVERY = 100
+
+    def __init__(self, summarize, pool: DatabasePool = None, *, persistent: bool = False, max_tokens: int = 1500,
+                 max_conversations: int = 1000, idle_ttl: float = 86400):
+        """
+        :param summarize: async function (text, max_tokens) -> summary
+        :type summarize: Callable
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param persistent: if conversations are saved in Postgres
+        :type persistent: bool
+        :param max_tokens: budget of summary and turns sent with question
+        :type max_tokens: int
+        :param max_conversations: max number of conversations in memory
+        :type max_conversations: int
+        :param idle_ttl: seconds after which idle conversation is forgotten
+        :type idle_ttl: float
+        """
+        self.summarize = summarize
+        self.persistent = persistent
+        self.pool = (pool if pool is not None else get_pool()) if persistent else None
+        self.max_tokens = max_tokens
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+
+        #(scope, id) -> (last use time, conversation)
+        self.conversations = OrderedDict()
+        self.locks = {}
+        self.saves = 0
+        self.compactions = 0
+
+        with open("src/database/sql/ai_memory_queries.sql", 'r') as file:
+            self.queries = register_queries(file.name, file.read().split(';'))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def conversation_tokens(self, conversation: Conversation) -> int:
+        """
+        :return: estimated tokens of summary and turns
+        :rtype: int
+        """
+        return self.estimate_tokens(conversation.summary) + sum(
+            self.estimate_tokens(question) + self.estimate_tokens(answer) for question, answer in conversation.turns
+        )
+
+    def lock(self, key: tuple) -> asyncio.Lock:
+        if key not in self.locks:
+            self.locks[key] = asyncio.Lock()
+        return self.locks[key]
+
+    async def get(self, key: tuple) -> Conversation:
+        """
+        Gets conversation from memory, from database or new one
+
+        :param key: (scope, id), for example ("user", user id) or ("channel", channel id)
+        :type key: tuple
+        :return: conversation
+        :rtype: Conversation
+        """
+        entry = self.conversations.get(key)
+        if entry is not None and entry[0] + self.idle_ttl > time.monotonic():
+            self.conversations.move_to_end(key)
+            return entry[1]
+
+        conversation = Conversation()
+        if self.persistent:
+            try:
+                row = await self.pool.fetchone(self.queries[0], (key[0], key[1], self.idle_ttl))
+                if row is not None:
+                    conversation = Conversation(summary=row[0], turns=row[1])
+            except Exception as e:
+                print("error: " + str(e))
+
+        self.put(key, conversation)
+        return conversation
+
+    def put(self, key: tuple, conversation: Conversation):
+        """
+        Puts conversation to memory and drops least recently used ones over max_conversations
+        """
+        self.conversations[key] = (time.monotonic(), conversation)
+        self.conversations.move_to_end(key)
+        while len(self.conversations) > self.max_conversations:
+            old_key, _ = self.conversations.popitem(last=False)
+            self.locks.pop(old_key, None)
+
+    async def messages(self, key: tuple) -> list[dict]:
+        """
+        :param key: (scope, id) of conversation
+        :type key: tuple
+        :return: chat messages with summary and turns of conversation, empty for new conversation
+        :rtype: list[dict]
+        """
+        conversation = await self.get(key)
+        messages = []
+        if conversation.summary:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation: {conversation.summary}"})
+        for question, answer in conversation.turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    async def add_turn(self, key: tuple, question: str, answer: str):
+        """
+        Adds turn to conversation and compacts older turns when conversation is over budget
+
+        :param key: (scope, id) of conversation
+        :type key: tuple
+        :param question: question of user
+        :type question: str
+        :param answer: answer of model
+        :type answer: str
+        """
+        async with self.lock(key):
+            conversation = await self.get(key)
+
+            #single turn takes at most half of budget
+            turn_chars = self.max_tokens * 2
+            question = question[:turn_chars // 2]
+            conversation.turns.append([question, answer[:turn_chars - len(question)]])
+
+            while self.conversation_tokens(conversation) > self.max_tokens and conversation.turns:
+                await self.compact(conversation)
+
+            self.put(key, conversation)
+            await self.save(key, conversation)
+
+    async def compact(self, conversation: Conversation):
+        """
+        Moves older half of turns into summary, summary takes at most third of budget
+        """
+        count = max(1, len(conversation.turns) // 2)
+        old_turns = conversation.turns[:count]
+        conversation.turns = conversation.turns[count:]
+
+        text = conversation.summary + "\n" + "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in old_turns)
+        summary_tokens = self.max_tokens // 3
+
+        try:
+            summary = await self.summarize(text, summary_tokens)
+        except Exception as e:
+            print("error: " + str(e))
+            #without model only newest part of text is kept
+            summary = text[-summary_tokens * 4:]
+
+        conversation.summary = summary[:summary_tokens * 4]
+        self.compactions += 1
+
+    async def save(self, key: tuple, conversation: Conversation):
+        """
+        Saves conversation to database when memory is persistent
+        """
+        if not self.persistent:
+            return
+
+        def save(cursor):
+            cursor.execute(self.queries[1], (key[0], key[1], conversation.summary, json.dumps(conversation.turns)))
+            self.saves += 1
+            if self.saves % self.CLEANUP_EVERY == 1:
+                cursor.execute(self.queries[3], (self.idle_ttl,))
+
+        try:
+            await self.pool.run(save)
+        except Exception as e:
+            print("error: " + str(e))
+
+    async def forget(self, key: tuple):
+        """
+        Removes conversation from memory and database
+
+        :param key: (scope, id) of conversation
+        :type key: tuple
+        """
+        self.conversations.pop(key, None)
+        if self.persistent:
+            try:
+                await self.pool.execute(self.queries[2], (key[0], key[1]))
+            except Exception as e:
+                print("error: " + str(e))
+
+    def stats(self) -> dict:
+        """
+        :return: number of conversations in memory and number of compactions
+        :rtype: dict
+        """
+        return {
+            "conversations": len(self.conversations),
+            "compactions": self.compactions
+        }
@@ -0,0 +1,172 @@
+import hashlib
+import time
+from collections import OrderedDict
+from ..database.pool import DatabasePool, get_pool
+from ..monitoring.metrics import register_queries
+
+class ResponseCache:
+    """
+    Two tier cache of ai responses keyed on normalized query, model and prompt template.
+
+    First tier is in-memory LRU with TTL, second tier is ai_response_cache table in Postgres,
+    where expired rows and least recently used rows over max_bytes are evicted every EVICT_EVERY writes.
+    Errors of database tier are printed and treated as miss, so chat works without database.
+    """
+
+    #persistent tier is evicted after this many writes
+    EVICT_EVERY = 20
+
+    def __init__(self, pool: DatabasePool = None, *, persistent: bool = True, max_entries: int = 256,
+                 ttl: float = 86400, max_bytes: int = 50 * 1024 * 1024):
+        """
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param persistent: if Postgres tier is used
+        :type persistent: bool
+        :param max_entries: max number of responses in memory
+        :type max_entries: int
+        :param ttl: seconds after which response is not used anymore
+        :type ttl: float
+        :param max_bytes: max size of responses in Postgres tier
+        :type max_bytes: int
+        """
+        self.persistent = persistent
+        self.pool = (pool if pool is not None else get_pool()) if persistent else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        #key -> (expiry time, response)
+        self.responses = OrderedDict()
+        self.memory_bytes = 0
+        self.persistent_bytes = 0
+        self.writes = 0
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+        with open("src/database/sql/ai_cache_queries.sql", 'r') as file:
+            self.queries = register_queries(file.name, file.read().split(';'))
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        :param query: question of user
+        :type query: str
+        :return: query in lower case with single spaces and without trailing punctuation
+        :rtype: str
+        """
+        return " ".join(query.lower().split()).rstrip("?!. ")
+
+    def make_key(self, query: str, model: str, template: str) -> str:
+        """
+        :return: sha256 of normalized query, model and prompt template
+        :rtype: str
+        """
+        return hashlib.sha256("\0".join((self.normalize(query), model, template)).encode("utf-8")).hexdigest()
+
+    async def get(self, query: str, model: str, template: str) -> str:
+        """
+        Gets cached response
+
+        :param query: question of user
+        :type query: str
+        :param model: name of model
+        :type model: str
+        :param template: prompt template
+        :type template: str
+        :return: response or None on miss
+        :rtype: str
+        """
+        key = self.make_key(query, model, template)
+
+        entry = self.responses.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.responses.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            self.remove(key)
+
+        if self.persistent:
+            try:
+                row = await self.pool.fetchone(self.queries[0], (key, self.ttl))
+                if row is not None:
+                    self.persistent_hits += 1
+                    self.put_memory(key, row[0])
+                    return row[0]
+            except Exception as e:
+                print("error: " + str(e))
+
+        self.misses += 1
+        return None
+
+    async def put(self, query: str, model: str, template: str, response: str):
+        """
+        Caches response in both tiers
+
+        :param query: question of user
+        :type query: str
+        :param model: name of model
+        :type model: str
+        :param template: prompt template
+        :type template: str
+        :param response: response of model
+        :type response: str
+        """
+        key = self.make_key(query, model, template)
+        self.put_memory(key, response)
+
+        if not self.persistent:
+            return
+
+        def put(cursor):
+            cursor.execute(self.queries[1], (key, model, response, len(response.encode("utf-8"))))
+            self.writes += 1
+            if self.writes % self.EVICT_EVERY == 1:
+                cursor.execute(self.queries[2], (self.ttl,))
+                cursor.execute(self.queries[3], (self.max_bytes,))
+                cursor.execute(self.queries[4])
+                self.persistent_bytes = cursor.fetchone()[1]
+
+        try:
+            await self.pool.run(put)
+        except Exception as e:
+            print("error: " + str(e))
+
+    def put_memory(self, key: str, response: str):
+        """
+        Puts response to memory tier and drops least recently used responses over max_entries
+        """
+        self.remove(key)
+        self.responses[key] = (time.monotonic() + self.ttl, response)
+        self.memory_bytes += len(response.encode("utf-8"))
+        while len(self.responses) > self.max_entries:
+            self.remove(next(iter(self.responses)))
+
+    def remove(self, key: str):
+        """
+        Removes response from memory tier
+        """
+        entry = self.responses.pop(key, None)
+        if entry is not None:
+            self.memory_bytes -= len(entry[1].encode("utf-8"))
+
+    def stats(self) -> dict:
+        """
+        :return: hits of both tiers, misses, hit ratio and bytes used by both tiers,
+            bytes of Postgres tier are from last eviction
+        :rtype: dict
+        """
+        hits = self.memory_hits + self.persistent_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self.responses),
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "memory_bytes": self.memory_bytes,
+            "persistent_bytes": self.persistent_bytes
+        }
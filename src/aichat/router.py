@@ -0,0 +1,252 @@
+import asyncio
+import time
+from collections import deque
+from openai import AsyncOpenAI
+from ..monitoring.metrics import AI_FAILURES, AI_FIRST_TOKEN_SECONDS
+
+class LatencyTracker:
+    """
+    Time to first token of one model, EWMA and percentiles of last window samples,
+    model is demoted for demote_seconds after max_failures failures in a row
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 100, max_failures: int = 3, demote_seconds: float = 120):
+        """
+        :param alpha: weight of newest sample in EWMA
+        :type alpha: float
+        :param window: number of samples used for percentiles
+        :type window: int
+        :param max_failures: failures in a row after which model is demoted
+        :type max_failures: int
+        :param demote_seconds: time for which demoted model is used only as last option
+        :type demote_seconds: float
+        """
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.demote_seconds = demote_seconds
+        self.samples = deque(maxlen=window)
+        self.ewma = None
+        self.failures = 0
+        self.total_failures = 0
+        self.demoted_until = 0.0
+
+    def observe(self, seconds: float):
+        """
+        Adds latency sample, success resets failures
+        """
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+        self.failures = 0
+
+    def observe_censored(self, seconds: float):
+        """
+        Adds lower bound of latency of cancelled request, EWMA grows only when bound is above it,
+        percentiles and failures are not changed
+        """
+        if self.ewma is None or seconds > self.ewma:
+            self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+    def observe_failure(self):
+        """
+        Counts failure and demotes model after too many failures in a row
+        """
+        self.failures += 1
+        self.total_failures += 1
+        if self.failures >= self.max_failures:
+            self.demoted_until = time.monotonic() + self.demote_seconds
+            self.failures = 0
+
+    def is_demoted(self) -> bool:
+        return time.monotonic() < self.demoted_until
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: percentile from 0 to 100
+        :type p: float
+        :return: latency percentile of samples in window, None without samples
+        :rtype: float
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+class ModelRouter:
+    """
+    Sends chat request to fastest model and hedges it with next model when first token does not come
+    in time, whichever model answers first is streamed and the other request is cancelled.
+    Failing model is replaced by next one at once. Models are ordered by EWMA of time to first token,
+    models without samples are tried first, demoted models last.
+    """
+
+    def __init__(self, client: AsyncOpenAI, models: list[str], *, hedge_after: float = 3.0, min_samples: int = 10):
+        """
+        :param client: openai compatible client
+        :type client: AsyncOpenAI
+        :param models: names of models
+        :type models: list[str]
+        :param hedge_after: seconds without first token after which hedged request is sent,
+            p95 of model is used instead when model has min_samples samples
+        :type hedge_after: float
+        :param min_samples: samples needed to use p95 of model as hedge threshold
+        :type min_samples: int
+        """
+        self.client = client
+        self.models = models
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.trackers = {model: LatencyTracker() for model in models}
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def name(self) -> str:
+        """
+        :return: name of model set, used in cache keys
+        :rtype: str
+        """
+        return ",".join(self.models)
+
+    def ordered_models(self) -> list[str]:
+        """
+        :return: models from best to worst
+        :rtype: list[str]
+        """
+        def score(model):
+            tracker = self.trackers[model]
+            return (tracker.is_demoted(), tracker.ewma if tracker.ewma is not None else 0.0)
+
+        return sorted(self.models, key=score)
+
+    def hedge_threshold(self, model: str) -> float:
+        """
+        :return: seconds to wait for first token of model before hedged request
+        :rtype: float
+        """
+        tracker = self.trackers[model]
+        if len(tracker.samples) >= self.min_samples:
+            return max(tracker.percentile(95), 0.1)
+        return self.hedge_after
+
+    async def open(self, model: str, messages: list[dict]):
+        """
+        Starts streamed request and waits for first text part
+
+        :return: (stream, iterator of text parts, first part)
+        """
+        stream = await self.client.chat.completions.create(model=model, messages=messages, stream=True)
+        parts = self.text_parts(stream)
+        try:
+            first = await parts.__anext__()
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, parts, first
+
+    @staticmethod
+    async def text_parts(stream):
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def stream(self, messages: list[dict]):
+        """
+        Streams response of first model that answers
+
+        :param messages: chat messages
+        :type messages: list[dict]
+        :return: async generator of text parts
+        :raises Exception: error of last model when all models failed
+        """
+        loop = asyncio.get_running_loop()
+        candidates = iter(self.ordered_models())
+        #task -> (model, start time)
+        pending = {}
+        last_error = None
+        hedged = False
+        winner = None
+
+        def launch():
+            model = next(candidates, None)
+            if model is not None:
+                pending[asyncio.create_task(self.open(model, messages))] = (model, loop.time())
+            return model
+
+        primary = launch()
+
+        while winner is None:
+            if not pending:
+                #all started requests failed, next model is tried without waiting
+                primary = launch()
+                if primary is None:
+                    raise last_error
+                continue
+
+            done, _ = await asyncio.wait(
+                pending.keys(),
+                timeout=None if hedged else self.hedge_threshold(primary),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                hedged = True
+                if launch() is not None:
+                    self.hedges += 1
+                continue
+
+            for task in done:
+                model, start = pending.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    print(f"error: model {model}: {last_error}")
+                    self.trackers[model].observe_failure()
+                    AI_FAILURES.labels(model=model).inc()
+                    #failed request is replaced by next model at once
+                    if winner is None and pending:
+                        launch()
+                elif winner is None:
+                    self.trackers[model].observe(loop.time() - start)
+                    AI_FIRST_TOKEN_SECONDS.labels(model=model).observe(loop.time() - start)
+                    winner = (model, task.result())
+                else:
+                    #both answered at the same time
+                    await task.result()[0].close()
+
+        #slower requests are cancelled, their elapsed time is only lower bound of their latency
+        for task, (model, start) in pending.items():
+            task.cancel()
+            self.trackers[model].observe_censored(loop.time() - start)
+        if hedged and winner[0] != primary:
+            self.hedge_wins += 1
+
+        model, (stream, parts, first) = winner
+        try:
+            async with stream:
+                yield first
+                async for part in parts:
+                    yield part
+        except Exception:
+            self.trackers[model].observe_failure()
+            AI_FAILURES.labels(model=model).inc()
+            raise
+
+    def stats(self) -> dict:
+        """
+        :return: latency EWMA, percentiles, failures and demotion of every model and hedge counters
+        :rtype: dict
+        """
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "models": {
+                model: {
+                    "ewma": tracker.ewma,
+                    "p50": tracker.percentile(50),
+                    "p95": tracker.percentile(95),
+                    "p99": tracker.percentile(99),
+                    "failures": tracker.total_failures,
+                    "demoted": tracker.is_demoted()
+                }
+                for model, tracker in self.trackers.items()
+            }
+        }
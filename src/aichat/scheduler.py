@@ -0,0 +1,278 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from .chatbot import AiChat
+from .response_cache import ResponseCache
+from ..monitoring.metrics import QUEUE_DEPTH
+
+class QuotaExceededError(Exception):
+    """
+    Raised when user has no tokens left in their bucket
+
+    :param retry_after: seconds after which next request will be accepted
+    :type retry_after: float
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"quota exceeded, retry after {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+class AiJob:
+    """
+    One upstream request, parts of response are shared by all tickets waiting for it
+    """
+    def __init__(self, key: tuple, query: str, use_cache: bool, priority: int, history: list[dict] = None, source=None):
+        self.key = key
+        self.query = query
+        self.use_cache = use_cache
+        self.history = history
+        self.priority = priority
+        #function returning async generator of parts, replaces chat response for internal jobs
+        self.source = source
+        self.submitted = time.monotonic()
+        self.parts = []
+        self.error = None
+        self.done = False
+        self.started = asyncio.Event()
+        #replaced after every change, waiting streams wake up on it
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        changed = self.changed
+        self.changed = asyncio.Event()
+        changed.set()
+
+class AiTicket:
+    """
+    Handle of submitted request returned to caller
+    """
+    def __init__(self, scheduler: "AiScheduler", job: AiJob, coalesced: bool):
+        self.scheduler = scheduler
+        self.job = job
+        self.coalesced = coalesced
+        self.started = job.started
+
+    def position(self) -> int:
+        """
+        :return: position of request in queue starting from 1, 0 when it is already running
+        :rtype: int
+        """
+        return self.scheduler.position(self.job)
+
+    async def stream(self):
+        """
+        Waits for start of request and streams its response
+
+        :return: async generator of text parts
+        """
+        index = 0
+        while True:
+            changed = self.job.changed
+            while index < len(self.job.parts):
+                yield self.job.parts[index]
+                index += 1
+            if self.job.done:
+                if self.job.error is not None:
+                    raise self.job.error
+                return
+            await changed.wait()
+
+class AiScheduler:
+    """
+    Scheduler in front of AiChat.
+
+    At most max_concurrency requests go upstream at once, the rest wait in priority queue
+    (lower priority number goes first, then older requests). Every user has token bucket of
+    burst tokens refilled with per_minute tokens per minute, request that would start new upstream
+    call takes one token. Identical queries waiting or running at the same time share one upstream call.
+    Summaries of conversation memory wait in the same queue with lowest priority and take no tokens.
+    """
+
+    SUMMARY_PRIORITY = 2
+
+    def __init__(self, chat: AiChat, *, max_concurrency: int = 2, burst: int = 3, per_minute: float = 1.0):
+        """
+        :param chat: chat used for upstream requests
+        :type chat: AiChat
+        :param max_concurrency: max number of requests sent upstream at once
+        :type max_concurrency: int
+        :param burst: size of token bucket of user
+        :type burst: int
+        :param per_minute: tokens added to bucket of user every minute
+        :type per_minute: float
+        """
+        self.chat = chat
+        self.max_concurrency = max_concurrency
+        self.burst = burst
+        self.per_minute = per_minute
+
+        #heap of (priority, sequence, job), jobs that already started are skipped
+        self.queue = []
+        self.sequence = itertools.count()
+        #(normalized query, use_cache, conversation key) -> job waiting or running
+        self.jobs = {}
+        self.running = 0
+        #references of running tasks, so they are not garbage collected
+        self.tasks = set()
+        #user id -> (tokens, time of last refill)
+        self.buckets = {}
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        #wait times of last 100 started requests
+        self.waits = deque(maxlen=100)
+
+        #read only when metrics are scraped
+        QUEUE_DEPTH.labels(queue="ai_waiting").set_function(lambda: len(self.waiting()))
+        QUEUE_DEPTH.labels(queue="ai_running").set_function(lambda: self.running)
+
+    def take_token(self, user_id: int):
+        """
+        Takes one token from bucket of user
+
+        :raises QuotaExceededError: when bucket is empty
+        """
+        now = time.monotonic()
+        tokens, last = self.buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.per_minute / 60)
+
+        if tokens < 1:
+            self.buckets[user_id] = (tokens, now)
+            self.rejected += 1
+            raise QuotaExceededError((1 - tokens) * 60 / self.per_minute)
+
+        self.buckets[user_id] = (tokens - 1, now)
+
+    def submit(self, user_id: int, query: str, *, priority: int = 1, use_cache: bool = True,
+               history: list[dict] = None, context: tuple = None) -> AiTicket:
+        """
+        Queues request or joins identical one that is already waiting or running
+
+        :param user_id: id of asking user
+        :type user_id: int
+        :param query: question of user
+        :type query: str
+        :param priority: 0 for moderators and admins, 1 for others
+        :type priority: int
+        :param use_cache: if cached response can be used
+        :type use_cache: bool
+        :param history: earlier messages of conversation
+        :type history: list[dict]
+        :param context: key of conversation, only requests in the same conversation are coalesced
+        :type context: tuple
+        :return: ticket of request
+        :rtype: AiTicket
+        :raises QuotaExceededError: when user has no tokens left
+        """
+        key = (ResponseCache.normalize(query), use_cache, context if history else None)
+        self.submitted += 1
+
+        job = self.jobs.get(key)
+        if job is not None:
+            self.coalesced += 1
+            if priority < job.priority and not job.started.is_set():
+                #old heap entry is skipped when job is already started
+                job.priority = priority
+                heapq.heappush(self.queue, (priority, next(self.sequence), job))
+            return AiTicket(self, job, True)
+
+        self.take_token(user_id)
+
+        job = AiJob(key, query, use_cache, priority, history)
+        self.jobs[key] = job
+        heapq.heappush(self.queue, (priority, next(self.sequence), job))
+        self.dispatch()
+        return AiTicket(self, job, False)
+
+    async def summarize(self, text: str, max_tokens: int) -> str:
+        """
+        Summarizes conversation as low priority job, used by conversation memory to compact older turns
+
+        :param text: turns of conversation
+        :type text: str
+        :param max_tokens: max length of summary in tokens
+        :type max_tokens: int
+        :return: summary
+        :rtype: str
+        """
+        async def parts():
+            yield await self.chat.summarize(text, max_tokens)
+
+        #summaries are never coalesced, every one gets own key
+        job = AiJob(("summary", next(self.sequence)), text, False, self.SUMMARY_PRIORITY, source=parts)
+        self.jobs[job.key] = job
+        heapq.heappush(self.queue, (job.priority, next(self.sequence), job))
+        self.dispatch()
+
+        return "".join([part async for part in AiTicket(self, job, False).stream()])
+
+    def dispatch(self):
+        """
+        Starts waiting requests while there is free place
+        """
+        while self.running < self.max_concurrency and self.queue:
+            priority, sequence, job = heapq.heappop(self.queue)
+            if job.started.is_set():
+                continue
+
+            self.running += 1
+            self.waits.append(time.monotonic() - job.submitted)
+            job.started.set()
+            task = asyncio.create_task(self.run(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, job: AiJob):
+        """
+        Sends request upstream and shares parts of response with tickets
+        """
+        try:
+            parts = job.source() if job.source is not None else self.chat.stream_response(job.query, job.use_cache, job.history)
+            async for part in parts:
+                job.parts.append(part)
+                job.notify()
+        except Exception as e:
+            job.error = e
+        finally:
+            job.done = True
+            job.notify()
+            del self.jobs[job.key]
+            self.running -= 1
+            self.dispatch()
+
+    def position(self, job: AiJob) -> int:
+        """
+        :return: position of job in queue starting from 1, 0 when it is already running
+        :rtype: int
+        """
+        if job.started.is_set():
+            return 0
+
+        for index, entry in enumerate(sorted(self.waiting())):
+            if entry[2] is job:
+                return index + 1
+        return 0
+
+    def waiting(self) -> list[tuple]:
+        """
+        :return: heap entries of jobs that did not start, without entries left after priority change
+        :rtype: list[tuple]
+        """
+        return [entry for entry in self.queue if not entry[2].started.is_set() and entry[0] == entry[2].priority]
+
+    def stats(self) -> dict:
+        """
+        :return: queue depth, running requests, counters and wait times in seconds
+        :rtype: dict
+        """
+        return {
+            "queue_depth": len(self.waiting()),
+            "running": self.running,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "average_wait": sum(self.waits) / len(self.waits) if self.waits else 0.0,
+            "max_wait": max(self.waits, default=0.0)
+        }
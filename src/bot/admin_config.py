@@ -1,31 +1,28 @@
+import asyncio
 import discord
-import json
+import math
+import os
+from collections import Counter
 from discord.ext import commands
 from discord import app_commands
+from datetime import datetime
 from ..database.logging_database import Logging_Database
+from ..database.export import ExportFilters, MessageExporter
+from .paginator import KeysetPaginator
+from .guild_config import GuildConfigStore
+from ..monitoring.profiler import Profiler
 import textwrap
 
 class AdminConfig(commands.Cog):
     """
     Admin commands class to handle admin inteactions
     """
-    def __init__(self, bot: commands.Bot ,config: dict, config_path: str):
+    def __init__(self, bot: commands.Bot, config: GuildConfigStore):
         self.bot = bot
         self.config = config
-        self.path = config_path
-        self.config = {}
-        self.load_config()
         self.__sql = Logging_Database()
+        self.__exporter = MessageExporter()
 
-    def load_config(self):
-        """
-        Loads config from file to memory
-        """
-        with open(self.path, 'r', encoding="UTF-8") as config_file:
-            self.config = json.load(config_file)
-
-        print(str(self.config))
-    
     async def make_mod_role(self, guild: discord.Guild) -> discord.Role:
         """
         Makes mod rule for moderators to use it has limited permissions
@@ -162,25 +159,25 @@ class AdminConfig(commands.Cog):
         await interaction.response.defer(thinking=True)
 
         #check if user is admin
-        if any(member_role.id == self.config["roles"]["owner-role-id"] for member_role in interaction.user.roles):
+        if any(member_role.id == self.config.guild(interaction.guild.id)["roles"]["owner-role-id"] for member_role in interaction.user.roles):
+
+            resolver = self.bot.resolver
+
+            #objects are resolved before config is cleared, clearing config invalidates resolver
+            channels = {name: resolver.channel(interaction.guild, name) for name in resolver.CHANNELS}
+            roles = {name: resolver.role(interaction.guild, name) for name in resolver.ROLES}
 
             #deletes channels
-            for channel_key in self.config["logging"]:
-                for channel in interaction.guild.channels:
-                    if channel.id == self.config["logging"][channel_key]:
-                        self.config["logging"][channel_key] = 0
-                        await channel.delete()
+            for name, channel in channels.items():
+                if channel is not None:
+                    self.config.guild(interaction.guild.id).set("logging", resolver.CHANNELS[name], 0)
+                    await channel.delete()
 
             #deletes roles
-            for role_key in self.config["roles"]:
-                for role in interaction.guild.roles:
-                    if self.config["roles"][role_key] == role.id:
-                        self.config["roles"][role_key] = 0
-                        await role.delete()
-            
-            #updates config file
-            with open(self.path, 'w', encoding="UTF-8") as c_file:
-                json.dump(self.config, c_file, indent=4)
+            for name, role in roles.items():
+                if role is not None:
+                    self.config.guild(interaction.guild.id).set("roles", resolver.ROLES[name], 0)
+                    await role.delete()
 
             await interaction.followup.send("Done")
 
@@ -199,14 +196,15 @@ class AdminConfig(commands.Cog):
 
         await interaction.response.defer(thinking=True)
 
+        config = self.config.guild(interaction.guild.id)
+
         nonzero = True
-        print(str(self.config))
-        for key in self.config["logging"]:
-            if self.config["logging"][key] == 0:
+        for key in config["logging"]:
+            if config["logging"][key] == 0:
                 nonzero = False
         
-        for key in self.config["roles"]:
-            if self.config["roles"][key] == 0:
+        for key in config["roles"]:
+            if config["roles"][key] == 0:
                 nonzero = False
 
         if nonzero:
@@ -239,23 +237,22 @@ class AdminConfig(commands.Cog):
 
         category_id = category.id
 
-        self.load_config()
-
-        #sets values in config file
-        with open(self.path, "w+", encoding='utf-8') as config_file:
-            #setup variables in config file for logging
-            self.config["logging"]["logging-channel-group-id"] = category_id
-            self.config["logging"]["commands-channel-id"] = commands_channel_id
-            self.config["logging"]["messages-stats-channel-id"] = stats_channel_id
-            self.config["logging"]["members-leaves-channel-id"] = leaves_channel_id
-            self.config["logging"]["members-joins-channel-id"] = joins_channel_id
-            self.config["logging"]["admin-voice-channel"] = voice_channel_id
-
-            #and for roles
-            self.config["roles"]["mod-role-id"] = mod_role.id
-            self.config["roles"]["admin-role-id"] = admin_role.id
-            self.config["roles"]["owner-role-id"] = owner_role.id
-            json.dump(self.config, config_file, indent=4)
+        #setup variables in config for logging
+        config.update("logging", {
+            "logging-channel-group-id": category_id,
+            "commands-channel-id": commands_channel_id,
+            "messages-stats-channel-id": stats_channel_id,
+            "members-leaves-channel-id": leaves_channel_id,
+            "members-joins-channel-id": joins_channel_id,
+            "admin-voice-channel": voice_channel_id
+        })
+
+        #and for roles
+        config.update("roles", {
+            "mod-role-id": mod_role.id,
+            "admin-role-id": admin_role.id,
+            "owner-role-id": owner_role.id
+        })
 
         response_str = textwrap.dedent(f"""
             Created channels in category {category.name}:
@@ -268,7 +265,7 @@ class AdminConfig(commands.Cog):
             \t{admin_role.name}
             \t{mod_role.name}
             \t{owner_role.name}
-            And saved configuration fo config file
+            And saved configuration of this server
         """)
 
         embed = discord.Embed(
@@ -279,37 +276,388 @@ class AdminConfig(commands.Cog):
 
         await interaction.followup.send(embed=embed)
 
+    def fit_description(self, description: str) -> str:
+        """
+        :return: embed description cut to discord limit of 4096 characters
+        :rtype: str
+        """
+        if len(description) > 4096:
+            description = description[:4093] + "..."
+        return description
+
+    def parse_date(self, text: str) -> datetime:
+        """
+        Parses date given by user in command
+
+        :param text: date in format YYYY-MM-DD or None
+        :type text: str
+        :return: local midnight of that day or None
+        :rtype: datetime
+        """
+        if text is None:
+            return None
+        return datetime.strptime(text, "%Y-%m-%d").astimezone()
+
     @app_commands.command(name="get-logs", description="get member logs")
-    async def get_logs_by_name(self, interaction: discord.Interaction, member: discord.Member):
+    @app_commands.describe(
+        channel="only messages from this channel",
+        since="only messages since this day (YYYY-MM-DD)",
+        until="only messages before this day (YYYY-MM-DD)"
+    )
+    async def get_logs_by_name(self, interaction: discord.Interaction, member: discord.User,
+                               channel: discord.TextChannel = None, since: str = None, until: str = None):
         """
-        Send response message with logs to user
+        Send response message with logs to user, logs are shown page by page
 
         :param interaction: interaction object with member
         :type interaction: discord.Interaction
-        :param username: member username to get logs
-        :type username: str
+        :param member: member to get logs, can be user that already left
+        :type member: discord.User
+        :param channel: optional channel filter
+        :type channel: discord.TextChannel
+        :param since: optional start day YYYY-MM-DD
+        :type since: str
+        :param until: optional end day YYYY-MM-DD, exclusive
+        :type until: str
         """
         await interaction.response.defer(thinking=True)
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             await interaction.followup.send("Invalid channel")
             return
 
-        response_str = ""
-        response_list = await self.__sql.get_messages_by_username(username=member.global_name)
-        for row in response_list:
-            tmp = ""
-            for column in row:
-                tmp = tmp + str(column) + " "
-            response_str = response_str + tmp + "\n"
-
-        embeded_messege = discord.Embed(
-            title="Logi z bazy danych",
-            description=f"Logi dla: {member.global_name} \n {response_str}",
-            color=discord.Color.from_rgb(46, 255, 137)
+        try:
+            since_date = self.parse_date(since)
+            until_date = self.parse_date(until)
+        except ValueError:
+            await interaction.followup.send("Invalid date, use YYYY-MM-DD")
+            return
+
+        self.bot.user_cache.put(member)
+
+        async def fetch_page(after):
+            return await self.__sql.get_messages_page(
+                member.id,
+                interaction.guild.id,
+                channel_id=channel.id if channel else None,
+                since=since_date,
+                until=until_date,
+                after=after,
+                page_size=10
+            )
+
+        def render(rows, page_number):
+            response_str = ""
+            #10 rows of at most about 330 characters fit in embed with header
+            for timestamp, message_id, channel_name, content in rows:
+                content = content if len(content) <= 250 else content[:250] + "..."
+                response_str += f"`{timestamp.astimezone().strftime('%Y-%m-%d %H:%M')}` #{channel_name[:50]}: {content}\n"
+
+            embeded_messege = discord.Embed(
+                title="Logi z bazy danych",
+                description=self.fit_description(f"Logi dla: {member.global_name or member.name} \n {response_str or 'Brak wiadomości'}"),
+                color=discord.Color.from_rgb(46, 255, 137)
+            )
+            embeded_messege.set_footer(text=f"Strona {page_number}")
+            return embeded_messege
+
+        await KeysetPaginator(fetch_page, render, author_id=interaction.user.id).send(interaction)
+
+    @app_commands.command(name="search-logs", description="full text search in message logs")
+    @app_commands.describe(
+        query="searched words, \"phrase\", or, -excluded word",
+        member="only messages of this member",
+        channel="only messages from this channel",
+        since="only messages since this day (YYYY-MM-DD)",
+        until="only messages before this day (YYYY-MM-DD)"
+    )
+    async def search_logs(self, interaction: discord.Interaction, query: app_commands.Range[str, 1, 200], member: discord.User = None,
+                          channel: discord.TextChannel = None, since: str = None, until: str = None):
+        """
+        Sends best matching messages of this guild page by page
+
+        :param interaction: interaction object with member
+        :type interaction: discord.Interaction
+        :param query: searched text, at most 200 characters
+        :type query: str
+        :param member: optional author filter
+        :type member: discord.User
+        :param channel: optional channel filter
+        :type channel: discord.TextChannel
+        :param since: optional start day YYYY-MM-DD
+        :type since: str
+        :param until: optional end day YYYY-MM-DD, exclusive
+        :type until: str
+        """
+        await interaction.response.defer(thinking=True)
+
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
+            await interaction.followup.send("Invalid channel")
+            return
+
+        try:
+            since_date = self.parse_date(since)
+            until_date = self.parse_date(until)
+        except ValueError:
+            await interaction.followup.send("Invalid date, use YYYY-MM-DD")
+            return
+
+        async def fetch_page(after):
+            return await self.__sql.search_messages(
+                query,
+                interaction.guild.id,
+                user_id=member.id if member else None,
+                channel_id=channel.id if channel else None,
+                since=since_date,
+                until=until_date,
+                after=after,
+                page_size=10
+            )
+
+        def render(rows, page_number):
+            response_str = ""
+            for timestamp, message_id, user_id, channel_id, content, rank in rows:
+                content = content if len(content) <= 200 else content[:200] + "..."
+                response_str += f"`{timestamp.astimezone().strftime('%Y-%m-%d %H:%M')}` <@{user_id}> w <#{channel_id}>: {content}\n"
+
+            embeded_messege = discord.Embed(
+                title="Wyniki wyszukiwania",
+                description=self.fit_description(f"Szukano: {discord.utils.escape_markdown(query)} \n {response_str or 'Brak wiadomości'}"),
+                color=discord.Color.from_rgb(46, 255, 137)
+            )
+            embeded_messege.set_footer(text=f"Strona {page_number}")
+            return embeded_messege
+
+        await KeysetPaginator(fetch_page, render, author_id=interaction.user.id).send(interaction)
+
+    @app_commands.command(name="export-logs", description="exports message logs to compressed files")
+    @app_commands.describe(
+        member="only messages of this member",
+        channel="only messages from this channel",
+        since="only messages since this day (YYYY-MM-DD)",
+        until="only messages before this day (YYYY-MM-DD)"
+    )
+    @app_commands.choices(format=[app_commands.Choice(name=f, value=f) for f in MessageExporter.FORMATS])
+    async def export_logs(self, interaction: discord.Interaction, format: app_commands.Choice[str] = None,
+                          member: discord.Member = None, channel: discord.TextChannel = None,
+                          since: str = None, until: str = None):
+        """
+        Exports logs of this guild and sends files to user, or path of export when files are too big
+
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        :param format: format of export, default ndjson.gz
+        :type format: app_commands.Choice[str]
+        :param member: optional member filter
+        :type member: discord.Member
+        :param channel: optional channel filter
+        :type channel: discord.TextChannel
+        :param since: optional start day YYYY-MM-DD
+        :type since: str
+        :param until: optional end day YYYY-MM-DD, exclusive
+        :type until: str
+        """
+        await interaction.response.defer(thinking=True)
+
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
+            await interaction.followup.send("Invalid channel")
+            return
+
+        if not any(member_role.id == self.config.guild(interaction.guild.id)["roles"]["owner-role-id"] for member_role in interaction.user.roles):
+            await interaction.followup.send("Incorect role")
+            return
+
+        try:
+            since_date = self.parse_date(since)
+            until_date = self.parse_date(until)
+        except ValueError:
+            await interaction.followup.send("Invalid date, use YYYY-MM-DD")
+            return
+
+        filters = ExportFilters(
+            guild_id=interaction.guild.id,
+            channel_id=channel.id if channel else None,
+            user_id=member.id if member else None,
+            since=since_date.isoformat() if since_date else None,
+            until=until_date.isoformat() if until_date else None
         )
+        output_dir = os.path.join("exports", datetime.now().strftime("%Y%m%d-%H%M%S"))
 
-        await interaction.followup.send(embed=embeded_messege)
+        try:
+            checkpoint = await self.__exporter.export(output_dir, format.value if format else "ndjson.gz", filters)
+        except Exception as e:
+            print("error: " + str(e))
+            await interaction.followup.send(f"Export failed: {e}")
+            return
+
+        paths = [os.path.join(output_dir, part) for part in checkpoint.parts]
+        size = sum(os.path.getsize(path) for path in paths)
+
+        if paths and len(paths) <= 10 and size <= interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"Exported {checkpoint.rows} messages",
+                files=[discord.File(path) for path in paths]
+            )
+        else:
+            await interaction.followup.send(f"Exported {checkpoint.rows} messages to `{output_dir}`")
+
+    @app_commands.command(name="profile", description="profiles bot for given time")
+    @app_commands.describe(
+        seconds="length of profiling",
+        destination="send files to this channel or only save them on disk"
+    )
+    @app_commands.choices(destination=[
+        app_commands.Choice(name="channel", value="channel"),
+        app_commands.Choice(name="disk", value="disk")
+    ])
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 300] = 30,
+                      destination: app_commands.Choice[str] = None):
+        """
+        Runs sampling profiler with task tracing and sends flamegraph stacks (.folded)
+        and wall and cpu time of every coroutine (.txt)
+
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        :param seconds: length of profiling
+        :type seconds: int
+        :param destination: channel or disk, default channel
+        :type destination: app_commands.Choice[str]
+        """
+        await interaction.response.defer(thinking=True)
+
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
+            await interaction.followup.send("Invalid channel")
+            return
+
+        #profiler sees stacks of whole process shared by all guilds, so owner role of one guild is not enough
+        if not await self.bot.is_owner(interaction.user):
+            await interaction.followup.send("Only owner of bot can profile")
+            return
+
+        if Profiler.active is not None:
+            await interaction.followup.send("Profiler is already running")
+            return
+
+        result = await Profiler().profile(seconds)
+
+        path = os.path.join("profiles", datetime.now().strftime("profile-%Y%m%d-%H%M%S"))
+        paths = await asyncio.to_thread(Profiler.write, result, path)
+        size = sum(os.path.getsize(path) for path in paths)
+
+        if (destination is None or destination.value == "channel") and size <= interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"Profiled {result.duration:.0f} s, {result.samples} samples",
+                files=[discord.File(path) for path in paths]
+            )
+        else:
+            await interaction.followup.send(f"Profiled {result.duration:.0f} s, {result.samples} samples, saved to `{path}.folded`")
+
+    @app_commands.command(name="cache-stats", description="shows cache counters")
+    @app_commands.default_permissions(administrator=True)
+    async def cache_stats(self, interaction: discord.Interaction):
+        """
+        Sends hit and miss counters of shared user cache and of ai response cache, latency and events of shards
+        and ai queue metrics
+
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        """
+        stats = self.bot.user_cache.stats()
+        embed = discord.Embed(
+            title="Cache użytkowników",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Rozmiar", value=stats["size"])
+        embed.add_field(name="Trafienia", value=stats["hits"])
+        embed.add_field(name="Chybienia", value=stats["misses"])
+        embed.add_field(name="Skuteczność", value=f"{stats['hit_ratio']:.0%}")
+        embeds = [embed]
+
+        stats = self.bot.resolver.stats()
+        embed_resolver = discord.Embed(
+            title="Kanały i role z konfiguracji",
+            color=discord.Color.blue()
+        )
+        embed_resolver.add_field(name="Rozmiar", value=stats["size"])
+        embed_resolver.add_field(name="Trafienia", value=stats["hits"])
+        embed_resolver.add_field(name="Chybienia", value=stats["misses"])
+        embeds.append(embed_resolver)
+
+        guilds = Counter(guild.shard_id for guild in self.bot.guilds)
+        embed_shards = discord.Embed(
+            title="Shardy",
+            description=f"Zdarzenia bez serwera: {self.bot.shard_events[None]}",
+            color=discord.Color.blue()
+        )
+        #embed can have only 25 fields
+        for shard_id, shard in sorted(self.bot.shards.items())[:25]:
+            latency = "brak pomiarów" if math.isnan(shard.latency) else f"{shard.latency * 1000:.0f} ms"
+            embed_shards.add_field(
+                name=f"Shard {shard_id}",
+                value=f"Opóźnienie: {latency}\nSerwery: {guilds[shard_id]}\nZdarzenia: {self.bot.shard_events[shard_id]}"
+            )
+        embeds.append(embed_shards)
+
+        response_cache = getattr(self.bot, "response_cache", None)
+        if response_cache is not None:
+            stats = response_cache.stats()
+            embed_ai = discord.Embed(
+                title="Cache odpowiedzi AI",
+                color=discord.Color.blue()
+            )
+            embed_ai.add_field(name="W pamięci", value=f"{stats['entries']} ({stats['memory_bytes'] / 1024:.1f} KiB)")
+            embed_ai.add_field(name="W bazie", value=f"{stats['persistent_bytes'] / 1024:.1f} KiB")
+            embed_ai.add_field(name="Trafienia", value=f"{stats['memory_hits']} + {stats['persistent_hits']}")
+            embed_ai.add_field(name="Chybienia", value=stats["misses"])
+            embed_ai.add_field(name="Skuteczność", value=f"{stats['hit_ratio']:.0%}")
+            embeds.append(embed_ai)
+
+        ai_scheduler = getattr(self.bot, "ai_scheduler", None)
+        if ai_scheduler is not None:
+            stats = ai_scheduler.stats()
+            embed_queue = discord.Embed(
+                title="Kolejka AI",
+                color=discord.Color.blue()
+            )
+            embed_queue.add_field(name="Oczekujące", value=stats["queue_depth"])
+            embed_queue.add_field(name="W trakcie", value=stats["running"])
+            embed_queue.add_field(name="Połączone", value=f"{stats['coalesced']} / {stats['submitted']}")
+            embed_queue.add_field(name="Odrzucone", value=stats["rejected"])
+            embed_queue.add_field(name="Czas oczekiwania", value=f"śr. {stats['average_wait']:.1f} s, max {stats['max_wait']:.1f} s")
+            embeds.append(embed_queue)
+
+        ai_router = getattr(self.bot, "ai_router", None)
+        if ai_router is not None:
+            stats = ai_router.stats()
+            embed_models = discord.Embed(
+                title="Modele AI",
+                description=f"Zapytania zabezpieczające: {stats['hedges']}, wygrane: {stats['hedge_wins']}",
+                color=discord.Color.blue()
+            )
+            for model, model_stats in stats["models"].items():
+                if model_stats["ewma"] is None:
+                    latency = "brak pomiarów"
+                else:
+                    latency = f"EWMA {model_stats['ewma']:.2f} s, p50 {model_stats['p50']:.2f} s, p95 {model_stats['p95']:.2f} s, p99 {model_stats['p99']:.2f} s"
+                embed_models.add_field(
+                    name=model + (" (zdegradowany)" if model_stats["demoted"] else ""),
+                    value=f"{latency}\nBłędy: {model_stats['failures']}",
+                    inline=False
+                )
+            embeds.append(embed_models)
+
+        ai_memory = getattr(self.bot, "ai_memory", None)
+        if ai_memory is not None:
+            stats = ai_memory.stats()
+            embed_memory = discord.Embed(
+                title="Pamięć rozmów AI",
+                color=discord.Color.blue()
+            )
+            embed_memory.add_field(name="Rozmowy", value=stats["conversations"])
+            embed_memory.add_field(name="Podsumowania", value=stats["compactions"])
+            embeds.append(embed_memory)
+
+        await interaction.response.send_message(embeds=embeds)
 
     @app_commands.command(name="set-stats-channel", description="sets existing channel as stats")
     async def set_stats_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
@@ -322,13 +670,10 @@ class AdminConfig(commands.Cog):
         :type channel: discord.TextChannel
         """
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
         
-        self.config["logging"]["messages-stats-channel-id"] = channel.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("logging", "messages-stats-channel-id", channel.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -343,13 +688,10 @@ class AdminConfig(commands.Cog):
         :type channel: discord.TextChannel
         """
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
         
-        self.config["logging"]["members-joins-channel-id"] = channel.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("logging", "members-joins-channel-id", channel.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -364,13 +706,10 @@ class AdminConfig(commands.Cog):
         :type channel: discord.TextChannel
         """
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
         
-        self.config["logging"]["members-leaves-channel-id"] = channel.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("logging", "members-leaves-channel-id", channel.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -388,10 +727,7 @@ class AdminConfig(commands.Cog):
         if not interaction.user.guild_permissions.administrator:
             return
         
-        self.config["logging"]["commands-channel-id"] = channel.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("logging", "commands-channel-id", channel.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -405,13 +741,10 @@ class AdminConfig(commands.Cog):
         :param role: guild role to be set as owner
         :type role: discord.Role
         """
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
 
-        self.config["roles"]["owner-role-id"] = role.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("roles", "owner-role-id", role.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -425,13 +758,10 @@ class AdminConfig(commands.Cog):
         :param role: guild role to be set as admin
         :type role: discord.Role
         """
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
 
-        self.config["roles"]["admin-role-id"] = role.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("roles", "admin-role-id", role.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
 
@@ -446,13 +776,10 @@ class AdminConfig(commands.Cog):
         :type role: discord.Role
         """
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
 
-        self.config["roles"]["mod-role-id"] = role.id
-
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        self.config.guild(interaction.guild.id).set("roles", "mod-role-id", role.id)
 
         await interaction.response.send_message("Changed", ephemeral=True)
     
@@ -467,12 +794,48 @@ class AdminConfig(commands.Cog):
         :type channel: discord.CategoryChannel
         """
 
-        if interaction.channel.id != self.config["logging"]["commands-channel-id"]:
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
             return
 
-        self.config["logging"]["logging-channel-group-id"] = category.id
+        self.config.guild(interaction.guild.id).set("logging", "logging-channel-group-id", category.id)
+
+        await interaction.response.send_message("Changed", ephemeral=True)
+    @app_commands.command(name="set-raid-protection", description="sets thresholds of raid detector")
+    @app_commands.describe(
+        enabled="turns detector on or off",
+        window="length of window in seconds",
+        joins="joins in window that trip detector",
+        young_joins="joins of new accounts in window that trip detector",
+        young_days="accounts younger than this many days are new",
+        same_name="joins with same name pattern in window that trip detector",
+        lockdown="raise verification level to highest when raid is detected"
+    )
+    async def set_raid_protection(self, interaction: discord.Interaction, enabled: bool = None,
+                                  window: app_commands.Range[int, 5, 600] = None,
+                                  joins: app_commands.Range[int, 2, 500] = None,
+                                  young_joins: app_commands.Range[int, 2, 500] = None,
+                                  young_days: app_commands.Range[int, 1, 365] = None,
+                                  same_name: app_commands.Range[int, 2, 500] = None,
+                                  lockdown: bool = None):
+        """
+        Changes given values of raid section of config, other values stay as they are
 
-        with open(self.path, 'w', encoding="UTF-8") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        """
 
-        await interaction.response.send_message("Changed", ephemeral=True)
\ No newline at end of file
+        if interaction.channel.id != self.config.guild(interaction.guild.id)["logging"]["commands-channel-id"]:
+            return
+
+        values = {
+            "enabled": enabled,
+            "window-seconds": window,
+            "joins": joins,
+            "young-joins": young_joins,
+            "young-account-days": young_days,
+            "same-name": same_name,
+            "lockdown": lockdown
+        }
+        self.config.guild(interaction.guild.id).update("raid", {key: value for key, value in values.items() if value is not None})
+
+        await interaction.response.send_message("Changed", ephemeral=True)
@@ -0,0 +1,146 @@
+import asyncio
+import discord
+from datetime import datetime
+
+class MemberAnnouncer:
+    """
+    Announces joins and leaves of members, coalesced per channel.
+
+    When channel had no announcement in last window seconds, member is announced at once
+    with own embed. Joins and leaves that come sooner are buffered and sent together
+    when window ends, as one message: embeds with avatars for batches up to small_batch members,
+    one digest embed with list of members for bigger batches (raids), so channel gets
+    at most one message per window.
+    """
+
+    def __init__(self, *, window: float = 3.0, small_batch: int = 5, max_listed: int = 40):
+        """
+        :param window: minimal seconds between messages in one channel
+        :type window: float
+        :param small_batch: max number of members announced with own embeds in one message
+        :type small_batch: int
+        :param max_listed: max number of members listed in digest, rest is only counted
+        :type max_listed: int
+        """
+        self.window = window
+        self.small_batch = small_batch
+        self.max_listed = max_listed
+
+        #channel id -> loop time of last message
+        self.last_sent = {}
+        #channel id -> (channel, buffered entries)
+        self.pending = {}
+        #channel id -> task that flushes channel when window ends
+        self.timers = {}
+        self.tasks = set()
+
+    def announce(self, channel: discord.abc.Messageable, member: discord.Member, join: bool):
+        """
+        Announces join or leave, never waits for discord
+
+        :param channel: joins or leaves channel
+        :type channel: discord.abc.Messageable
+        :param member: member that joined or left
+        :type member: discord.Member
+        :param join: True for join, False for leave
+        :type join: bool
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        entry = (member.id, member.global_name or member.name, member.display_avatar.url, join, datetime.now())
+
+        if channel.id not in self.pending and now - self.last_sent.get(channel.id, float("-inf")) >= self.window:
+            self.last_sent[channel.id] = now
+            self.spawn(self.send(channel, [entry]))
+            return
+
+        if channel.id not in self.pending:
+            self.pending[channel.id] = (channel, [])
+            self.timers[channel.id] = self.spawn(self.flush_later(channel.id, self.last_sent[channel.id] + self.window - now))
+        self.pending[channel.id][1].append(entry)
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def flush_later(self, channel_id: int, delay: float):
+        await asyncio.sleep(delay)
+        self.timers.pop(channel_id, None)
+        await self.flush(channel_id)
+
+    async def flush(self, channel_id: int):
+        """
+        Sends buffered entries of channel
+        """
+        if channel_id not in self.pending:
+            return
+        channel, entries = self.pending.pop(channel_id)
+        self.last_sent[channel_id] = asyncio.get_running_loop().time()
+        await self.send(channel, entries)
+
+    async def close(self):
+        """
+        Sends everything that is still buffered and waits for messages being sent, used when cog is unloaded
+        """
+        #only waiting timers are cancelled, messages already being sent are not lost
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for channel_id in list(self.pending):
+            await self.flush(channel_id)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def send(self, channel: discord.abc.Messageable, entries: list[tuple]):
+        if len(entries) <= self.small_batch:
+            embeds = [self.member_embed(entry) for entry in entries]
+        else:
+            embeds = [self.digest_embed(entries)]
+
+        try:
+            await channel.send(embeds=embeds)
+        except Exception as e:
+            print("error: " + str(e))
+
+    def member_embed(self, entry: tuple) -> discord.Embed:
+        """
+        :return: embed of one member with avatar
+        :rtype: discord.Embed
+        """
+        user_id, name, avatar_url, join, timestamp = entry
+        embed = discord.Embed(
+            title=f"Przyleciał {name}" if join else f"Odleciał {name}",
+            color=discord.Color.green() if join else discord.Color.red()
+        )
+        embed.add_field(name="Id", value=str(user_id), inline=False)
+        embed.add_field(name="Data", value=timestamp.strftime("%Y-%m-%d %H:%M:%S"), inline=False)
+        embed.set_thumbnail(url=avatar_url)
+        return embed
+
+    def digest_embed(self, entries: list[tuple]) -> discord.Embed:
+        """
+        :return: one embed listing all members of batch, without avatars
+        :rtype: discord.Embed
+        """
+        joins = sum(1 for entry in entries if entry[3])
+        leaves = len(entries) - joins
+
+        if leaves == 0:
+            title, color = f"Przyleciało {joins} członków", discord.Color.green()
+        elif joins == 0:
+            title, color = f"Odleciało {leaves} członków", discord.Color.red()
+        else:
+            title, color = f"Przyloty: {joins}, odloty: {leaves}", discord.Color.orange()
+
+        lines = [
+            f"{'+' if join else '-'} <@{user_id}> {discord.utils.escape_markdown(name)} ({user_id})"
+            for user_id, name, _, join, _ in entries[:self.max_listed]
+        ]
+        if len(entries) > self.max_listed:
+            lines.append(f"i {len(entries) - self.max_listed} więcej")
+
+        embed = discord.Embed(title=title, description="\n".join(lines)[:4096], color=color)
+        embed.add_field(name="Od", value=entries[0][4].strftime("%Y-%m-%d %H:%M:%S"))
+        embed.add_field(name="Do", value=entries[-1][4].strftime("%Y-%m-%d %H:%M:%S"))
+        return embed
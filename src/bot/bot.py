@@ -1,46 +1,221 @@
+import asyncio
+import math
+from collections import Counter
+import os
 import discord
 from discord.ext import commands
 from discord import app_commands
 from ..aichat.chatbot import AiChat
+from ..aichat.response_cache import ResponseCache
+from ..aichat.scheduler import AiScheduler, QuotaExceededError
+from ..aichat.memory import ConversationMemory
 from .messages_cog import MessagesCog
 from .members_cog import MembersCog
 from .admin_config import AdminConfig
 from .notes_cog import NotesCog
+from .user_cache import UserCache
+from .command_tree import MetricsCommandTree
+from .config_store import ConfigStore
+from .resolver import ConfigResolver
+from .guild_config import GuildConfigStore
+from ..database.pool import close_pool
+from ..database.migrations import MigrationRunner
+from ..restapi.restcontroller import APIController
+from ..monitoring.metrics import GATEWAY_EVENTS, GATEWAY_LATENCY, measure_loop_lag, timed_listener
 
-class DiscordBot(commands.Bot):
-    
+class DiscordBot(commands.AutoShardedBot):
+
+    #minimal seconds between edits of streamed ai response
+    EDIT_INTERVAL = 1.0
 
-    def __init__(self, command_prefix, intents, config: dict, config_path: str):
-        super().__init__(command_prefix=command_prefix, intents=intents)
+    def __init__(self, command_prefix, intents, config: ConfigStore, shard_count: int = None):
+        """
+        :param config: config.json, features of bot
+        :type config: ConfigStore
+        :param shard_count: number of shards, None to use number recommended by discord
+        :type shard_count: int
+        """
+        super().__init__(command_prefix=command_prefix, intents=intents, tree_cls=MetricsCommandTree, shard_count=shard_count)
+        #the same store is passed to every cog, so nobody reads stale copy
         self.config = config
-        self.path = config_path
+        #channels, roles and raid thresholds are kept per guild in database
+        uses_database = self.config["features"]["logging"] == True or self.config["features"]["notes"] == True
+        self.guild_config = GuildConfigStore(persistent=uses_database)
+        self.guild_config.subscribe(lambda guild_id, section, changes: print(f"Config {section} of guild {guild_id} changed: {changes}"))
+        #guild that got config from config.json on this start, its old rows without guild id are assigned to it
+        self.legacy_guild = None
         self.commands_list = []
+        self.user_cache = UserCache(self)
+        self.resolver = ConfigResolver(self.guild_config)
+        self.api = None
+        self.loop_lag_task = None
+        #shard id or None -> dispatched events
+        self.shard_events = Counter()
+        self.shard_event_counters = {}
         self.setup_commands()
 
     async def on_ready(self):
         """
         Set-ups all cogs and commands
         """
-        print(f'Logged as {self.user.name} (ID: {self.user.id})') 
+        print(f'Logged as {self.user.name} (ID: {self.user.id}) on {self.shard_count} shards, {len(self.guilds)} guilds') 
+
+        self.legacy_guild = self.guild_config.reconcile(self.guilds, self.config)
+        if self.legacy_guild is not None:
+            print(f"Config from config.json moved to guild {self.legacy_guild.name}")
 
         if(self.config["features"]["logging"] == True):
             await self.add_cog(MessagesCog(self))
-            await self.add_cog(MembersCog(self, self.config))
-            await self.add_cog(AdminConfig(self, self.config, self.path))
+            await self.add_cog(MembersCog(self))
+            await self.add_cog(AdminConfig(self, self.guild_config))
 
         if(self.config["features"]["notes"] == True):
             await self.add_cog(NotesCog(self))
 
         await self.tree.sync()
 
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        MetricsCommandTree.observe(interaction, command, "ok")
+
+    def dispatch(self, event_name: str, /, *args, **kwargs):
+        #raw and socket events are dispatched next to parsed ones, they would be counted twice
+        if not event_name.startswith(("raw_", "socket_")):
+            self.count_event(args[0] if args else None)
+        super().dispatch(event_name, *args, **kwargs)
+
+    def count_event(self, subject):
+        """
+        Counts event under shard of guild of its first argument
+
+        :param subject: first argument of event (message, member, guild, channel...)
+        """
+        guild = subject if isinstance(subject, discord.Guild) else getattr(subject, "guild", None)
+        shard_id = guild.shard_id if isinstance(guild, discord.Guild) else None
+
+        counter = self.shard_event_counters.get(shard_id)
+        if counter is None:
+            counter = self.shard_event_counters[shard_id] = GATEWAY_EVENTS.labels(shard="none" if shard_id is None else str(shard_id))
+        counter.inc()
+        self.shard_events[shard_id] += 1
+
+    def shard_latency(self, shard_id: int) -> float:
+        """
+        :return: latency of shard, nan until first heartbeat or when shard is gone
+        :rtype: float
+        """
+        shard = self.get_shard(shard_id)
+        return shard.latency if shard is not None else math.nan
+
+    @timed_listener
+    async def on_shard_connect(self, shard_id: int):
+        GATEWAY_LATENCY.labels(shard=str(shard_id)).set_function(lambda: self.shard_latency(shard_id))
+
+    @timed_listener
+    async def on_guild_join(self, guild: discord.Guild):
+        self.guild_config.reconcile([guild], self.config)
+
+    @timed_listener
+    async def on_member_join(self, member: discord.Member):
+        self.user_cache.put(member)
+
+    @timed_listener
+    async def on_member_remove(self, member: discord.Member):
+        #left members are not in member cache anymore, stats still need them
+        self.user_cache.put(member)
+
+    @timed_listener
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.user_cache.put(after)
+
+    @timed_listener
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        self.user_cache.put(after)
+
+    #configured channels and roles are resolved again after any change of channels or roles
+    @timed_listener
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self.resolver.invalidate(channel.guild.id)
+
+    @timed_listener
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.resolver.invalidate(channel.guild.id)
+
+    @timed_listener
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        self.resolver.invalidate(after.guild.id)
+
+    @timed_listener
+    async def on_guild_role_create(self, role: discord.Role):
+        self.resolver.invalidate(role.guild.id)
+
+    @timed_listener
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.resolver.invalidate(role.guild.id)
+
+    @timed_listener
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        self.resolver.invalidate(after.guild.id)
+
+    async def close(self):
+        """
+        Closes bot, cogs are unloaded first so they can flush their data, then database pool is closed
+        """
+        await super().close()
+        if self.api is not None:
+            await self.api.stop()
+            self.loop_lag_task.cancel()
+        if self.config["features"]["ai-chat"] == True:
+            await self.__ai_chat.close()
+        #changes waiting for coalesced write are saved before exit
+        await self.guild_config.flush()
+        #waits for running queries in worker thread, so event loop can finish shutdown meanwhile
+        await asyncio.to_thread(close_pool)
+
     async def setup_hook(self):
+        if self.config["features"]["logging"] == True or self.config["features"]["notes"] == True:
+            applied = await MigrationRunner().migrate()
+            print(f"Database schema up to date, applied migrations: {applied}")
+            await self.guild_config.load()
+
+        #read api and metrics run in loop of bot and use the same connection pool
+        if self.config["features"].get("rest-api", False) == True:
+            self.api = APIController(
+                logging=self.config["features"]["logging"] == True,
+                notes=self.config["features"]["notes"] == True,
+                host=os.getenv('API_HOST', "127.0.0.1"),
+                port=int(os.getenv('API_PORT', 5000)),
+                token=os.getenv('API_TOKEN')
+            )
+            await self.api.start()
+            self.loop_lag_task = asyncio.create_task(measure_loop_lag())
+
         for command in self.commands_list:
             self.tree.add_command(command)
         await self.tree.sync()
 
     def setup_commands(self):
         if(self.config["features"]["ai-chat"] == True):
-            self.__ai_chat = AiChat()
+            #responses are kept in database only when bot uses database anyway
+            uses_database = self.config["features"]["logging"] == True or self.config["features"]["notes"] == True
+            self.response_cache = ResponseCache(persistent=uses_database)
+            self.__ai_chat = AiChat(cache=self.response_cache)
+            self.ai_router = self.__ai_chat.router
+            self.ai_scheduler = AiScheduler(
+                self.__ai_chat,
+                max_concurrency=int(os.getenv('AI_MAX_CONCURRENCY', 2)),
+                burst=int(os.getenv('AI_USER_BURST', 3)),
+                per_minute=float(os.getenv('AI_USER_PER_MINUTE', 1))
+            )
+            #conversation is kept per user or per channel, "off" disables memory
+            self.ai_memory_scope = os.getenv('AI_MEMORY_SCOPE', "user")
+            self.ai_memory = None
+            if self.ai_memory_scope != "off":
+                #summaries go through scheduler, so they never take place of questions of users
+                self.ai_memory = ConversationMemory(
+                    self.ai_scheduler.summarize,
+                    persistent=uses_database,
+                    max_tokens=int(os.getenv('AI_MEMORY_TOKENS', 1500))
+                )
             self.commands_list.append(
                 app_commands.Command(
                     name="ask",
@@ -48,16 +223,152 @@ class DiscordBot(commands.Bot):
                     callback=self.ask_ai
                 )
             )
+            if self.ai_memory is not None:
+                self.commands_list.append(
+                    app_commands.Command(
+                        name="ask-forget",
+                        description="forget conversation with ai chatbot",
+                        callback=self.forget_ai_conversation
+                    )
+                )
 
     
-    async def ask_ai(self, interaction: discord.Interaction, query: str):
+    @app_commands.describe(
+        fresh="ask again without using saved response",
+        follow_up="continue earlier conversation, earlier questions and answers are sent with this one"
+    )
+    async def ask_ai(self, interaction: discord.Interaction, query: str, fresh: bool = False, follow_up: bool = False):
+        """
+        Answers question with ai chatbot through scheduler, followup message shows position in queue
+        and then it is edited while response is streamed, edits are sent at most once per EDIT_INTERVAL
+        seconds to stay under discord rate limits
+
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        :param query: question of user
+        :type query: str
+        :param fresh: if True cached response is not used
+        :type fresh: bool
+        :param follow_up: if True conversation history is sent with question, standalone questions
+            are answered from cache and coalesced with the same questions of other users
+        :type follow_up: bool
+        """
         await interaction.response.defer(thinking=True)
 
-        response_from_chat = await self.__ai_chat.get_response(query=query)
+        conversation_key = self.ai_conversation_key(interaction)
+        history = None
+        if conversation_key is not None and follow_up:
+            history = await self.ai_memory.messages(conversation_key)
+
+        try:
+            ticket = self.ai_scheduler.submit(
+                interaction.user.id,
+                query,
+                priority=self.ai_priority(interaction.user),
+                use_cache=not fresh,
+                history=history,
+                context=conversation_key
+            )
+        except QuotaExceededError as e:
+            await interaction.followup.send(f"Limit zapytań, spróbuj ponownie za {math.ceil(e.retry_after)} s")
+            return
+
         embeded_message = discord.Embed(
             title="Deepseek says",
-            description=f"{query}: \n {response_from_chat}",
+            description=f"{query}: \n ...",
             color=discord.Color.from_rgb(46, 255, 137)
         )
+        followup = await interaction.followup.send(embed=embeded_message, wait=True)
+
+        #shows position in queue until request starts
+        position = 0
+        while not ticket.started.is_set():
+            if ticket.position() != position:
+                position = ticket.position()
+                embeded_message.description = f"{query}: \n Pozycja w kolejce: {position}"
+                await followup.edit(embed=embeded_message)
+            try:
+                await asyncio.wait_for(ticket.started.wait(), self.EDIT_INTERVAL * 2)
+            except asyncio.TimeoutError:
+                pass
+
+        loop = asyncio.get_running_loop()
+        response_from_chat = ""
+        last_edit = 0.0
+        edited_length = 0
+        failed = False
+
+        try:
+            async for part in ticket.stream():
+                response_from_chat += part
+                if loop.time() - last_edit >= self.EDIT_INTERVAL:
+                    embeded_message.description = self.ai_description(query, response_from_chat)
+                    await followup.edit(embed=embeded_message)
+                    last_edit = loop.time()
+                    edited_length = len(response_from_chat)
+        except Exception as e:
+            print("error: " + str(e))
+            response_from_chat += "\n\n[błąd odpowiedzi]"
+            failed = True
 
-        await interaction.followup.send(embed=embeded_message)
\ No newline at end of file
+        if edited_length != len(response_from_chat) or not response_from_chat:
+            embeded_message.description = self.ai_description(query, response_from_chat or "Brak odpowiedzi")
+            await followup.edit(embed=embeded_message)
+
+        #only complete answers are remembered, compaction runs after response is shown
+        if conversation_key is not None and response_from_chat and not failed:
+            await self.ai_memory.add_turn(conversation_key, query, response_from_chat)
+
+    async def forget_ai_conversation(self, interaction: discord.Interaction):
+        """
+        Removes conversation of user or channel from ai memory
+
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        """
+        await self.ai_memory.forget(self.ai_conversation_key(interaction))
+        await interaction.response.send_message("Rozmowa zapomniana", ephemeral=True)
+
+    def ai_conversation_key(self, interaction: discord.Interaction) -> tuple:
+        """
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        :return: key of conversation in ai memory, None when memory is off
+        :rtype: tuple
+        """
+        if self.ai_memory is None:
+            return None
+        if self.ai_memory_scope == "channel":
+            return ("channel", interaction.channel_id)
+        return ("user", interaction.user.id)
+
+    def ai_priority(self, user: discord.abc.User) -> int:
+        """
+        :param user: asking user
+        :type user: discord.abc.User
+        :return: 0 for owner, admin and mod roles from config of guild, 1 for others
+        :rtype: int
+        """
+        guild = getattr(user, "guild", None)
+        if guild is None:
+            return 1
+
+        roles = self.guild_config.guild(guild.id)["roles"]
+        role_ids = {
+            roles["owner-role-id"],
+            roles["admin-role-id"],
+            roles["mod-role-id"]
+        }
+        if any(role.id in role_ids for role in getattr(user, "roles", [])):
+            return 0
+        return 1
+
+    def ai_description(self, query: str, response: str) -> str:
+        """
+        :return: embed description with question and response cut to discord limit
+        :rtype: str
+        """
+        description = f"{query}: \n {response}"
+        if len(description) > 4096:
+            description = description[:4093] + "..."
+        return description
@@ -0,0 +1,34 @@
+import time
+import discord
+from discord import app_commands
+from ..monitoring.metrics import COMMAND_SECONDS
+
+class MetricsCommandTree(app_commands.CommandTree):
+    """
+    Command tree that measures time of every slash command from its start to its end,
+    including deferred work like streaming of ai response
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        self.observe(interaction, interaction.command, "error")
+        await super().on_error(interaction, error)
+
+    @staticmethod
+    def observe(interaction: discord.Interaction, command, status: str):
+        """
+        Records time of command, called on completion and on error
+
+        :param interaction: interaction of command
+        :type interaction: discord.Interaction
+        :param command: finished command
+        :param status: "ok" or "error"
+        :type status: str
+        """
+        started = interaction.extras.get("started")
+        if started is None or command is None:
+            return
+        COMMAND_SECONDS.labels(command=command.qualified_name, status=status).observe(time.perf_counter() - started)
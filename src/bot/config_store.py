@@ -0,0 +1,31 @@
+import json
+
+class ConfigStore:
+    """
+    Single in-memory config.json shared by bot and all cogs.
+
+    Sections are read like dict (config["features"]["logging"]). File holds only settings of bot
+    and legacy config of guild from time when bot worked for one guild, it is read once on start
+    and never written, settings changed by admins are kept per guild in GuildConfigStore.
+    """
+
+    def __init__(self, path: str):
+        """
+        Loads config from file
+
+        :param path: path of config.json
+        :type path: str
+        """
+        self.path = path
+
+        with open(path, 'r', encoding="UTF-8") as config_file:
+            self.data = json.load(config_file)
+
+    def __getitem__(self, section: str) -> dict:
+        return self.data[section]
+
+    def __contains__(self, section: str) -> bool:
+        return section in self.data
+
+    def get(self, section: str, default=None) -> dict:
+        return self.data.get(section, default)
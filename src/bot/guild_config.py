@@ -0,0 +1,220 @@
+import asyncio
+import copy
+import json
+import discord
+from ..database.pool import DatabasePool, get_pool
+from ..monitoring.metrics import register_queries
+from .config_store import ConfigStore
+
+class GuildConfig:
+    """
+    Config of one guild, read like ConfigStore (config["logging"]["commands-channel-id"]) and changed with set() or update()
+    """
+
+    def __init__(self, store: "GuildConfigStore", guild_id: int, data: dict):
+        self.store = store
+        self.guild_id = guild_id
+        self.data = data
+
+    def __getitem__(self, section: str) -> dict:
+        return self.data[section]
+
+    def __contains__(self, section: str) -> bool:
+        return section in self.data
+
+    def get(self, section: str, default=None) -> dict:
+        return self.data.get(section, default)
+
+    def set(self, section: str, key: str, value):
+        """
+        Sets one value and schedules save
+        """
+        self.store.update(self.guild_id, section, {key: value})
+
+    def update(self, section: str, values: dict):
+        """
+        Sets many values of section at once and schedules save
+        """
+        self.store.update(self.guild_id, section, values)
+
+class GuildConfigStore:
+    """
+    Configs of all guilds (channels, roles, raid thresholds) kept in memory, one row per guild in guild_config table.
+
+    Configs are loaded once on start, guild without row gets zeroed channels and roles. Changes notify
+    subscribers at once and writes are coalesced: changed guilds are written together
+    save_delay seconds after first change, so burst of admin commands makes one write.
+    Without persistence configs live only in memory.
+    """
+
+    #sections of guild that has no config yet
+    DEFAULTS = {
+        "logging": {
+            "logging-channel-group-id": 0,
+            "members-joins-channel-id": 0,
+            "members-leaves-channel-id": 0,
+            "messages-stats-channel-id": 0,
+            "commands-channel-id": 0,
+            "admin-voice-channel": 0
+        },
+        "roles": {
+            "mod-role-id": 0,
+            "admin-role-id": 0,
+            "owner-role-id": 0
+        }
+    }
+
+    #sections of config.json that were per guild when bot worked for one guild
+    SECTIONS = ("logging", "roles", "raid")
+
+    def __init__(self, pool: DatabasePool = None, *, persistent: bool = False, save_delay: float = 1.0):
+        """
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param persistent: if configs are saved in Postgres
+        :type persistent: bool
+        :param save_delay: seconds for which changes are collected before write
+        :type save_delay: float
+        """
+        self.persistent = persistent
+        self.pool = (pool if pool is not None else get_pool()) if persistent else None
+        self.save_delay = save_delay
+
+        #guild id -> GuildConfig
+        self.guilds = {}
+        self.subscribers = []
+        self.dirty = set()
+        self.save_task = None
+        self.lock = asyncio.Lock()
+        self.writes = 0
+
+        with open("src/database/sql/guild_config_queries.sql", 'r') as file:
+            self.queries = register_queries(file.name, file.read().split(';'))
+
+    async def load(self):
+        """
+        Loads configs of all guilds from database, startup is aborted when it fails,
+        otherwise reconcile would save config.json and defaults over configs in database
+
+        :raises Exception: error of database
+        """
+        if not self.persistent:
+            return
+
+        try:
+            rows = await self.pool.fetchall(self.queries[0])
+        except Exception as e:
+            print("error: guild configs not loaded: " + str(e))
+            raise
+
+        for guild_id, settings in rows:
+            self.guilds[guild_id] = GuildConfig(self, guild_id, settings)
+
+    def guild(self, guild_id: int) -> GuildConfig:
+        """
+        :param guild_id: id of guild
+        :type guild_id: int
+        :return: config of guild, default one when guild has no config yet
+        :rtype: GuildConfig
+        """
+        config = self.guilds.get(guild_id)
+        if config is None:
+            config = self.guilds[guild_id] = GuildConfig(self, guild_id, copy.deepcopy(self.DEFAULTS))
+        return config
+
+    def reconcile(self, guilds: list[discord.Guild], legacy: ConfigStore) -> discord.Guild:
+        """
+        Makes and saves config of every guild that has none. Guild that owns commands channel
+        from config.json gets its logging, roles and raid sections, so config of bot that worked
+        for one guild is moved to database
+
+        :param guilds: guilds of bot
+        :type guilds: list[discord.Guild]
+        :param legacy: config.json
+        :type legacy: ConfigStore
+        :return: guild that got config from config.json, None when nothing was moved
+        :rtype: discord.Guild
+        """
+        commands_channel_id = legacy.get("logging", {}).get("commands-channel-id", 0)
+        legacy_guild = None
+
+        for guild in guilds:
+            if guild.id in self.guilds:
+                continue
+
+            data = copy.deepcopy(self.DEFAULTS)
+            if commands_channel_id and guild.get_channel(commands_channel_id) is not None:
+                data.update({section: copy.deepcopy(legacy[section]) for section in self.SECTIONS if section in legacy})
+                legacy_guild = guild
+
+            self.guilds[guild.id] = GuildConfig(self, guild.id, data)
+            self.dirty.add(guild.id)
+
+        self.schedule_save()
+        return legacy_guild
+
+    def subscribe(self, callback):
+        """
+        :param callback: function (guild_id, section, changes) called after every change, changes is dict of changed keys and new values
+        :type callback: Callable
+        """
+        self.subscribers.append(callback)
+
+    def update(self, guild_id: int, section: str, values: dict):
+        """
+        Sets many values of section of guild at once and schedules save, subscribers get only values that changed
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param section: name of section, created when missing
+        :type section: str
+        :param values: keys and new values
+        :type values: dict
+        """
+        current = self.guild(guild_id).data.setdefault(section, {})
+        changes = {key: value for key, value in values.items() if current.get(key) != value}
+        if not changes:
+            return
+
+        current.update(changes)
+        self.dirty.add(guild_id)
+
+        for callback in self.subscribers:
+            try:
+                callback(guild_id, section, changes)
+            except Exception as e:
+                print("error: " + str(e))
+
+        self.schedule_save()
+
+    def schedule_save(self):
+        if self.dirty and (self.save_task is None or self.save_task.done()):
+            self.save_task = asyncio.create_task(self.save_later())
+
+    async def save_later(self):
+        await asyncio.sleep(self.save_delay)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Writes configs of changed guilds now, used also on shutdown
+        """
+        async with self.lock:
+            if not self.dirty:
+                return
+
+            #snapshot is taken on event loop, worker thread never reads dict that is being changed
+            rows = [(guild_id, json.dumps(self.guilds[guild_id].data)) for guild_id in self.dirty]
+            dirty = self.dirty
+            self.dirty = set()
+
+            if not self.persistent:
+                return
+
+            try:
+                await self.pool.execute_values(self.queries[1], rows)
+                self.writes += 1
+            except Exception as e:
+                #next change or flush tries again
+                self.dirty |= dirty
+                print("error: " + str(e))
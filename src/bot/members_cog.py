@@ -1,56 +1,136 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from datetime import datetime
+from datetime import datetime, timezone
 from ..database.logging_database import Logging_Database
+from .announcer import MemberAnnouncer
+from .raid_detector import RaidDetector, RaidAlert
+from ..monitoring.metrics import timed_listener
 
 class MembersCog(commands.Cog):
-    def __init__(self, bot: commands.Bot, config: dict):
-        self.config = config
+    def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.__sql = Logging_Database()
+        #raids would flood channel with one message per member
+        self.announcer = MemberAnnouncer()
+        self.raid_detector = RaidDetector(bot.guild_config)
+        #guild id -> verification level from before lockdown
+        self.lockdowns = {}
+
+    async def cog_load(self):
+        #joins and leaves from time when bot worked for one guild get its id before they are reconciled per guild
+        if self.bot.legacy_guild is not None:
+            statuses = await self.__sql.assign_statuses_to_guild(self.bot.legacy_guild.id)
+            print(f"Joins and leaves assigned to {self.bot.legacy_guild.name}: {statuses}")
+
+        timestamp = datetime.now(timezone.utc)
+        for guild in self.bot.guilds:
+            written, joins, leaves = await self.__sql.reconcile_members(guild.id, guild.members, timestamp)
+            print(f"Members of {guild.name} reconciled: {written} written, {joins} joins and {leaves} leaves while offline")
+
+    async def cog_unload(self):
+        await self.announcer.close()
 
-        for user in self.bot.guilds[0].members:
-            self.__sql.add_member_to_database(user)
+    @commands.Cog.listener()
+    @timed_listener
+    async def on_guild_join(self, guild: discord.Guild):
+        written, joins, leaves = await self.__sql.reconcile_members(guild.id, guild.members, datetime.now(timezone.utc))
+        print(f"Members of {guild.name} reconciled: {written} written, {joins} joins and {leaves} leaves")
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_member_join(self, member: discord.Member):
         if member == self.bot.user:
             return
+
+        alert = self.raid_detector.observe(member)
+        if alert is not None:
+            await self.raid_alert(member.guild, alert)
         
-        for channel in member.guild.channels:
-            if channel.id == self.config["logging"]["members-joins-channel-id"]:
-                embed = discord.Embed(
-                    title=f"Przyleciał {member.global_name}",
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="Id", value=str(member.id), inline=False)
-                embed.add_field(name="Data",value=str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")), inline=False)
-                embed.set_thumbnail(url=member.display_avatar.url)
-                channel.send(embed=embed)
+        channel = self.bot.resolver.channel(member.guild, "joins")
+        if channel is not None:
+            self.announcer.announce(channel, member, join=True)
         
-        self.__sql.add_member_to_database(member=member)
-        await self.__sql.track_member_joins_and_leaves(member, True, False, str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        await self.__sql.add_member_to_database(member=member)
+        await self.__sql.track_member_joins_and_leaves(member, True, False, datetime.now(timezone.utc))
+
+    async def raid_alert(self, guild: discord.Guild, alert: RaidAlert):
+        """
+        Pings mod role in commands channel and locks guild down when "lockdown" is set in raid config
+
+        :param guild: raided guild
+        :type guild: discord.Guild
+        :param alert: signals that tripped detector
+        :type alert: RaidAlert
+        """
+        locked = False
+        if self.raid_detector.setting(guild.id, "lockdown") and guild.id not in self.lockdowns:
+            try:
+                previous = guild.verification_level
+                await guild.edit(verification_level=discord.VerificationLevel.highest, reason="Raid detected")
+                self.lockdowns[guild.id] = previous
+                locked = True
+            except Exception as e:
+                print("error: " + str(e))
+
+        channel = self.bot.resolver.channel(guild, "commands")
+        if channel is None:
+            print(f"Raid detected on {guild.name}: {alert}")
+            return
+
+        embed = discord.Embed(
+            title="Wykryto raid",
+            color=discord.Color.dark_red()
+        )
+        embed.add_field(name=f"Przyloty w {alert.window} s", value=alert.joins)
+        embed.add_field(name="Nowe konta", value=alert.young)
+        embed.add_field(name=f"Nazwy `{alert.name_pattern}`", value=alert.same_name)
+        if locked:
+            embed.add_field(name="Lockdown", value="Włączony najwyższy poziom weryfikacji, wyłącz przez /raid-unlock", inline=False)
+
+        role = self.bot.resolver.role(guild, "mod")
+        try:
+            await channel.send(
+                content=role.mention if role is not None else None,
+                embed=embed,
+                allowed_mentions=discord.AllowedMentions(roles=[role] if role is not None else False)
+            )
+        except Exception as e:
+            print("error: " + str(e))
+
+    @app_commands.command(name="raid-unlock", description="restores verification level from before raid lockdown")
+    @app_commands.default_permissions(administrator=True)
+    async def raid_unlock(self, interaction: discord.Interaction):
+        previous = self.lockdowns.get(interaction.guild.id)
+        if previous is None:
+            await interaction.response.send_message("Guild is not locked down", ephemeral=True)
+            return
+
+        #saved level is kept until edit succeeds, so failed unlock can be retried
+        try:
+            await interaction.guild.edit(verification_level=previous, reason="Raid lockdown lifted")
+        except discord.HTTPException as e:
+            print("error: " + str(e))
+            await interaction.response.send_message(f"Unlock failed: {e}", ephemeral=True)
+            return
+
+        self.lockdowns.pop(interaction.guild.id, None)
+        await interaction.response.send_message("Unlocked", ephemeral=True)
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_member_remove(self, member: discord.Member):
         if member == self.bot.user:
             return
         
-        for channel in member.guild.channels:
-            if channel.id == self.config["logging"]["members-leaves-channel-id"]:
-                embed = discord.Embed(
-                    title=f"Odleciał {member.global_name}",
-                    color=discord.Color.red()
-                )
-                embed.add_field(name="Id", value=str(member.id), inline=False)
-                embed.add_field(name="Data",value=str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")), inline=False)
-                embed.set_thumbnail(url=member.display_avatar.url)
-                channel.send(embed=embed)
+        channel = self.bot.resolver.channel(member.guild, "leaves")
+        if channel is not None:
+            self.announcer.announce(channel, member, join=False)
         
-        await self.__sql.track_member_joins_and_leaves(member, False, True, str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        await self.__sql.track_member_joins_and_leaves(member, False, True, datetime.now(timezone.utc))
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_member_update(self, before: discord.Member, after: discord.Member):
         if before == self.bot.user:
             return
@@ -61,23 +141,8 @@ class MembersCog(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def send_stats(self, interaction: discord.Interaction):
         await interaction.response.defer(thinking=True)
-        leaves = []
-        joins = []
-        members = []
-
-        members = await self.__sql.get_all_members()
-        statuses_result = await self.__sql.get_all_statuses()
-
-        for status in statuses_result:
-            if status[3] == True: #join
-                joins.append(status)
-            if status[4] == True: #leaves
-                leaves.append(status)
-
-
-        last_join = await self.bot.fetch_user(joins[len(joins)-1][1])
-        last_leave = await self.bot.fetch_user(leaves[-1][1])
 
+        stats = await self.__sql.get_member_stats(interaction.guild.id)
 
         #Embed z statystykami 
         embed_stats = discord.Embed(
@@ -86,58 +151,52 @@ class MembersCog(commands.Cog):
         )
         embed_stats.add_field(
             name="Ilość członków",
-            value=len(members)
+            value=interaction.guild.member_count
         )
         embed_stats.add_field(
             name="Wszystkie Przyloty",
-            value=len(joins)
+            value=stats.joins
         )
         embed_stats.add_field(
             name="Wszystkie Odloty",
-            value=len(leaves)
+            value=stats.leaves
         )
+        embeds = [embed_stats]
 
         #Embed z ostatnim odlotem
-        embed_leave = discord.Embed(
-            title=f"Ostatni odlot gracza {last_leave.global_name}",
-            color=discord.Color.red()
-        )
-        embed_leave.add_field(
-            name="Id",
-            value=last_leave.id
-        )
-        embed_leave.add_field(
-            name='Data',
-            value=leaves[-1][2]
-        )
-        embed_leave.set_thumbnail(url=last_leave.display_avatar.url)
-        
+        if stats.last_leave_user_id is not None:
+            last_leave = await self.bot.user_cache.get(stats.last_leave_user_id)
+            embed_leave = discord.Embed(
+                title=f"Ostatni odlot gracza {last_leave.global_name}",
+                color=discord.Color.red()
+            )
+            embed_leave.add_field(
+                name="Id",
+                value=last_leave.id
+            )
+            embed_leave.add_field(
+                name='Data',
+                value=stats.last_leave_time_stamp.astimezone().strftime("%Y-%m-%d %H:%M:%S")
+            )
+            embed_leave.set_thumbnail(url=last_leave.display_avatar.url)
+            embeds.append(embed_leave)
 
         #Embed z osttanim przylotem
-        embed_join = discord.Embed(
-            title=f"Ostatni przylot gracza {last_join.global_name}",
-            color=discord.Color.green()
-        )
-        embed_join.add_field(
-            name="Id",
-            value=last_join.id
-        )
-        embed_join.add_field(
-            name='Data',
-            value=joins[-1][2]
-        )
-        embed_join.set_thumbnail(url=last_join.display_avatar.url)
-
-        await interaction.followup.send(
-            embeds=[
-                embed_stats,
-                embed_leave,
-                embed_join
-            ]
-        )
-
-
-
-
-
-    
\ No newline at end of file
+        if stats.last_join_user_id is not None:
+            last_join = await self.bot.user_cache.get(stats.last_join_user_id)
+            embed_join = discord.Embed(
+                title=f"Ostatni przylot gracza {last_join.global_name}",
+                color=discord.Color.green()
+            )
+            embed_join.add_field(
+                name="Id",
+                value=last_join.id
+            )
+            embed_join.add_field(
+                name='Data',
+                value=stats.last_join_time_stamp.astimezone().strftime("%Y-%m-%d %H:%M:%S")
+            )
+            embed_join.set_thumbnail(url=last_join.display_avatar.url)
+            embeds.append(embed_join)
+
+        await interaction.followup.send(embeds=embeds)
@@ -1,45 +1,167 @@
+import asyncio
 import discord
-from discord.ext import commands
-from datetime import datetime
+from discord.ext import commands, tasks
+from datetime import datetime, timedelta, timezone
 from discord import app_commands
 from ..database.logging_database import Logging_Database
+from ..monitoring.metrics import timed_listener
+from ..database.write_queue import WriteBehindQueue
+from ..database.partitions import PartitionManager
 
 
 class MessagesCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.__sql = Logging_Database()
+        self.__queue = WriteBehindQueue(self.__sql)
+        self.__partitions = PartitionManager()
+
+    async def cog_load(self):
+        self.__queue.start()
+        self.maintain_partitions.start()
+
+        self.__backfill_task = asyncio.create_task(self.backfill_ids())
+
+    async def cog_unload(self):
+        self.maintain_partitions.cancel()
+        #flushes everything that is still waiting in queue
+        await self.__queue.stop()
+
+    async def backfill_ids(self):
+        #messages logged before ids were stored get them from current channel names
+        channels = [
+            (guild.name, channel.name, guild.id, channel.id)
+            for guild in self.bot.guilds
+            for channel in guild.channels
+        ]
+        await self.__sql.backfill_channel_ids(channels)
+
+        #rest of them is from time when bot worked for one guild, runs after backfill so channel ids are filled first
+        if self.bot.legacy_guild is not None:
+            assigned = await self.__sql.assign_messages_to_guild(self.bot.legacy_guild.id)
+            if assigned:
+                print(f"{assigned} messages assigned to {self.bot.legacy_guild.name}")
+
+    @tasks.loop(hours=12)
+    async def maintain_partitions(self):
+        """
+        Creates partitions for upcoming months and detaches partitions older than retention
+        """
+        created, detached = await self.__partitions.maintain()
+        if created or detached:
+            print(f"Partitions created: {created}, detached: {detached}")
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_message(self, message: discord.Message):
 
         if message.author == self.bot.user:
             return
 
-        await self.__sql.add_message_to_database(message=message,
-            timestamp=str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        await self.__queue.put_message(message=message, timestamp=message.created_at)
         
         await self.bot.process_commands(message)
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_message_delete(self, message: discord.Message):
 
         if message.author == self.bot.user:
             return
         
-        await self.__sql.add_deleted_message(message=message)
+        await self.__queue.put_delete(message=message)
 
     @commands.Cog.listener()
+    @timed_listener
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
 
         if before.author == self.bot.user:
             return
         
-        await self.__sql.add_edited_message_to_database(before=before, after=after)
+        await self.__queue.put_edit(before=before, after=after)
 
     @app_commands.command(name="message-stats", description="gets messages stats")
-    async def get_messages_stats(self, interaction: discord.Interaction):
-        pass
-        
+    @app_commands.describe(hours="length of time window in hours, default last 24 hours")
+    @app_commands.default_permissions(administrator=True)
+    async def get_messages_stats(self, interaction: discord.Interaction, hours: app_commands.Range[int, 1, 8760] = 24):
+        """
+        Sends top channels, top posters and activity trend of last hours to messages stats channel,
+        stats are read from hourly counts so they do not scan messages
 
-        
+        :param interaction: interaction object
+        :type interaction: discord.Interaction
+        :param hours: length of time window
+        :type hours: int
+        """
+        await interaction.response.defer(thinking=True)
+
+        #window ends with current hour, counts are kept per full hour
+        until = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        since = until - timedelta(hours=hours)
+        stats = await self.__sql.get_message_stats(interaction.guild.id, since, until)
+
+        total = sum(messages for hour, messages in stats.hourly if hour >= since)
+        previous = sum(messages for hour, messages in stats.hourly if hour < since)
+
+        embed = discord.Embed(
+            title=f"Statystyki wiadomości z ostatnich {hours} h",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Wiadomości", value=total)
+        if previous:
+            embed.add_field(name="Zmiana", value=f"{(total - previous) / previous:+.0%}")
+        else:
+            embed.add_field(name="Zmiana", value="-")
+
+        embed.add_field(
+            name="Najaktywniejsze kanały",
+            value="\n".join(f"<#{channel_id}> ({channel_name}): {messages}" for channel_id, channel_name, messages in stats.top_channels) or "Brak",
+            inline=False
+        )
+        embed.add_field(
+            name="Najaktywniejsi użytkownicy",
+            value="\n".join(f"<@{user_id}>: {messages}" for user_id, messages in stats.top_users) or "Brak",
+            inline=False
+        )
+        embed.add_field(
+            name="Aktywność",
+            value=self.render_trend(stats.hourly, since, hours),
+            inline=False
+        )
+
+        channel = self.bot.resolver.channel(interaction.guild, "stats")
+        if channel is None or channel == interaction.channel:
+            await interaction.followup.send(embed=embed)
+        else:
+            await channel.send(embed=embed)
+            await interaction.followup.send(f"Wysłano na {channel.mention}")
+
+    def render_trend(self, hourly: list[tuple], since: datetime, hours: int, buckets: int = 12) -> str:
+        """
+        Renders messages of window as text bar chart
+
+        :param hourly: list of (hour, messages)
+        :type hourly: list[tuple]
+        :param since: start of window
+        :type since: datetime
+        :param hours: length of window
+        :type hours: int
+        :param buckets: max number of bars
+        :type buckets: int
+        :return: chart in code block
+        :rtype: str
+        """
+        width = -(-hours // buckets)
+        counts = [0] * -(-hours // width)
+        for hour, messages in hourly:
+            if hour >= since:
+                counts[int((hour - since).total_seconds() // 3600) // width] += messages
+
+        top = max(counts) or 1
+        lines = []
+        for i, count in enumerate(counts):
+            start = (since + timedelta(hours=i * width)).astimezone()
+            label = start.strftime("%d.%m %H:%M") if width < 24 else start.strftime("%d.%m")
+            lines.append(f"{label} {'█' * round(count / top * 15):<15} {count}")
+
+        return "```\n" + "\n".join(lines) + "\n```"
@@ -4,6 +4,7 @@ from discord import app_commands
 from datetime import datetime
 import random
 from ..database.notes_database import Note, Notes_Database
+from .paginator import KeysetPaginator
 
 class NotesCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -22,7 +23,7 @@ class NotesCog(commands.Cog):
             content=content,
             title=title,
             creation_date=str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-            members_ids=[member_1,member_2,member_3]
+            members_ids=[member.id for member in (member_1, member_2, member_3) if member]
         )
         await self.__sql.add_note(note)
         await interaction.response.send_message("Zapisano")
@@ -37,15 +38,16 @@ class NotesCog(commands.Cog):
 
         """
         await interaction.response.defer(thinking=True)
-        notes = await self.__sql.get_all_member_notes(interaction.user)
+        notes = await self.__sql.get_member_note_titles(interaction.user)
         embed = discord.Embed(
             title="Twoje notatki",
             color=discord.Color.blue()
         )
-        for note in notes:
+        #embed can have only 25 fields
+        for note_id, title in notes[:25]:
             embed.add_field(
-                name=f"Notatka: {note.note_id}",
-                value=f"Tytuł: {note.title}",
+                name=f"Notatka: {note_id}",
+                value=f"Tytuł: {title}",
                 inline=False
             )
 
@@ -64,6 +66,10 @@ class NotesCog(commands.Cog):
         """
         await interaction.response.defer(thinking=True)
         note = await self.__sql.get_note_by_id(note_id)
+        if note is None:
+            await interaction.followup.send("Nie znaleziono notatki")
+            return
+
         embed = discord.Embed(
             title=f"Notatka: {note.note_id}",
             color=discord.Color.dark_gold()
@@ -78,4 +84,78 @@ class NotesCog(commands.Cog):
             value=note.creation_date,
             inline=False
         )
+        members = [f"<@{member_id}>" for member_id in note.members_ids if member_id != note.author_id]
+        if members:
+            embed.add_field(
+                name="Członkowie",
+                value=", ".join(members),
+                inline=False
+            )
+        try:
+            author = await self.bot.user_cache.get(note.author_id)
+            embed.set_author(name=author.global_name or author.name, icon_url=author.display_avatar.url)
+        except discord.NotFound:
+            pass
         await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="search-notes", description="searches in your notes")
+    @app_commands.describe(
+        query="searched words, \"phrase\", or, -excluded word",
+        author="only notes written by this member",
+        since="only notes created since this day (YYYY-MM-DD)",
+        until="only notes created before this day (YYYY-MM-DD)"
+    )
+    async def search_notes(self, interaction: discord.Interaction, query: str, author: discord.User = None,
+                           since: str = None, until: str = None):
+        """
+        full text search in titles and contents of notes of user, best matches are shown first page by page
+
+        :param interaction: discord interaction
+        :type interaction: discord.Interaction
+        :param query: searched text
+        :type query: str
+        :param author: optional author filter
+        :type author: discord.User
+        :param since: optional start day YYYY-MM-DD
+        :type since: str
+        :param until: optional end day YYYY-MM-DD, exclusive
+        :type until: str
+        """
+        await interaction.response.defer(thinking=True)
+
+        try:
+            for day in (since, until):
+                if day is not None:
+                    datetime.strptime(day, "%Y-%m-%d")
+        except ValueError:
+            await interaction.followup.send("Niepoprawna data, użyj YYYY-MM-DD")
+            return
+
+        async def fetch_page(after):
+            return await self.__sql.search_notes(
+                query,
+                interaction.user,
+                author_id=author.id if author else None,
+                since=since,
+                until=until,
+                after=after,
+                page_size=10
+            )
+
+        def render(rows, page_number):
+            embed = discord.Embed(
+                title=f"Notatki: {query}",
+                color=discord.Color.dark_gold()
+            )
+            for note_id, title, author_id, creation_date, fragment, rank in rows:
+                embed.add_field(
+                    name=f"{note_id}: {title}",
+                    value=f"{fragment[:300]}\n<@{author_id}> {creation_date}",
+                    inline=False
+                )
+            if not rows:
+                embed.description = "Brak notatek"
+            embed.set_footer(text=f"Strona {page_number}")
+            return embed
+
+        await KeysetPaginator(fetch_page, render, author_id=interaction.user.id).send(interaction)
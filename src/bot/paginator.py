@@ -0,0 +1,68 @@
+import discord
+
+class KeysetPaginator(discord.ui.View):
+    """
+    Previous and next buttons for results read page by page with keyset pagination.
+
+    fetch_page(key) returns (rows, key of next page or None), key None means first page.
+    render(rows, page_number) returns embed for rows. Keys of visited pages are remembered,
+    so going back does not need offsets.
+    """
+
+    def __init__(self, fetch_page, render, *, author_id: int, timeout: float = 300):
+        """
+        :param fetch_page: async function (key) -> (rows, next_key)
+        :type fetch_page: Callable
+        :param render: function (rows, page_number) -> discord.Embed
+        :type render: Callable
+        :param author_id: only this user can use buttons
+        :type author_id: int
+        :param timeout: seconds after which buttons stop working
+        :type timeout: float
+        """
+        super().__init__(timeout=timeout)
+        self.fetch_page = fetch_page
+        self.render = render
+        self.author_id = author_id
+        self.keys = [None]
+        self.page = 0
+        self.next_key = None
+
+    async def load(self) -> discord.Embed:
+        """
+        Fetches current page and updates buttons
+
+        :return: embed with current page
+        :rtype: discord.Embed
+        """
+        rows, self.next_key = await self.fetch_page(self.keys[self.page])
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.next_key is None
+        return self.render(rows, self.page + 1)
+
+    async def send(self, interaction: discord.Interaction):
+        """
+        Sends first page as followup to deferred interaction
+
+        :param interaction: deferred interaction
+        :type interaction: discord.Interaction
+        """
+        embed = await self.load()
+        await interaction.followup.send(embed=embed, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        embed = await self.load()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.keys) == self.page + 1:
+            self.keys.append(self.next_key)
+        self.page += 1
+        embed = await self.load()
+        await interaction.response.edit_message(embed=embed, view=self)
@@ -0,0 +1,162 @@
+import re
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import discord
+from .guild_config import GuildConfigStore
+
+@dataclass
+class RaidAlert:
+    """
+    Signals that tripped detector
+
+    :param joins: joins in window
+    :type joins: int
+    :param young: joins of accounts younger than young-account-days in window
+    :type young: int
+    :param same_name: joins with same name pattern as last member in window
+    :type same_name: int
+    :param name_pattern: that name pattern, digits are replaced with #
+    :type name_pattern: str
+    :param window: length of window in seconds
+    :type window: int
+    """
+    joins: int
+    young: int
+    same_name: int
+    name_pattern: str
+    window: int
+
+class GuildJoins:
+    """
+    Ring buffer of recent joins of one guild with running counters, so every signal
+    is updated in constant time when join enters or leaves window
+    """
+
+    def __init__(self, capacity: int):
+        #(monotonic time, young account, name pattern)
+        self.joins = deque()
+        self.capacity = capacity
+        self.young = 0
+        self.names = Counter()
+        self.alerted_at = float("-inf")
+
+    def push(self, entry: tuple):
+        if len(self.joins) >= self.capacity:
+            self.pop()
+        self.joins.append(entry)
+        self.young += entry[1]
+        self.names[entry[2]] += 1
+
+    def pop(self):
+        _, young, name = self.joins.popleft()
+        self.young -= young
+        self.names[name] -= 1
+        if self.names[name] == 0:
+            del self.names[name]
+
+    def expire(self, older_than: float):
+        while self.joins and self.joins[0][0] < older_than:
+            self.pop()
+
+class RaidDetector:
+    """
+    Detects join raids from sliding window of recent joins of every guild.
+
+    Raid is reported when in last window-seconds joined at least "joins" members, or at least "young-joins"
+    accounts younger than young-account-days, or at least "same-name" members with same name pattern
+    (lowercase name with runs of digits and separators collapsed, "Raider_123" and "raider88" are both "raider#").
+    Thresholds are read from "raid" section of guild config on every join, so changes apply at once.
+    Each guild keeps at most capacity joins, after alert guild is quiet for cooldown-seconds.
+    """
+
+    DEFAULTS = {
+        "enabled": True,
+        "window-seconds": 30,
+        "joins": 10,
+        "young-joins": 5,
+        "young-account-days": 7,
+        "same-name": 4,
+        "cooldown-seconds": 300,
+        "lockdown": False
+    }
+
+    NAME_PATTERN = re.compile(r"[\d_.\-]+")
+
+    def __init__(self, config: GuildConfigStore, *, capacity: int = 512):
+        """
+        :param config: configs of guilds with "raid" sections
+        :type config: GuildConfigStore
+        :param capacity: max joins kept per guild, limits memory during big raids
+        :type capacity: int
+        """
+        self.config = config
+        self.capacity = capacity
+        self.guilds = {}
+        self.alerts = 0
+
+    def setting(self, guild_id: int, key: str):
+        return self.config.guild(guild_id).get("raid", {}).get(key, self.DEFAULTS[key])
+
+    def name_pattern(self, name: str) -> str:
+        """
+        :return: lowercase name with runs of digits and separators replaced by #
+        :rtype: str
+        """
+        return self.NAME_PATTERN.sub("#", name.lower())
+
+    def observe(self, member: discord.Member, now: float = None) -> RaidAlert:
+        """
+        Adds join of member to window of its guild
+
+        :param member: member that joined
+        :type member: discord.Member
+        :param now: monotonic time of join, default now
+        :type now: float
+        :return: alert when thresholds tripped and guild is not in cooldown, else None
+        :rtype: RaidAlert
+        """
+        guild_id = member.guild.id
+        if not self.setting(guild_id, "enabled"):
+            return None
+
+        now = time.monotonic() if now is None else now
+        window = self.setting(guild_id, "window-seconds")
+        young = (datetime.now(timezone.utc) - member.created_at).days < self.setting(guild_id, "young-account-days")
+        pattern = self.name_pattern(member.name)
+
+        joins = self.guilds.get(guild_id)
+        if joins is None:
+            joins = self.guilds[guild_id] = GuildJoins(self.capacity)
+        joins.expire(now - window)
+        joins.push((now, young, pattern))
+
+        tripped = (
+            len(joins.joins) >= self.setting(guild_id, "joins")
+            or joins.young >= self.setting(guild_id, "young-joins")
+            or joins.names[pattern] >= self.setting(guild_id, "same-name")
+        )
+        if not tripped or now - joins.alerted_at < self.setting(guild_id, "cooldown-seconds"):
+            return None
+
+        joins.alerted_at = now
+        self.alerts += 1
+        return RaidAlert(
+            joins=len(joins.joins),
+            young=joins.young,
+            same_name=joins.names[pattern],
+            name_pattern=pattern,
+            window=window
+        )
+
+    def stats(self) -> dict:
+        """
+        :return: tracked guilds, joins in buffers and sent alerts
+        :rtype: dict
+        """
+        return {
+            "guilds": len(self.guilds),
+            "joins": sum(len(joins.joins) for joins in self.guilds.values()),
+            "alerts": self.alerts
+        }
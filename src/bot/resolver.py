@@ -0,0 +1,106 @@
+import discord
+from .guild_config import GuildConfigStore
+
+class ConfigResolver:
+    """
+    Resolves logical names of configured channels and roles ("joins", "owner"...) to live
+    discord objects of guild in constant time.
+
+    Resolved objects (or None when channel or role does not exist) are cached per guild,
+    cache of guild is dropped on channel and role create, delete and update events
+    and when channels or roles in config of guild change.
+    """
+
+    #logical name -> key in "logging" section of guild config
+    CHANNELS = {
+        "logging-category": "logging-channel-group-id",
+        "joins": "members-joins-channel-id",
+        "leaves": "members-leaves-channel-id",
+        "stats": "messages-stats-channel-id",
+        "commands": "commands-channel-id",
+        "admin-voice": "admin-voice-channel"
+    }
+
+    #logical name -> key in "roles" section of guild config
+    ROLES = {
+        "mod": "mod-role-id",
+        "admin": "admin-role-id",
+        "owner": "owner-role-id"
+    }
+
+    def __init__(self, config: GuildConfigStore):
+        """
+        :param config: configs of guilds with ids of channels and roles
+        :type config: GuildConfigStore
+        """
+        self.config = config
+        #(guild id, logical name) -> channel, role or None
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+        config.subscribe(self.on_config_change)
+
+    def channel(self, guild: discord.Guild, name: str) -> discord.abc.GuildChannel:
+        """
+        :param guild: guild of channel
+        :type guild: discord.Guild
+        :param name: logical name from CHANNELS
+        :type name: str
+        :return: configured channel or None when it is not set or does not exist
+        :rtype: discord.abc.GuildChannel
+        """
+        key = (guild.id, name)
+        if key in self.cache:
+            self.hits += 1
+            return self.cache[key]
+
+        self.misses += 1
+        channel = guild.get_channel(self.config.guild(guild.id)["logging"].get(self.CHANNELS[name], 0))
+        self.cache[key] = channel
+        return channel
+
+    def role(self, guild: discord.Guild, name: str) -> discord.Role:
+        """
+        :param guild: guild of role
+        :type guild: discord.Guild
+        :param name: logical name from ROLES
+        :type name: str
+        :return: configured role or None when it is not set or does not exist
+        :rtype: discord.Role
+        """
+        key = (guild.id, name)
+        if key in self.cache:
+            self.hits += 1
+            return self.cache[key]
+
+        self.misses += 1
+        role = guild.get_role(self.config.guild(guild.id)["roles"].get(self.ROLES[name], 0))
+        self.cache[key] = role
+        return role
+
+    def invalidate(self, guild_id: int = None):
+        """
+        Drops cached objects of guild, or of all guilds when guild_id is None
+        """
+        if guild_id is None:
+            self.cache.clear()
+            return
+
+        for key in [key for key in self.cache if key[0] == guild_id]:
+            del self.cache[key]
+
+    def on_config_change(self, guild_id: int, section: str, changes: dict):
+        if section in ("logging", "roles"):
+            self.invalidate(guild_id)
+
+    def stats(self) -> dict:
+        """
+        :return: cached entries, hits and misses
+        :rtype: dict
+        """
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import OrderedDict
+import discord
+from discord.ext import commands
+
+class UserCache:
+    """
+    Shared cache of discord user profiles with LRU size limit and TTL.
+
+    Users come from gateway events and bot member cache first, REST fetch_user is called only on miss.
+    Concurrent lookups of the same id wait for one REST call.
+    """
+
+    def __init__(self, bot: commands.Bot, max_size: int = 10000, ttl: float = 3600):
+        """
+        :param bot: bot used for member cache and REST calls
+        :type bot: commands.Bot
+        :param max_size: max number of cached users, least recently used are dropped
+        :type max_size: int
+        :param ttl: seconds after which cached user is fetched again
+        :type ttl: float
+        """
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+
+        #user id -> (expiry time, user)
+        self.users = OrderedDict()
+        #user id -> future of running REST call
+        self.pending = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, user: discord.abc.User):
+        """
+        Puts or refreshes user in cache, called from gateway events
+
+        :param user: user or member
+        :type user: discord.abc.User
+        """
+        self.users[user.id] = (time.monotonic() + self.ttl, user)
+        self.users.move_to_end(user.id)
+        while len(self.users) > self.max_size:
+            self.users.popitem(last=False)
+
+    def get_cached(self, user_id: int) -> discord.abc.User:
+        """
+        Gets user without REST call
+
+        :param user_id: id of user
+        :type user_id: int
+        :return: user or None if it is not in cache or bot member cache
+        :rtype: discord.abc.User
+        """
+        entry = self.users.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.users.move_to_end(user_id)
+                return entry[1]
+            del self.users[user_id]
+
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.put(user)
+        return user
+
+    async def get(self, user_id: int) -> discord.abc.User:
+        """
+        Gets user from cache or from REST on miss
+
+        :param user_id: id of user
+        :type user_id: int
+        :return: user
+        :rtype: discord.abc.User
+        :raises discord.NotFound: when user does not exist
+        """
+        user = self.get_cached(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+
+        self.misses += 1
+
+        future = self.pending.get(user_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[user_id] = future
+        try:
+            user = await self.bot.fetch_user(user_id)
+            self.put(user)
+            future.set_result(user)
+            return user
+        except Exception as e:
+            future.set_exception(e)
+            #marks exception as retrieved when nobody else waits for it
+            future.exception()
+            raise
+        finally:
+            #caller was cancelled during REST call, waiters are cancelled too instead of waiting forever
+            if not future.done():
+                future.cancel()
+            self.pending.pop(user_id, None)
+
+    def stats(self) -> dict:
+        """
+        :return: size, hits, misses and hit ratio of cache
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self.users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
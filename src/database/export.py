@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from .pool import DatabasePool, get_pool
+
+@dataclass
+class ExportFilters:
+    """
+    Filters of exported messages, None means no filter
+
+    :param guild_id: only messages from this guild
+    :type guild_id: int
+    :param channel_id: only messages from this channel
+    :type channel_id: int
+    :param user_id: only messages of this user
+    :type user_id: int
+    :param since: only messages sent since this time, ISO format
+    :type since: str
+    :param until: only messages sent before this time, ISO format
+    :type until: str
+    """
+    guild_id: int = None
+    channel_id: int = None
+    user_id: int = None
+    since: str = None
+    until: str = None
+
+@dataclass
+class ExportCheckpoint:
+    """
+    Progress of export saved after every finished part file
+
+    :param format: format of export
+    :type format: str
+    :param filters: filters of export
+    :type filters: dict
+    :param after: (timestamp, message_id) of last exported row
+    :type after: list
+    :param parts: names of finished part files
+    :type parts: list[str]
+    :param rows: number of exported rows
+    :type rows: int
+    :param finished: if whole export is done
+    :type finished: bool
+    """
+    format: str
+    filters: dict
+    after: list = None
+    parts: list[str] = field(default_factory=list)
+    rows: int = 0
+    finished: bool = False
+
+class MessageExporter:
+    """
+    Streams messages from database to compressed NDJSON or Parquet files with constant memory.
+
+    Rows are read with named server-side cursor in chunks of chunk_size and written to part files
+    of rows_per_file rows in output directory. After every finished part checkpoint.json is saved,
+    export started again in the same directory continues after last finished part.
+    """
+
+    FORMATS = ("ndjson.gz", "ndjson.zst", "parquet")
+    COLUMNS = ("message_id", "user_id", "guild_id", "guild_name", "channel_id", "channel_name", "timestamp", "content")
+
+    def __init__(self, pool: DatabasePool = None, chunk_size: int = 5000, rows_per_file: int = 500000):
+        """
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param chunk_size: rows fetched from database at once
+        :type chunk_size: int
+        :param rows_per_file: rows in one part file
+        :type rows_per_file: int
+        """
+        self.pool = pool if pool is not None else get_pool()
+        self.chunk_size = chunk_size
+        self.rows_per_file = rows_per_file
+
+        with open("src/database/sql/messages_queries.sql", 'r') as file:
+            self.export_query = file.read().split(';')[14]
+
+    async def export(self, output_dir: str, format: str = "ndjson.gz", filters: ExportFilters = None) -> ExportCheckpoint:
+        """
+        Exports messages to output directory, continues previous export from checkpoint if it exists
+
+        :param output_dir: directory for part files and checkpoint
+        :type output_dir: str
+        :param format: one of FORMATS
+        :type format: str
+        :param filters: filters of exported messages
+        :type filters: ExportFilters
+        :return: final checkpoint
+        :rtype: ExportCheckpoint
+        """
+        return await self.pool.run(self.export_blocking, output_dir, format, filters or ExportFilters())
+
+    def export_blocking(self, cursor, output_dir: str, format: str, filters: ExportFilters) -> ExportCheckpoint:
+        """
+        Synchronous export on connection of given cursor
+
+        :param cursor: cursor of pooled connection
+        :return: final checkpoint
+        :rtype: ExportCheckpoint
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown format {format}, use one of {self.FORMATS}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        checkpoint = self.load_checkpoint(output_dir, format, filters)
+        if checkpoint.finished:
+            return checkpoint
+
+        params = asdict(filters)
+        params["after_timestamp"] = datetime.fromisoformat(checkpoint.after[0]) if checkpoint.after else None
+        params["after_message_id"] = checkpoint.after[1] if checkpoint.after else None
+
+        with cursor.connection.cursor(name="messages_export") as export_cursor:
+            export_cursor.itersize = self.chunk_size
+            export_cursor.execute(self.export_query, params)
+
+            while True:
+                part_name = f"messages-{len(checkpoint.parts):05d}.{format}"
+                written, last_row = self.write_part(export_cursor, os.path.join(output_dir, part_name), format)
+                if written == 0:
+                    break
+
+                checkpoint.parts.append(part_name)
+                checkpoint.rows += written
+                checkpoint.after = [last_row[6].isoformat(), last_row[0]]
+                self.save_checkpoint(output_dir, checkpoint)
+
+                if written < self.rows_per_file:
+                    break
+
+        checkpoint.finished = True
+        self.save_checkpoint(output_dir, checkpoint)
+        return checkpoint
+
+    def write_part(self, export_cursor, path: str, format: str) -> tuple[int, tuple]:
+        """
+        Writes up to rows_per_file rows to part file, file is written under temporary name
+        and renamed when it is complete
+
+        :param export_cursor: named cursor with executed export query
+        :param path: path of part file
+        :type path: str
+        :param format: one of FORMATS
+        :type format: str
+        :return: (number of written rows, last written row)
+        :rtype: tuple[int, tuple]
+        """
+        tmp_path = path + ".tmp"
+        written = 0
+        last_row = None
+
+        def chunks():
+            nonlocal written, last_row
+            while written < self.rows_per_file:
+                rows = export_cursor.fetchmany(min(self.chunk_size, self.rows_per_file - written))
+                if not rows:
+                    return
+                written += len(rows)
+                last_row = rows[-1]
+                yield rows
+
+        if format == "parquet":
+            self.write_parquet(tmp_path, chunks())
+        else:
+            self.write_ndjson(tmp_path, format, chunks())
+
+        if written == 0:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+
+        return written, last_row
+
+    def write_ndjson(self, path: str, format: str, chunks):
+        """
+        Writes chunks of rows as compressed newline delimited json
+
+        :param path: file path
+        :type path: str
+        :param format: ndjson.gz or ndjson.zst
+        :type format: str
+        :param chunks: iterable of row lists
+        """
+        if format == "ndjson.zst":
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("ndjson.zst export needs zstandard package (pip install zstandard)")
+            raw = open(path, 'wb')
+            file = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            raw = None
+            file = gzip.open(path, 'wb')
+
+        with file:
+            for rows in chunks:
+                lines = []
+                for row in rows:
+                    record = dict(zip(self.COLUMNS, row))
+                    record["timestamp"] = record["timestamp"].isoformat()
+                    lines.append(json.dumps(record, ensure_ascii=False))
+                file.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+        if raw is not None:
+            raw.close()
+
+    def write_parquet(self, path: str, chunks):
+        """
+        Writes chunks of rows as parquet row groups
+
+        :param path: file path
+        :type path: str
+        :param chunks: iterable of row lists
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("parquet export needs pyarrow package (pip install pyarrow)")
+
+        schema = pyarrow.schema([
+            ("message_id", pyarrow.int64()),
+            ("user_id", pyarrow.int64()),
+            ("guild_id", pyarrow.int64()),
+            ("guild_name", pyarrow.string()),
+            ("channel_id", pyarrow.int64()),
+            ("channel_name", pyarrow.string()),
+            ("timestamp", pyarrow.timestamp("us", tz="UTC")),
+            ("content", pyarrow.string()),
+        ])
+
+        with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+            for rows in chunks:
+                columns = list(zip(*rows))
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [pyarrow.array(column, type=schema.field(i).type) for i, column in enumerate(columns)],
+                    schema=schema
+                ))
+
+    def load_checkpoint(self, output_dir: str, format: str, filters: ExportFilters) -> ExportCheckpoint:
+        """
+        Loads checkpoint of previous export from directory or makes new one
+
+        :return: checkpoint
+        :rtype: ExportCheckpoint
+        """
+        path = os.path.join(output_dir, "checkpoint.json")
+        if not os.path.exists(path):
+            return ExportCheckpoint(format=format, filters=asdict(filters))
+
+        with open(path, 'r', encoding="UTF-8") as file:
+            checkpoint = ExportCheckpoint(**json.load(file))
+
+        if checkpoint.format != format or checkpoint.filters != asdict(filters):
+            raise ValueError(f"{output_dir} has checkpoint of export with different format or filters")
+
+        return checkpoint
+
+    def save_checkpoint(self, output_dir: str, checkpoint: ExportCheckpoint):
+        """
+        Saves checkpoint atomically
+
+        :param output_dir: export directory
+        :type output_dir: str
+        :param checkpoint: checkpoint to be saved
+        :type checkpoint: ExportCheckpoint
+        """
+        path = os.path.join(output_dir, "checkpoint.json")
+        with open(path + ".tmp", 'w', encoding="UTF-8") as file:
+            json.dump(asdict(checkpoint), file, indent=4)
+        os.replace(path + ".tmp", path)
+
+
+def main():
+    """
+    Command line entry point: python -m src.database.export OUTPUT_DIR [options]
+    """
+    parser = argparse.ArgumentParser(description="Exports logged messages to compressed files")
+    parser.add_argument("output_dir", help="directory for part files, export in directory with checkpoint is resumed")
+    parser.add_argument("--format", choices=MessageExporter.FORMATS, default="ndjson.gz")
+    parser.add_argument("--guild-id", type=int)
+    parser.add_argument("--channel-id", type=int)
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--since", help="ISO time, for example 2025-01-01 or 2025-01-01T12:00:00+00:00")
+    parser.add_argument("--until", help="ISO time, exclusive")
+    parser.add_argument("--rows-per-file", type=int, default=500000)
+    args = parser.parse_args()
+
+    filters = ExportFilters(
+        guild_id=args.guild_id,
+        channel_id=args.channel_id,
+        user_id=args.user_id,
+        since=datetime.fromisoformat(args.since).astimezone().isoformat() if args.since else None,
+        until=datetime.fromisoformat(args.until).astimezone().isoformat() if args.until else None
+    )
+
+    exporter = MessageExporter(rows_per_file=args.rows_per_file)
+    checkpoint = asyncio.run(exporter.export(args.output_dir, args.format, filters))
+    print(f"Exported {checkpoint.rows} messages to {len(checkpoint.parts)} files in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,252 +1,535 @@
-import psycopg2
+import asyncio
+import csv
+import io
 import discord
-from psycopg2 import OperationalError
-from psycopg2 import sql
-from dotenv import load_dotenv
-from pathlib import Path
-import os
+from psycopg2 import DataError, IntegrityError, InterfaceError, OperationalError
+from psycopg2.extras import execute_values
+from dataclasses import dataclass
+from datetime import datetime
+from .pool import DatabasePool, PoolTimeoutError, get_pool
+from .versions import get_versions
+from ..monitoring.metrics import register_queries
+
+@dataclass
+class MemberStats:
+    """
+    Counters of joins and leaves of guild
+
+    :param joins: number of all joins
+    :type joins: int
+    :param leaves: number of all leaves
+    :type leaves: int
+    :param last_join_user_id: id of user that joined last, None if nobody joined
+    :type last_join_user_id: int
+    :param last_join_time_stamp: time of last join
+    :type last_join_time_stamp: datetime
+    :param last_leave_user_id: id of user that left last, None if nobody left
+    :type last_leave_user_id: int
+    :param last_leave_time_stamp: time of last leave
+    :type last_leave_time_stamp: datetime
+    """
+    joins: int
+    leaves: int
+    last_join_user_id: int
+    last_join_time_stamp: datetime
+    last_leave_user_id: int
+    last_leave_time_stamp: datetime
+
+@dataclass
+class MessageStats:
+    """
+    Messages stats of guild in time range read from hourly counts
+
+    :param top_channels: list of (channel_id, channel_name, messages) sorted by messages
+    :type top_channels: list[tuple]
+    :param top_users: list of (user_id, messages) sorted by messages
+    :type top_users: list[tuple]
+    :param hourly: list of (hour, messages) of range and of the same long range before it,
+        hours without messages are skipped
+    :type hourly: list[tuple]
+    """
+    top_channels: list[tuple]
+    top_users: list[tuple]
+    hourly: list[tuple]
 
 class Logging_Database:
     """
     A class for managing PostgreSQL database operations related to a Discord bot's data.
-    
-    This class handles creating connections, initializing tables (messages, members, and deleted messages),
-    and performing insert and query operations. The table names are dynamically generated based on a provided guild (server) name.
+
+    This class handles performing insert and query operations on messages and members tables,
+    tables themselves are created by MigrationRunner. All queries go through the process wide
+    connection pool, so they run on worker threads and never block the event loop.
     """
 
-    def __init__(self):
+    #errors of connection and pool, the same batch can succeed when retried
+    TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+    #errors caused by values of rows, NUL characters in text are rejected by psycopg2 with ValueError
+    DATA_ERRORS = (DataError, IntegrityError, ValueError)
+
+    def __init__(self, pool: DatabasePool = None, *, retries: int = 3, retry_delay: float = 0.5, raise_errors: bool = False):
         """
         Initializes the Logging_Database object.
-        
-        Loads environment variables from a .env file, which contain the database credentials.
-        Establishes a connection to the PostgreSQL database and creates a cursor for executing queries.
-        """
-
-        #gets path to .env file
-        env_path = Path(__file__).resolve().parent.parent / '.env'
-        load_dotenv(dotenv_path=env_path)
-
-        #loading database credentials
-        self.database_host = os.getenv('DATABASE_HOST_NAME')
-        self.database_name = os.getenv('DATABASE_NAME')
-        self.database_user = os.getenv('DATABASE_USER')
-        self.database_password = os.getenv('DATABASE_PASSWORD')
 
-        #create connection
-        self.connection = self.create_connection()
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param retries: retries of batch after transient error
+        :type retries: int
+        :param retry_delay: seconds before first retry, doubled with every next retry
+        :type retry_delay: float
+        :param raise_errors: if read methods used by REST API raise database errors instead of returning empty result
+        :type raise_errors: bool
+        """
 
-        #create cursor fo executing
-        self.cursor = self.connection.cursor()
+        self.pool = pool if pool is not None else get_pool()
+        self.versions = get_versions()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.raise_errors = raise_errors
 
         self.members_queries = self.get_queries("src/database/sql/members_queries.sql")
         self.messages_queries = self.get_queries("src/database/sql/messages_queries.sql")
 
-    def create_connection(self):
-        """
-        Creates a connection to the PostgreSQL database using the provided credentials.
-        
-        :return: A psycopg2 connection object if successful; otherwise, None.
-        :rtype: psycopg2.extensions.connection or None
-        """
-
-        connection = None
-        try:
-            connection = psycopg2.connect(
-                host=self.database_host,
-                database=self.database_name,
-                user=self.database_user,
-                password=self.database_password,
-                port=5432
-            )
-            print("Connected to DB!")
-        except OperationalError as e:
-            print(f"Error {e}")
-
-        return connection
-    
     def get_queries(self, filename: str) -> list[str]:
         '''
         gets queries from sql file
         '''
 
         with open(filename, 'r') as file:
-            return file.read().split(';')
-    
-    def init_table(self):
-        """
-        Initializes the necessary tables for a specific guild.
-        
-        This method creates three tables:
-          - messages: Stores message-related information.
-          - members: Stores member-related information.
-          - deleted_messages: Stores references to deleted messages with a foreign key constraint
-            linking back to the messages table.
-          - edited_messages: Stores reference to message and stores before and after edit content
-        
-        :param guild_name: The name of the guild for which the tables are created.
-        :type guild_name: str
-        """
-
-        TABLE_INIT_MESSAGES_QUERY = self.messages_queries[0]
-
-        TABLE_INIT_MEMBERS_QUERY = self.members_queries[0]
-
-        TABLE_INIT_DELETED_MESSAGES_QUERY = self.messages_queries[1]
-
-        TABLE_INIT_EDITED_MESSAGES_QUERY = self.messages_queries[2]
-
-        TABLE_JOINS_AND_LEAVES_INIT_QUERY = self.members_queries[1]
-        try:
-                
-            self.cursor.execute(TABLE_INIT_MESSAGES_QUERY)
-            self.cursor.execute(TABLE_INIT_MEMBERS_QUERY)
-            self.cursor.execute(TABLE_INIT_DELETED_MESSAGES_QUERY)
-            self.cursor.execute(TABLE_INIT_EDITED_MESSAGES_QUERY)
-            self.cursor.execute(TABLE_JOINS_AND_LEAVES_INIT_QUERY)
-            self.connection.commit()
-        except Exception as e:
-            print("error: " + str(e))
-            self.connection.rollback()
+            return register_queries(filename, file.read().split(';'))
 
     async def get_message_by_id(self, message_id: int) -> list:
         """
         Retrieves a message record from the messages table based on its message_id.
-        
+
         :param message_id: The unique identifier for the message.
         :type message_id: int
         :return: A list of tuples, each representing a matching message record.
         :rtype: list
         """
 
-        SELECT_BY_ID_QUERY = self.messages_queries[3]
+        SELECT_BY_ID_QUERY = self.messages_queries[0]
 
         result = []
 
         try:
-            self.cursor.execute(SELECT_BY_ID_QUERY, (message_id,))
-            result = self.cursor.fetchall()
+            result = await self.pool.fetchall(SELECT_BY_ID_QUERY, (message_id,))
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
         return result
-    
+
     async def get_member_by_id(self, memeber_id: int) -> list:
         """
         Retrieves a member record from the messages table based on its user_id.
-        
+
         :param member_id: The unique identifier for the member.
         :type member_id: int
         :return: A list of tuples, each representing a matching member record.
         :rtype: list
         """
 
-        SELECT_BY_ID_QUERY = self.members_queries[2]
+        SELECT_BY_ID_QUERY = self.members_queries[0]
 
         result = []
 
         try:
-            self.cursor.execute(SELECT_BY_ID_QUERY, (memeber_id,))
-            result = self.cursor.fetchall()
+            result = await self.pool.fetchall(SELECT_BY_ID_QUERY, (memeber_id,))
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
         return result
 
     async def add_deleted_message(self, message: discord.Message):
         """
         Adds a record to the deleted messages table based on the provided Discord message.
-        
+
         The method extracts the message ID from the provided Discord message and inserts it into
         the deleted messages table for the specified guild.
-        
+
         :param message: The Discord message object that was deleted.
         :type message: discord.Message
         """
 
-        ADD_QUERY = self.messages_queries[4]
+        ADD_QUERY = self.messages_queries[1]
 
         try:
-            self.cursor.execute(ADD_QUERY, (message.id,))
-            self.connection.commit()
+            await self.pool.execute(ADD_QUERY, (message.id,))
+            self.versions.bump("messages")
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
     async def add_edited_message_to_database(self, before: discord.Message, after: discord.Message):
         """
         Inserts a edited message record into the edited_messages table.
-        
+
         :param before: before message object to be add to database.
         :type before: discord.Message
         :param after: after message object to be added to database
         :type after: discord.Message
         """
 
-        ADD_EDITED_MESSAGE_QUERY = self.messages_queries[5]
+        ADD_EDITED_MESSAGE_QUERY = self.messages_queries[2]
 
         try:
-            self.cursor.execute(ADD_EDITED_MESSAGE_QUERY, (before.id, before.content, after.content))
-            self.connection.commit()
+            await self.pool.execute(ADD_EDITED_MESSAGE_QUERY, (before.id, before.content, after.content))
+            self.versions.bump("messages")
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
-    
-    async def add_message_to_database(self,message: discord.Message, timestamp: str):
+
+    async def add_message_to_database(self,message: discord.Message, timestamp: datetime):
         """
         Inserts a new message record into the messages table.
-        
+
         :param message: message object to be add to database.
         :type message: discord.Message
         :param timestamp: The timestamp indicating when the message was sent.
-        :type timestamp: str
+        :type timestamp: datetime
         """
 
-        ADD_MESSAGE_QUERY = self.messages_queries[6]
-        
-        data = (message.id, message.author.id, timestamp, message.guild.name, message.channel.name, message.content)
+        ADD_MESSAGE_QUERY = self.messages_queries[3]
+
+        data = (message.id, message.author.id, timestamp, message.guild.id, message.guild.name, message.channel.id, message.channel.name, message.content)
 
-        try: 
-            self.cursor.execute(ADD_MESSAGE_QUERY,data)
-            self.connection.commit()
+        try:
+            await self.pool.execute(ADD_MESSAGE_QUERY, data)
+            self.versions.bump("messages")
         except Exception as e:
             print(f"error: {e}")
-            self.connection.rollback()
-             
-    def add_member_to_database(self, member: discord.Member):
+
+    async def add_messages_batch(self, rows: list[tuple]):
+        """
+        Inserts many messages with one multi-row insert and one commit,
+        hourly counts of guilds, channels and users are updated in the same statement.
+
+        :param rows: list of (message_id, user_id, timestamp, guild_id, guild_name, channel_id, channel_name, content) tuples
+        :type rows: list[tuple]
+        """
+
+        ADD_MESSAGES_QUERY = self.messages_queries[6]
+
+        if await self.write_batch(ADD_MESSAGES_QUERY, rows) < len(rows):
+            self.versions.bump("messages")
+
+    async def add_edited_messages_batch(self, rows: list[tuple]):
+        """
+        Inserts many edited messages with one multi-row insert and one commit.
+        Edits of messages that were never logged are skipped.
+
+        :param rows: list of (message_id, before_content, after_content) tuples
+        :type rows: list[tuple]
+        """
+
+        ADD_EDITED_MESSAGES_QUERY = self.messages_queries[7]
+
+        if await self.write_batch(ADD_EDITED_MESSAGES_QUERY, rows) < len(rows):
+            self.versions.bump("messages")
+
+    async def add_deleted_messages_batch(self, rows: list[tuple]):
+        """
+        Inserts many deleted messages with one multi-row insert and one commit.
+        Deletes of messages that were never logged are skipped.
+
+        :param rows: list of (message_id,) tuples
+        :type rows: list[tuple]
+        """
+
+        ADD_DELETED_MESSAGES_QUERY = self.messages_queries[8]
+
+        if await self.write_batch(ADD_DELETED_MESSAGES_QUERY, rows) < len(rows):
+            self.versions.bump("messages")
+
+    async def write_batch(self, query: str, rows: list[tuple]) -> int:
+        """
+        Writes rows with one multi-row query. Transient errors are retried with exponential backoff,
+        on data error batch is split in halves until only bad rows are left, so only they are lost.
+
+        :param query: query with single VALUES %s placeholder
+        :type query: str
+        :param rows: list of tuples
+        :type rows: list[tuple]
+        :return: number of rows that were not written
+        :rtype: int
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                await self.pool.execute_values(query, rows)
+                return 0
+            except self.TRANSIENT_ERRORS as e:
+                if attempt == self.retries:
+                    print(f"error: {len(rows)} rows not written: {e}")
+                    return len(rows)
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            except self.DATA_ERRORS as e:
+                if len(rows) == 1:
+                    print(f"error: row {rows[0][0]} not written: {e}")
+                    return 1
+                middle = len(rows) // 2
+                return await self.write_batch(query, rows[:middle]) + await self.write_batch(query, rows[middle:])
+            except Exception as e:
+                print(f"error: {len(rows)} rows not written: {e}")
+                return len(rows)
+
+    async def backfill_channel_ids(self, channels: list[tuple[str, str, int, int]], batch_size: int = 5000) -> int:
+        """
+        Fills guild_id and channel_id of messages logged before ids were stored,
+        ids are matched by guild and channel names. Every batch is committed on its own
+        together with hourly counts of its backfilled messages, so counts are never rebuilt
+        and nothing is counted when all messages already have ids.
+
+        :param channels: list of (guild_name, channel_name, guild_id, channel_id) of existing channels
+        :type channels: list[tuple[str, str, int, int]]
+        :param batch_size: number of rows checked in one transaction
+        :type batch_size: int
+        :return: number of backfilled messages
+        :rtype: int
+        """
+
+        CREATE_MAPPING_QUERY = self.messages_queries[9]
+        FILL_MAPPING_QUERY = self.messages_queries[10]
+        BACKFILL_QUERY = self.messages_queries[11]
+        DROP_MAPPING_QUERY = self.messages_queries[12]
+
+        def backfill(cursor):
+            connection = cursor.connection
+            cursor.execute(CREATE_MAPPING_QUERY)
+            execute_values(cursor, FILL_MAPPING_QUERY, channels, page_size=max(len(channels), 1))
+            connection.commit()
+
+            updated = 0
+            last_id = 0
+            try:
+                while True:
+                    cursor.execute(BACKFILL_QUERY, (last_id, batch_size))
+                    last_id, batch_updated = cursor.fetchone()
+                    connection.commit()
+                    if last_id is None:
+                        break
+                    updated += batch_updated
+            finally:
+                cursor.execute(DROP_MAPPING_QUERY)
+            return updated
+
+        updated = 0
+
+        try:
+            updated = await self.pool.run(backfill)
+            if updated:
+                self.versions.bump("messages")
+        except Exception as e:
+            print("error: " + str(e))
+
+        return updated
+
+    async def get_message_stats(self, guild_id: int, since: datetime, until: datetime, limit: int = 5) -> MessageStats:
+        """
+        Gets top channels, top users and hourly activity of guild only from hourly counts,
+        so cost depends on length of range and not on number of messages
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param since: start of range, full hour
+        :type since: datetime
+        :param until: end of range (exclusive), full hour
+        :type until: datetime
+        :param limit: number of top channels and users
+        :type limit: int
+        :return: stats of guild
+        :rtype: MessageStats
+        """
+
+        TOP_CHANNELS_QUERY = self.messages_queries[15]
+        TOP_USERS_QUERY = self.messages_queries[16]
+        HOURLY_QUERY = self.messages_queries[17]
+
+        params = {"guild_id": guild_id, "since": since, "until": until, "limit": limit}
+
+        def get(cursor):
+            cursor.execute(TOP_CHANNELS_QUERY, params)
+            top_channels = cursor.fetchall()
+            cursor.execute(TOP_USERS_QUERY, params)
+            top_users = cursor.fetchall()
+            #previous range is read too, so trend can be compared
+            cursor.execute(HOURLY_QUERY, dict(params, since=since - (until - since)))
+            hourly = cursor.fetchall()
+            return MessageStats(top_channels, top_users, hourly)
+
+        result = MessageStats([], [], [])
+
+        try:
+            result = await self.pool.run(get)
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        return result
+
+    async def add_member_to_database(self, member: discord.Member):
         """
         Inserts a new member record into the members table for a specific guild.
-        
+
         If a member with the same user_id already exists (based on a conflict), the insert is ignored.
-        
+
         :param member: member entity to be added to database.
         :type member: discord.Member
         """
 
-        ADD_MEMBER_QUERY = self.members_queries[3]
-        
+        ADD_MEMBER_QUERY = self.members_queries[1]
+
         data = (member.id, member.global_name)
 
         try:
-            self.cursor.execute(ADD_MEMBER_QUERY, data)
-            self.connection.commit()
+            await self.pool.execute(ADD_MEMBER_QUERY, data)
+            self.versions.bump("members")
         except Exception as e:
             print(f"error: {e}")
-            self.connection.rollback()
 
-    async def get_all_messages(self) -> list:
+    async def reconcile_members(self, guild_id: int, members: list[discord.Member], timestamp: datetime) -> tuple[int, int, int]:
+        """
+        Synchronizes members table with current members of guild in one transaction.
+
+        Current members are bulk loaded with COPY to staging table and merged into members
+        with one statement, only new members and changed usernames are written.
+        Members that joined or left guild while bot was offline are tracked in member_joins_leaves.
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param members: current members of guild
+        :type members: list[discord.Member]
+        :param timestamp: time used for leaves that happened while bot was offline
+        :type timestamp: datetime
+        :return: (written members, offline joins, offline leaves)
+        :rtype: tuple[int, int, int]
+        """
+
+        CREATE_STAGING_QUERY = self.members_queries[6]
+        COPY_STAGING_QUERY = self.members_queries[7]
+        FIND_OFFLINE_JOINS_QUERY = self.members_queries[8]
+        TRACK_OFFLINE_LEAVES_QUERY = self.members_queries[9]
+        MERGE_MEMBERS_QUERY = self.members_queries[10]
+        TRACK_OFFLINE_JOINS_QUERY = self.members_queries[11]
+
+        rows = [(member.id, member.global_name, member.joined_at or timestamp) for member in members]
+        params = {"guild_id": guild_id, "timestamp": timestamp}
+
+        def reconcile(cursor):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+
+            cursor.execute(CREATE_STAGING_QUERY)
+            cursor.copy_expert(COPY_STAGING_QUERY, buffer)
+            cursor.execute(FIND_OFFLINE_JOINS_QUERY, params)
+            cursor.execute(TRACK_OFFLINE_LEAVES_QUERY, params)
+            leaves = cursor.rowcount
+            cursor.execute(MERGE_MEMBERS_QUERY)
+            written = cursor.rowcount
+            cursor.execute(TRACK_OFFLINE_JOINS_QUERY, params)
+            joins = cursor.rowcount
+            return written, joins, leaves
+
+        result = (0, 0, 0)
+
+        try:
+            result = await self.pool.run(reconcile)
+            self.versions.bump("members")
+        except Exception as e:
+            print("error: " + str(e))
+
+        return result
+
+    async def assign_statuses_to_guild(self, guild_id: int) -> int:
         """
-        Retrieves all message records from the messages table for a specific guild.
-        
+        Assigns joins and leaves logged without guild id to guild and counts member stats of guild again,
+        so counters of unknown guild (guild 0) are folded into it. Used once for guild of bot from time
+        when it worked for one guild
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :return: number of assigned joins and leaves
+        :rtype: int
+        """
+
+        ASSIGN_STATUSES_QUERY = self.members_queries[15]
+        CLEAR_STATS_QUERY = self.members_queries[16]
+        COUNT_STATS_QUERY = self.members_queries[17]
+
+        params = {"guild_id": guild_id}
+
+        def assign(cursor):
+            cursor.execute(ASSIGN_STATUSES_QUERY, params)
+            statuses = cursor.rowcount
+            #rows of unknown guild were counted under guild 0, it is cleared even when they were assigned before
+            cursor.execute(CLEAR_STATS_QUERY, params)
+            cursor.execute(COUNT_STATS_QUERY, params)
+            return statuses
+
+        statuses = 0
+
+        try:
+            statuses = await self.pool.run(assign)
+            self.versions.bump("members")
+        except Exception as e:
+            print("error: " + str(e))
+
+        return statuses
+
+    async def assign_messages_to_guild(self, guild_id: int, batch_size: int = 5000) -> int:
+        """
+        Assigns messages logged without guild id to guild, used once for guild of bot from time
+        when it worked for one guild. Every batch is committed on its own together with
+        hourly counts of its assigned messages.
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param batch_size: number of rows checked in one transaction
+        :type batch_size: int
+        :return: number of assigned messages
+        :rtype: int
+        """
+
+        ASSIGN_MESSAGES_QUERY = self.messages_queries[20]
+
+        def assign(cursor):
+            connection = cursor.connection
+            updated = 0
+            last_id = 0
+            while True:
+                cursor.execute(ASSIGN_MESSAGES_QUERY, {"guild_id": guild_id, "last_id": last_id, "batch_size": batch_size})
+                last_id, batch_updated = cursor.fetchone()
+                connection.commit()
+                if last_id is None:
+                    break
+                updated += batch_updated
+            return updated
+
+        updated = 0
+
+        try:
+            updated = await self.pool.run(assign)
+            if updated:
+                self.versions.bump("messages")
+        except Exception as e:
+            print("error: " + str(e))
+
+        return updated
+
+    async def get_all_messages(self, since: datetime = None, until: datetime = None) -> list:
+        """
+        Retrieves all message records from the messages table, optionally only from given time range.
+        Bounded range reads only partitions of months inside of it.
+
+        :param since: start of range, inclusive
+        :type since: datetime
+        :param until: end of range, exclusive
+        :type until: datetime
         :return: A list of tuples representing all messages.
         :rtype: list
         """
 
-        GET_ALL_MESSAGES_QUERY = self.messages_queries[7]
-        
-        self.cursor.execute(GET_ALL_MESSAGES_QUERY)
-        records = self.cursor.fetchall()
+        GET_ALL_MESSAGES_QUERY = self.messages_queries[4]
+
+        records = await self.pool.fetchall(GET_ALL_MESSAGES_QUERY, {"since": since, "until": until})
 
         return records
 
@@ -255,28 +538,191 @@ class Logging_Database:
         """
         Retrieves messages posted by a user by first determining the user's ID from the members table
         and then querying the messages table.
-        
+
         :param username: The username of the member whose messages should be retrieved.
         :type username: str
         :return: A list of tuples representing the messages posted by the user.
         :rtype: list
         """
 
-        GET_MESSAGES_QUERY = self.messages_queries[8]
+        GET_MESSAGES_QUERY = self.messages_queries[5]
         records = []
         try:
-            self.cursor.execute(GET_MESSAGES_QUERY, (username,))
-            records = self.cursor.fetchall()
+            records = await self.pool.fetchall(GET_MESSAGES_QUERY, (username,))
         except Exception as e:
             print(f"error: {e}")
-            self.connection.rollback()
 
         return records
 
-    async def track_member_joins_and_leaves(self, member: discord.Member, join: bool, leave: bool, timestamp: str):
+    async def get_messages_page(self, user_id: int, guild_id: int, *, channel_id: int = None, since: datetime = None, until: datetime = None,
+                                after: tuple[datetime, int] = None, page_size: int = 10) -> tuple[list, tuple[datetime, int]]:
+        """
+        Gets one page of member messages in guild, newest first, using keyset pagination on (timestamp, message_id).
+        Rows are read through named server-side cursor, so only one page is fetched from database.
+
+        :param user_id: id of member
+        :type user_id: int
+        :param guild_id: only messages from this guild
+        :type guild_id: int
+        :param channel_id: only messages from this channel
+        :type channel_id: int
+        :param since: only messages sent since this time
+        :type since: datetime
+        :param until: only messages sent before this time
+        :type until: datetime
+        :param after: (timestamp, message_id) of last row of previous page, None for first page
+        :type after: tuple[datetime, int]
+        :param page_size: number of rows on page
+        :type page_size: int
+        :return: (rows, key of next page or None when this is last page)
+        :rtype: tuple[list, tuple[datetime, int]]
+        """
+
+        GET_PAGE_QUERY = self.messages_queries[13]
+
+        params = {
+            "user_id": user_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "since": since,
+            "until": until,
+            "after_timestamp": after[0] if after else None,
+            "after_message_id": after[1] if after else None
+        }
+
+        def get_page(cursor):
+            with cursor.connection.cursor(name="messages_page") as page_cursor:
+                page_cursor.execute(GET_PAGE_QUERY, params)
+                #one row more to know if there is next page
+                return page_cursor.fetchmany(page_size + 1)
+
+        rows = []
+
+        try:
+            rows = await self.pool.run(get_page)
+        except Exception as e:
+            print("error: " + str(e))
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, (rows[-1][0], rows[-1][1])
+
+        return rows, None
+
+    async def get_logs_page(self, *, guild_id: int = None, channel_id: int = None, user_id: int = None, since: datetime = None,
+                            until: datetime = None, after: tuple[datetime, int] = None, page_size: int = 50) -> tuple[list, tuple[datetime, int]]:
+        """
+        Gets one page of logged messages, newest first, using keyset pagination on (timestamp, message_id)
+
+        :param guild_id: only messages from this guild
+        :type guild_id: int
+        :param channel_id: only messages from this channel
+        :type channel_id: int
+        :param user_id: only messages of this user
+        :type user_id: int
+        :param since: only messages sent since this time
+        :type since: datetime
+        :param until: only messages sent before this time
+        :type until: datetime
+        :param after: (timestamp, message_id) of last row of previous page, None for first page
+        :type after: tuple[datetime, int]
+        :param page_size: number of rows on page
+        :type page_size: int
+        :return: (rows of (timestamp, message_id, user_id, guild_id, channel_id, channel_name, content), key of next page or None)
+        :rtype: tuple[list, tuple[datetime, int]]
+        """
+
+        GET_PAGE_QUERY = self.messages_queries[19]
+
+        params = {
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "since": since,
+            "until": until,
+            "after_timestamp": after[0] if after else None,
+            "after_message_id": after[1] if after else None,
+            #one row more to know if there is next page
+            "limit": page_size + 1
+        }
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(GET_PAGE_QUERY, params)
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, (rows[-1][0], rows[-1][1])
+
+        return rows, None
+
+    async def search_messages(self, query: str, guild_id: int, *, user_id: int = None, channel_id: int = None,
+                              since: datetime = None, until: datetime = None, after: tuple[float, datetime, int] = None,
+                              page_size: int = 10) -> tuple[list, tuple[float, datetime, int]]:
+        """
+        Full text search in messages of guild, best matches first. Query uses web search syntax
+        ("quoted phrase", or, -word), content of edits is searched too.
+
+        :param query: searched text
+        :type query: str
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param user_id: only messages of this user
+        :type user_id: int
+        :param channel_id: only messages from this channel
+        :type channel_id: int
+        :param since: only messages sent since this time
+        :type since: datetime
+        :param until: only messages sent before this time
+        :type until: datetime
+        :param after: (rank, timestamp, message_id) of last row of previous page, None for first page
+        :type after: tuple[float, datetime, int]
+        :param page_size: number of rows on page
+        :type page_size: int
+        :return: (rows of (timestamp, message_id, user_id, channel_id, content, rank), key of next page or None)
+        :rtype: tuple[list, tuple[float, datetime, int]]
+        """
+
+        SEARCH_QUERY = self.messages_queries[18]
+
+        params = {
+            "query": query,
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "channel_id": channel_id,
+            "since": since,
+            "until": until,
+            "after_rank": after[0] if after else None,
+            "after_timestamp": after[1] if after else None,
+            "after_message_id": after[2] if after else None,
+            #one row more to know if there is next page
+            "limit": page_size + 1
+        }
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(SEARCH_QUERY, params)
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, (rows[-1][5], rows[-1][0], rows[-1][1])
+
+        return rows, None
+
+    async def track_member_joins_and_leaves(self, member: discord.Member, join: bool, leave: bool, timestamp: datetime):
         """
         Inserts record that is tracking that member joins or leaves guid
-        
+
         :param member: member that changes state of being in guild.
         :type member: discord.Member
         :param join: if user joining rn to guild
@@ -284,17 +730,16 @@ class Logging_Database:
         :param leave: if user leaving guild rn
         :type leave: bool
         :param timestamp: time of this action
-        :type timestamp: str
+        :type timestamp: datetime
         """
 
-        ADD_RECORD_QUERY = self.members_queries[4]
+        ADD_RECORD_QUERY = self.members_queries[2]
 
         try:
-            self.cursor.execute(ADD_RECORD_QUERY, (member.id, timestamp, join, leave))
-            self.connection.commit()
+            await self.pool.execute(ADD_RECORD_QUERY, (member.id, timestamp, join, leave, member.guild.id))
+            self.versions.bump("members")
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
     async def update_user(self, before: discord.Member, after: discord.Member):
         """
@@ -307,17 +752,16 @@ class Logging_Database:
         """
         if(before.id != after.id):
             raise Exception("User id do not match!")
-        
-        UPDATE_QUERY = self.members_queries[5]
+
+        UPDATE_QUERY = self.members_queries[3]
 
         data = (after.global_name, after.id)
 
         try:
-            self.cursor.execute(UPDATE_QUERY, data)
-            self.connection.commit()
+            await self.pool.execute(UPDATE_QUERY, data)
+            self.versions.bump("members")
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
     async def get_all_statuses(self) -> list:
         """
@@ -327,19 +771,114 @@ class Logging_Database:
         :rtype: list
         """
 
-        GET_QUERY = self.members_queries[6]
+        GET_QUERY = self.members_queries[4]
 
         result = []
 
         try:
-            self.cursor.execute(GET_QUERY)
-            result = self.cursor.fetchall()
+            result = await self.pool.fetchall(GET_QUERY)
+        except Exception as e:
+            print("error: " + str(e))
+
+        return result
+
+    async def get_member_stats(self, guild_id: int) -> MemberStats:
+        """
+        Gets counters of joins and leaves maintained by database on every insert to member_joins_leaves
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :return: stats of guild
+        :rtype: MemberStats
+        """
+
+        GET_QUERY = self.members_queries[12]
+
+        result = MemberStats(0, 0, None, None, None, None)
+
+        try:
+            row = await self.pool.fetchone(GET_QUERY, (guild_id,))
+            if row is not None:
+                result = MemberStats(*row)
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
+            if self.raise_errors:
+                raise
 
         return result
-    
+
+    async def get_members_page(self, guild_id: int, *, after: int = None, page_size: int = 50) -> tuple[list, int]:
+        """
+        Gets one page of members of guild ordered by user id, member of guild is user with any join or leave logged in it
+
+        :param guild_id: id of guild
+        :type guild_id: int
+        :param after: user id of last member of previous page, None for first page
+        :type after: int
+        :param page_size: number of rows on page
+        :type page_size: int
+        :return: (rows of (user_id, username), key of next page or None when this is last page)
+        :rtype: tuple[list, int]
+        """
+
+        GET_PAGE_QUERY = self.members_queries[13]
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(GET_PAGE_QUERY, {"guild_id": guild_id, "after_user_id": after, "limit": page_size + 1})
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, rows[-1][0]
+
+        return rows, None
+
+    async def get_joins_leaves_page(self, *, guild_id: int = None, user_id: int = None, after: int = None,
+                                    page_size: int = 50) -> tuple[list, int]:
+        """
+        Gets one page of joins and leaves, newest first
+
+        :param guild_id: only joins and leaves of this guild
+        :type guild_id: int
+        :param user_id: only joins and leaves of this user
+        :type user_id: int
+        :param after: id of last row of previous page, None for first page
+        :type after: int
+        :param page_size: number of rows on page
+        :type page_size: int
+        :return: (rows of (id, user_id, guild_id, time_stamp, is_join, is_leave), key of next page or None)
+        :rtype: tuple[list, int]
+        """
+
+        GET_PAGE_QUERY = self.members_queries[14]
+
+        params = {
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "after_id": after,
+            "limit": page_size + 1
+        }
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(GET_PAGE_QUERY, params)
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, rows[-1][0]
+
+        return rows, None
+
     async def get_all_members(self) -> list:
         """
         Gets all members from database
@@ -348,16 +887,14 @@ class Logging_Database:
         :rtype: list
         """
 
-        GET_QUERY = self.members_queries[7]
+        GET_QUERY = self.members_queries[5]
 
         result = []
 
         try:
-            self.cursor.execute(GET_QUERY)
-            result = self.cursor.fetchall()
+            result = await self.pool.fetchall(GET_QUERY)
         except Exception as e:
             print("error: " + str(e))
-            self.connection.rollback()
 
         return result
 
@@ -0,0 +1,156 @@
+import os
+import re
+from .pool import DatabasePool, get_pool
+
+class MigrationRunner:
+    """
+    Applies versioned schema migrations from src/database/sql/migrations.
+
+    Migration files are named NNNN_description.sql and are applied in order of their number,
+    applied versions are stored in schema_migrations table. By default whole file runs in one transaction,
+    first lines of file can change that:
+      --migrate:no-transaction  statements run one by one outside of transaction (CREATE INDEX CONCURRENTLY)
+      --migrate:batch           file is one statement repeated in short transactions until it returns NULL,
+                                it gets %(last_id)s and %(batch_size)s and returns last processed id
+    """
+
+    #key of advisory lock, only one bot process migrates database at once
+    LOCK_ID = 7310225
+
+    #row triggers on partitioned tables (0015_full_text_search) need Postgres 13
+    MIN_SERVER_VERSION = 130000
+
+    CREATE_MIGRATIONS_TABLE_QUERY = """
+        CREATE TABLE IF NOT EXISTS schema_migrations
+        (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """
+
+    def __init__(self, pool: DatabasePool = None, path: str = "src/database/sql/migrations", batch_size: int = 5000):
+        """
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param path: directory with migration files
+        :type path: str
+        :param batch_size: rows changed in one transaction by batch migrations
+        :type batch_size: int
+        """
+        self.pool = pool if pool is not None else get_pool()
+        self.path = path
+        self.batch_size = batch_size
+
+    def load_migrations(self) -> list[tuple[int, str, str]]:
+        """
+        Reads migration files from directory
+
+        :return: list of (version, name, sql) sorted by version
+        :rtype: list[tuple[int, str, str]]
+        """
+        migrations = []
+        for filename in os.listdir(self.path):
+            match = re.match(r"^(\d+)_(\w+)\.sql$", filename)
+            if match is None:
+                continue
+            with open(os.path.join(self.path, filename), 'r') as file:
+                migrations.append((int(match.group(1)), match.group(2), file.read()))
+
+        return sorted(migrations)
+
+    async def migrate(self) -> list[int]:
+        """
+        Applies all migrations that were not applied yet
+
+        :return: versions applied by this call
+        :rtype: list[int]
+        """
+        return await self.pool.run(self.migrate_blocking)
+
+    def migrate_blocking(self, cursor) -> list[int]:
+        """
+        Applies migrations on connection of given cursor, commits after every migration
+
+        :param cursor: cursor of pooled connection
+        :return: versions applied by this call
+        :rtype: list[int]
+        :raises RuntimeError: when Postgres is older than MIN_SERVER_VERSION
+        """
+        connection = cursor.connection
+        applied = []
+
+        if connection.server_version < self.MIN_SERVER_VERSION:
+            raise RuntimeError(f"Postgres {self.MIN_SERVER_VERSION // 10000} or newer is required, server is {connection.server_version}")
+
+        cursor.execute(self.CREATE_MIGRATIONS_TABLE_QUERY)
+        connection.commit()
+
+        cursor.execute("SELECT pg_advisory_lock(%s)", (self.LOCK_ID,))
+        try:
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            connection.commit()
+
+            for version, name, query in self.load_migrations():
+                if version in done:
+                    continue
+
+                print(f"Applying migration {version:04d}_{name}")
+                header = query.lstrip().split('\n', 1)[0].strip()
+
+                if header == "--migrate:no-transaction":
+                    self.apply_without_transaction(cursor, query)
+                elif header == "--migrate:batch":
+                    self.apply_in_batches(cursor, query)
+                else:
+                    cursor.execute(query)
+
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                connection.commit()
+                applied.append(version)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (self.LOCK_ID,))
+            connection.commit()
+
+        return applied
+
+    def apply_without_transaction(self, cursor, query: str):
+        """
+        Runs every statement of migration in autocommit mode
+
+        :param cursor: cursor of pooled connection
+        :param query: migration file content
+        :type query: str
+        """
+        connection = cursor.connection
+        connection.commit()
+        connection.autocommit = True
+        try:
+            for statement in query.split(';'):
+                #skips parts that are only comments
+                if re.sub(r"--.*", "", statement).strip():
+                    cursor.execute(statement)
+        finally:
+            connection.autocommit = False
+
+    def apply_in_batches(self, cursor, query: str):
+        """
+        Repeats batch statement, every batch is committed on its own so locks are held shortly
+
+        :param cursor: cursor of pooled connection
+        :param query: migration file content
+        :type query: str
+        """
+        connection = cursor.connection
+        last_id = 0
+        while True:
+            cursor.execute(query, {"last_id": last_id, "batch_size": self.batch_size})
+            row = cursor.fetchone()
+            connection.commit()
+            if row is None or row[0] is None:
+                return
+            last_id = row[0]
@@ -1,11 +1,8 @@
-import os
-import psycopg2
 import discord
-from psycopg2 import OperationalError
-from psycopg2 import sql
-from dotenv import load_dotenv
-from pathlib import Path
 from dataclasses import dataclass
+from .pool import DatabasePool, get_pool
+from .versions import get_versions
+from ..monitoring.metrics import register_queries
 
 @dataclass
 class Note:
@@ -33,58 +30,22 @@ class Note:
     members_ids: list[int]
 
 class Notes_Database():
-    def __init__(self):
+    def __init__(self, pool: DatabasePool = None, *, raise_errors: bool = False):
         """
-        Initializes the Logging_Database object.
-        
-        Loads environment variables from a .env file, which contain the database credentials.
-        Establishes a connection to the PostgreSQL database and creates a cursor for executing queries.
-        """
-
-        #gets path to .env file
-        env_path = Path(__file__).resolve().parent.parent / '.env'
-        load_dotenv(dotenv_path=env_path)
+        Initializes the Notes_Database object.
 
-        #loading database credentials
-        self.database_host = os.getenv('DATABASE_HOST_NAME')
-        self.database_name = os.getenv('DATABASE_NAME')
-        self.database_user = os.getenv('DATABASE_USER')
-        self.database_password = os.getenv('DATABASE_PASSWORD')
-
-        #create connection
-        self.connection = self.create_connection()
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param raise_errors: if read methods used by REST API raise database errors instead of returning empty result
+        :type raise_errors: bool
+        """
 
-        #create cursor fo executing
-        self.cursor = self.connection.cursor()
+        self.pool = pool if pool is not None else get_pool()
+        self.versions = get_versions()
+        self.raise_errors = raise_errors
 
         self.queries = self.load_queries("src/database/sql/notes_queries.sql")
 
-        self.init_tables()
-
-
-    def create_connection(self):
-        """
-        Creates a connection to the PostgreSQL database using the provided credentials.
-        
-        :return: A psycopg2 connection object if successful; otherwise, None.
-        :rtype: psycopg2.extensions.connection or None
-        """
-
-        connection = None
-        try:
-            connection = psycopg2.connect(
-                host=self.database_host,
-                database=self.database_name,
-                user=self.database_user,
-                password=self.database_password,
-                port=5432
-            )
-            print(f"Connected to DB: {self.__class__.__name__}")
-        except OperationalError as e:
-            print(f"Error {e}")
-
-        return connection
-    
     def load_queries(self, filename: str):
         """
         loads queries from .sql file
@@ -94,21 +55,8 @@ class Notes_Database():
         with open(filename, 'r') as file:
             queries = file.read().split(';')
 
-        return queries
+        return register_queries(filename, queries)
     
-    def init_tables(self):   
-        """
-        Inits tables for notes
-
-        """   
-        try:
-            self.cursor.execute(self.queries[0])
-            self.cursor.execute(self.queries[1])
-            self.connection.commit()
-        except Exception as e:
-            print("error: " + str(e))
-            self.connection.commit()
-
     async def add_note(self, note: Note):
         """
         Ads note object to database, and ads every additional user to table to be written in note
@@ -116,7 +64,7 @@ class Notes_Database():
         :param note: Note object to be added to db
         :type note: Note
         """
-        try:
+        def add(cursor):
             params = (
                 note.note_id,
                 note.author_id,
@@ -124,23 +72,25 @@ class Notes_Database():
                 note.content,
                 note.creation_date
             )
-            self.cursor.execute(self.queries[2], params)
+            cursor.execute(self.queries[0], params)
 
             #adding author of note
-            self.cursor.execute(self.queries[3], (note.author_id, note.note_id))
+            cursor.execute(self.queries[1], (note.author_id, note.note_id))
 
             #adding rest of members in note
             for member in note.members_ids:
                 if member:
-                    self.cursor.execute(self.queries[3], (member, note.note_id))
-            self.connection.commit()
+                    cursor.execute(self.queries[1], (member, note.note_id))
+
+        try:
+            await self.pool.run(add)
+            self.versions.bump("notes")
         except Exception as e:
             print("error: " + str(e))
-            self.connection.commit()
 
     async def get_all_member_notes(self, member: discord.Member) -> list[Note]:
         """
-        gets all roles from members that use this commmand
+        gets all notes of member with their members ids in one query
 
         :param member:
         :type member: discord.Member
@@ -148,52 +98,125 @@ class Notes_Database():
         :rtype: list[Note]
         """
         notes = []
-        notes_ids = []
 
         try:
-            self.cursor.execute(self.queries[5], (member.id,))
-            notes_ids = self.cursor.fetchall()
-            for id_tuple in notes_ids:
-                nid = id_tuple[2]
-                print(f"nid: {nid}")
-                notes.append(await self.get_note_by_id(nid))
+            rows = await self.pool.fetchall(self.queries[6], (member.id,))
+            notes = [Note(*row) for row in rows]
         except Exception as e:
             print("error: " + __name__ + str(e))
-            self.connection.rollback()
 
         return notes
-    
+
+    async def get_member_notes_page(self, member_id: int, *, after: int = None, page_size: int = 50) -> tuple[list[Note], int]:
+        """
+        gets one page of member notes, oldest first, using keyset pagination on id of note row
+
+        :param member_id: id of member
+        :type member_id: int
+        :param after: key of last note of previous page, None for first page
+        :type after: int
+        :param page_size: number of notes on page
+        :type page_size: int
+        :returns: (notes, key of next page or None when this is last page)
+        :rtype: tuple[list[Note], int]
+        """
+        params = {
+            "member_id": member_id,
+            "after_id": after,
+            #one row more to know if there is next page
+            "limit": page_size + 1
+        }
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(self.queries[9], params)
+        except Exception as e:
+            print("error: " + str(e))
+            if self.raise_errors:
+                raise
+
+        next_key = rows[page_size - 1][6] if len(rows) > page_size else None
+        return [Note(*row[:6]) for row in rows[:page_size]], next_key
+
+    async def get_member_note_titles(self, member: discord.Member) -> list[tuple[int, str]]:
+        """
+        gets only ids and titles of member notes
+
+        :param member:
+        :type member: discord.Member
+        :returns: list of (note_id, title)
+        :rtype: list[tuple[int, str]]
+        """
+        titles = []
+
+        try:
+            titles = await self.pool.fetchall(self.queries[7], (member.id,))
+        except Exception as e:
+            print("error: " + __name__ + str(e))
+
+        return titles
+
     async def get_note_by_id(self, id: int) -> Note:
         """
-        gets note nad all members of this note
+        gets note nad all members of this note in one query
 
         :param id: note id
         :type id: int
+        :returns: note or None if it does not exist
+        :rtype: Note
         """
         try:
-            #get note 
-            self.cursor.execute(self.queries[4], (id,))
-            note = self.cursor.fetchone()
-
-            #gets members of note
-            self.cursor.execute(self.queries[6], (id,))
-            note_members = self.cursor.fetchall()
-            members_ids = []
-            #adds members ids to list
-            for m in note_members:
-                members_ids.append(m[1])
-
-            #create note object to be returned
-            note_obj = Note(
-                note_id=note[1],
-                author_id=note[2],
-                title=note[3],
-                content=note[4],
-                creation_date=note[5],
-                members_ids=members_ids
-            )
-
-            return note_obj
+            row = await self.pool.fetchone(self.queries[5], (id,))
+            if row is not None:
+                return Note(*row)
         except Exception as e:
             print("error: "  + str(e))
-            self.connection.rollback()
\ No newline at end of file
+            if self.raise_errors:
+                raise
+
+    async def search_notes(self, query: str, member: discord.Member, *, author_id: int = None, since: str = None,
+                           until: str = None, after: tuple[float, int] = None, page_size: int = 10) -> tuple[list, tuple[float, int]]:
+        """
+        full text search in title and content of member notes, best matches first
+
+        :param query: searched text, web search syntax ("quoted phrase", or, -word)
+        :type query: str
+        :param member: only notes of this member are searched
+        :type member: discord.Member
+        :param author_id: only notes written by this user
+        :type author_id: int
+        :param since: only notes created since this day, YYYY-MM-DD
+        :type since: str
+        :param until: only notes created before this day, YYYY-MM-DD
+        :type until: str
+        :param after: (rank, note_id) of last row of previous page, None for first page
+        :type after: tuple[float, int]
+        :param page_size: number of rows on page
+        :type page_size: int
+        :returns: (rows of (note_id, title, author_id, creation_date, fragment, rank), key of next page or None)
+        :rtype: tuple[list, tuple[float, int]]
+        """
+        params = {
+            "query": query,
+            "member_id": member.id,
+            "author_id": author_id,
+            "since": since,
+            "until": until,
+            "after_rank": after[0] if after else None,
+            "after_note_id": after[1] if after else None,
+            "limit": page_size + 1
+        }
+
+        rows = []
+
+        try:
+            rows = await self.pool.fetchall(self.queries[8], params)
+        except Exception as e:
+            print("error: " + str(e))
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, (rows[-1][5], rows[-1][0])
+
+        return rows, None
@@ -0,0 +1,102 @@
+import os
+from datetime import date
+from pathlib import Path
+from psycopg2 import sql
+from dotenv import load_dotenv
+from .pool import DatabasePool, get_pool
+from .versions import get_versions
+from ..monitoring.metrics import register_queries
+
+class PartitionManager:
+    """
+    Keeps monthly partitions of messages tables.
+
+    Partitions for upcoming months are created ahead of time so inserts never land in default partition,
+    partitions older than retention are detached from their table (data stays in detached table).
+    """
+
+    TABLES = ("messages", "edited_messages", "deleted_messages")
+
+    def __init__(self, pool: DatabasePool = None, months_ahead: int = 3, retention_months: int = None):
+        """
+        :param pool: connection pool, shared process wide pool is used by default
+        :type pool: DatabasePool
+        :param months_ahead: number of future months that should have partitions
+        :type months_ahead: int
+        :param retention_months: partitions older than this are detached, default from
+            MESSAGES_RETENTION_MONTHS in .env, 0 keeps everything
+        :type retention_months: int
+        """
+        self.pool = pool if pool is not None else get_pool()
+        self.months_ahead = months_ahead
+
+        if retention_months is None:
+            env_path = Path(__file__).resolve().parent.parent / '.env'
+            load_dotenv(dotenv_path=env_path)
+            retention_months = int(os.getenv('MESSAGES_RETENTION_MONTHS', 0))
+        self.retention_months = retention_months
+
+        with open("src/database/sql/partitions_queries.sql", 'r') as file:
+            self.queries = register_queries(file.name, file.read().split(';'))
+
+    @staticmethod
+    def add_months(day: date, months: int) -> date:
+        """
+        :param day: any day of month
+        :type day: date
+        :param months: months to add, can be negative
+        :type months: int
+        :return: first day of month moved by months
+        :rtype: date
+        """
+        index = day.year * 12 + day.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    async def maintain(self, today: date = None) -> tuple[list[str], list[str]]:
+        """
+        Creates upcoming partitions and detaches old ones
+
+        :param today: current day, used for tests
+        :type today: date
+        :return: (created partitions, detached partitions)
+        :rtype: tuple[list[str], list[str]]
+        """
+
+        CREATE_PARTITION_QUERY = self.queries[0]
+        GET_OLD_PARTITIONS_QUERY = self.queries[1]
+        DETACH_PARTITION_QUERY = self.queries[2]
+
+        today = today or date.today()
+
+        def maintain(cursor):
+            created = []
+            detached = []
+
+            for table in self.TABLES:
+                for months in range(self.months_ahead + 1):
+                    month = self.add_months(today, months)
+                    cursor.execute(CREATE_PARTITION_QUERY, (table, month))
+                    if cursor.fetchone()[0]:
+                        created.append(f"{table}_p{month.strftime('%Y_%m')}")
+
+                if self.retention_months > 0:
+                    cursor.execute(GET_OLD_PARTITIONS_QUERY, (table, self.add_months(today, -self.retention_months)))
+                    for (partition,) in cursor.fetchall():
+                        cursor.execute(sql.SQL(DETACH_PARTITION_QUERY).format(
+                            parent=sql.Identifier(table),
+                            partition=sql.Identifier(partition)
+                        ))
+                        detached.append(partition)
+
+            return created, detached
+
+        result = ([], [])
+
+        try:
+            result = await self.pool.run(maintain)
+            if result[1]:
+                get_versions().bump("messages")
+        except Exception as e:
+            print("error: " + str(e))
+
+        return result
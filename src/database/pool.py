@@ -0,0 +1,242 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from psycopg2 import InterfaceError, OperationalError
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+from ..monitoring.metrics import TimedCursor, query_timer
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection was freed in acquire timeout
+    """
+
+class DatabasePool:
+    """
+    Process wide pool of PostgreSQL connections shared by Logging_Database and Notes_Database.
+
+    Blocking psycopg2 calls are run on worker threads, so event loop is never blocked
+    and up to max_size queries can run in parallel. Every call to run() is one transaction.
+    """
+
+    def __init__(self, *, min_size: int = 1, max_size: int = 10, acquire_timeout: float = 10.0, health_check_interval: float = 30.0):
+        """
+        Loads database credentials from .env file and opens min_size connections
+
+        :param min_size: number of connections kept open all the time
+        :type min_size: int
+        :param max_size: max number of connections open at once
+        :type max_size: int
+        :param acquire_timeout: seconds to wait for free connection before PoolTimeoutError
+        :type acquire_timeout: float
+        :param health_check_interval: connections idle longer than this are checked with SELECT 1 before use
+        :type health_check_interval: float
+        """
+
+        #gets path to .env file
+        env_path = Path(__file__).resolve().parent.parent / '.env'
+        load_dotenv(dotenv_path=env_path)
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        try:
+            self.pool = ThreadedConnectionPool(
+                min_size,
+                max_size,
+                host=os.getenv('DATABASE_HOST_NAME'),
+                database=os.getenv('DATABASE_NAME'),
+                user=os.getenv('DATABASE_USER'),
+                password=os.getenv('DATABASE_PASSWORD'),
+                port=5432,
+                #named queries are timed by cursor
+                cursor_factory=TimedCursor
+            )
+            print(f"Connected to DB! (pool {min_size}-{max_size})")
+        except OperationalError as e:
+            print(f"Error {e}")
+            raise
+
+        self.executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db-pool")
+        self.semaphore = asyncio.Semaphore(max_size)
+
+        #connection id -> time when it was returned to pool
+        self.last_used = {}
+
+    async def run(self, callback, *args):
+        """
+        Runs callback(cursor, *args) on pooled connection in worker thread and commits.
+        On error transaction is rolled back and exception is raised again.
+
+        :param callback: function that takes cursor as first argument
+        :type callback: Callable
+        :return: value returned by callback
+        """
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(f"No free database connection in {self.acquire_timeout}s")
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(self.run_blocking, callback, *args)
+        #slot is freed when thread really finishes, even if awaiting task was cancelled
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.semaphore.release))
+
+        return await asyncio.wrap_future(future)
+
+    def run_blocking(self, callback, *args):
+        """
+        Synchronous version of run(), blocks caller thread
+
+        :param callback: function that takes cursor as first argument
+        :type callback: Callable
+        :return: value returned by callback
+        """
+        connection = self.get_connection()
+        broken = False
+        try:
+            with connection.cursor() as cursor:
+                result = callback(cursor, *args)
+            connection.commit()
+            return result
+        except (OperationalError, InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.last_used[id(connection)] = time.monotonic()
+            self.pool.putconn(connection, close=broken or bool(connection.closed))
+
+    def get_connection(self):
+        """
+        Takes connection from pool, connections that were idle for long time are checked
+        and replaced with new ones when broken
+
+        :return: healthy connection
+        :rtype: psycopg2.extensions.connection
+        """
+        connection = self.pool.getconn()
+        idle = time.monotonic() - self.last_used.get(id(connection), 0)
+
+        if connection.closed or idle > self.health_check_interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except (OperationalError, InterfaceError):
+                print("error: broken connection in pool, reconnecting")
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+
+        return connection
+
+    async def execute(self, query: str, params=None):
+        """
+        Executes query without returning rows
+
+        :param query: sql query
+        :type query: str
+        :param params: query parameters
+        """
+        await self.run(lambda cursor: cursor.execute(query, params))
+
+    async def fetchall(self, query: str, params=None) -> list:
+        """
+        Executes query and returns all rows
+
+        :param query: sql query
+        :type query: str
+        :param params: query parameters
+        :return: list of tuples
+        :rtype: list
+        """
+        def callback(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+        return await self.run(callback)
+
+    async def fetchone(self, query: str, params=None):
+        """
+        Executes query and returns first row
+
+        :param query: sql query
+        :type query: str
+        :param params: query parameters
+        :return: tuple or None
+        """
+        def callback(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchone()
+
+        return await self.run(callback)
+
+    async def execute_values(self, query: str, rows: list[tuple]):
+        """
+        Executes multi-row query, query must contain single VALUES %s placeholder
+
+        :param query: sql query
+        :type query: str
+        :param rows: list of tuples
+        :type rows: list[tuple]
+        """
+        def callback(cursor):
+            #execute_values sends composed statement, so it is timed here by its template
+            start = time.perf_counter()
+            execute_values(cursor, query, rows, page_size=max(len(rows), 1))
+            timer = query_timer(query)
+            if timer is not None:
+                timer.observe(time.perf_counter() - start)
+
+        await self.run(callback)
+
+    def close(self):
+        """
+        Closes all connections and worker threads
+        """
+        self.executor.shutdown(wait=True)
+        self.pool.closeall()
+
+
+_pool = None
+
+def get_pool() -> DatabasePool:
+    """
+    Returns process wide pool, it is created on first call with size and timeouts from .env:
+    DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_SIZE, DATABASE_POOL_TIMEOUT, DATABASE_POOL_HEALTH_CHECK
+
+    :return: shared pool
+    :rtype: DatabasePool
+    """
+    global _pool
+
+    if _pool is None:
+        env_path = Path(__file__).resolve().parent.parent / '.env'
+        load_dotenv(dotenv_path=env_path)
+
+        _pool = DatabasePool(
+            min_size=int(os.getenv('DATABASE_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+            acquire_timeout=float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+            health_check_interval=float(os.getenv('DATABASE_POOL_HEALTH_CHECK', 30))
+        )
+
+    return _pool
+
+def close_pool():
+    """
+    Closes process wide pool if it was created, blocks until running queries finish,
+    so async code calls it with asyncio.to_thread
+    """
+    global _pool
+
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,34 @@
+--get response that is not expired [0]
+UPDATE ai_response_cache
+SET last_used = now()
+WHERE key = %s AND created_at > now() - make_interval(secs => %s)
+RETURNING response;
+
+--add response [1]
+INSERT INTO ai_response_cache (key, model, response, size)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (key) DO UPDATE SET
+    model = EXCLUDED.model,
+    response = EXCLUDED.response,
+    size = EXCLUDED.size,
+    created_at = now(),
+    last_used = now();
+
+--delete expired responses [2]
+DELETE FROM ai_response_cache
+WHERE created_at <= now() - make_interval(secs => %s);
+
+--delete least recently used responses over size limit [3]
+DELETE FROM ai_response_cache
+WHERE key IN (
+    SELECT key
+    FROM (
+        SELECT key, sum(size) OVER (ORDER BY last_used DESC, key) AS total
+        FROM ai_response_cache
+    ) AS used
+    WHERE total > %s
+);
+
+--get number and size of responses [4]
+SELECT count(*), coalesce(sum(size), 0)::BIGINT
+FROM ai_response_cache;
@@ -0,0 +1,20 @@
+--get conversation [0]
+SELECT summary, turns
+FROM ai_conversations
+WHERE scope = %s AND scope_id = %s AND updated_at > now() - make_interval(secs => %s);
+
+--save conversation [1]
+INSERT INTO ai_conversations (scope, scope_id, summary, turns)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (scope, scope_id) DO UPDATE SET
+    summary = EXCLUDED.summary,
+    turns = EXCLUDED.turns,
+    updated_at = now();
+
+--delete conversation [2]
+DELETE FROM ai_conversations
+WHERE scope = %s AND scope_id = %s;
+
+--delete idle conversations [3]
+DELETE FROM ai_conversations
+WHERE updated_at <= now() - make_interval(secs => %s);
@@ -0,0 +1,9 @@
+--get guild configs [0]
+SELECT guild_id, settings FROM guild_config;
+
+--save guild configs [1]
+INSERT INTO guild_config (guild_id, settings)
+VALUES %s
+ON CONFLICT (guild_id) DO UPDATE SET
+    settings = EXCLUDED.settings,
+    updated_at = now();
@@ -1,44 +1,114 @@
---members table init [0]
-CREATE TABLE IF NOT EXISTS members
-(
-    id SERIAL PRIMARY KEY,
-    user_id BIGINT UNIQUE,
-    username TEXT
-);
+--get member by id [0]
+SELECT * FROM members WHERE user_id = %s;
 
---member join and leaves [1]
-CREATE TABLE IF NOT EXISTS member_joins_leaves
-(
-    id SERIAL PRIMARY KEY,
-    user_id BIGINT NOT NULL,
-    time_stamp TEXT,
-    is_join BOOL,
-    is_leave BOOL,
-    CONSTRAINT fk_members
-        FOREIGN KEY (user_id)
-            REFERENCES members(user_id)
-            ON DELETE CASCADE
-);
-
---get member by id [2]
-SELECT * FROM member WHERE user_id = %s;
-
---add member [3]
+--add member [1]
 INSERT INTO members (user_id, username)
 VALUES (%s, %s)
 ON CONFLICT (user_id) 
     DO UPDATE SET
     username = EXCLUDED.username;
 
---trac member statuses [4]
-INSER INTO member_joins_leaves (user_id, time_stamp, is_join, is_leave) 
-VALUES (%s, %s, %s, %s);
+--trac member statuses [2]
+INSERT INTO member_joins_leaves (user_id, time_stamp, is_join, is_leave, guild_id)
+VALUES (%s, %s, %s, %s, %s);
 
---update member username [5]
+--update member username [3]
 UPDATE members SET username = %s WHERE user_id = %s;
 
---get all statuses [6]
-SELECT * FROM member_joins_leaves;
+--get all statuses [4]
+SELECT id, user_id, time_stamp, is_join, is_leave, guild_id FROM member_joins_leaves;
+
+--get all members [5]
+SELECT * FROM members;
+
+--create members staging table [6]
+CREATE TEMP TABLE members_staging
+(
+    user_id BIGINT PRIMARY KEY,
+    username TEXT,
+    joined_at TIMESTAMPTZ
+) ON COMMIT DROP;
+
+--copy members to staging table [7]
+COPY members_staging (user_id, username, joined_at) FROM STDIN WITH (FORMAT csv);
+
+--find members that joined guild while bot was offline [8]
+CREATE TEMP TABLE members_offline_joins ON COMMIT DROP AS
+WITH last_status AS (
+    SELECT DISTINCT ON (user_id) user_id, is_join
+    FROM member_joins_leaves
+    WHERE guild_id = %(guild_id)s
+    ORDER BY user_id, id DESC
+)
+SELECT s.user_id, s.joined_at
+FROM members_staging AS s
+LEFT JOIN last_status AS l
+    ON l.user_id = s.user_id
+WHERE l.user_id IS NULL OR l.is_join = FALSE;
+
+--track members that left guild while bot was offline [9]
+WITH last_status AS (
+    SELECT DISTINCT ON (user_id) user_id, is_join
+    FROM member_joins_leaves
+    WHERE guild_id = %(guild_id)s
+    ORDER BY user_id, id DESC
+)
+INSERT INTO member_joins_leaves (user_id, time_stamp, is_join, is_leave, guild_id)
+SELECT l.user_id, %(timestamp)s, FALSE, TRUE, %(guild_id)s
+FROM last_status AS l
+WHERE l.is_join
+    AND NOT EXISTS (SELECT 1 FROM members_staging AS s WHERE s.user_id = l.user_id);
+
+--merge staging table into members [10]
+INSERT INTO members (user_id, username)
+SELECT user_id, username FROM members_staging
+ON CONFLICT (user_id)
+    DO UPDATE SET
+    username = EXCLUDED.username
+    WHERE members.username IS DISTINCT FROM EXCLUDED.username;
+
+--track members that joined guild while bot was offline [11]
+INSERT INTO member_joins_leaves (user_id, time_stamp, is_join, is_leave, guild_id)
+SELECT user_id, joined_at, TRUE, FALSE, %(guild_id)s FROM members_offline_joins;
+
+--get member stats of guild [12]
+SELECT joins, leaves, last_join_user_id, last_join_time_stamp, last_leave_user_id, last_leave_time_stamp
+FROM member_stats
+WHERE guild_id = %s;
+
+--get members of guild page [13]
+SELECT m.user_id, m.username
+FROM members AS m
+WHERE EXISTS (SELECT 1 FROM member_joins_leaves AS j WHERE j.guild_id = %(guild_id)s AND j.user_id = m.user_id)
+    AND (%(after_user_id)s IS NULL OR m.user_id > %(after_user_id)s)
+ORDER BY m.user_id
+LIMIT %(limit)s;
+
+--get joins and leaves page [14]
+SELECT id, user_id, guild_id, time_stamp, is_join, is_leave
+FROM member_joins_leaves
+WHERE (%(guild_id)s IS NULL OR guild_id = %(guild_id)s)
+    AND (%(user_id)s IS NULL OR user_id = %(user_id)s)
+    AND (%(after_id)s IS NULL OR id < %(after_id)s)
+ORDER BY id DESC
+LIMIT %(limit)s;
+
+--assign joins and leaves of unknown guild [15]
+UPDATE member_joins_leaves SET guild_id = %(guild_id)s WHERE guild_id IS NULL;
+
+--clear member stats of unknown guild and guild [16]
+DELETE FROM member_stats WHERE guild_id IN (0, %(guild_id)s);
 
---get all members [7]
-SELECT * FROM members;
\ No newline at end of file
+--count member stats of guild [17]
+INSERT INTO member_stats (guild_id, joins, leaves, last_join_user_id, last_join_time_stamp, last_leave_user_id, last_leave_time_stamp)
+SELECT
+    guild_id,
+    count(*) FILTER (WHERE is_join),
+    count(*) FILTER (WHERE is_leave),
+    (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_join))[1],
+    max(time_stamp) FILTER (WHERE is_join),
+    (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_leave))[1],
+    max(time_stamp) FILTER (WHERE is_leave)
+FROM member_joins_leaves
+WHERE guild_id = %(guild_id)s
+GROUP BY guild_id;
@@ -1,60 +1,239 @@
---init messages table [0]
-CREATE TABLE IF NOT EXISTS messages
-(
-    id SERIAL PRIMARY KEY,
-    message_id BIGINT UNIQUE,
-    user_id BIGINT,
-    timestamp TEXT,
-    guild_name TEXT,
-    channel_name TEXT,
-    content TEXT
-);
-
---init deleted messages query [1]
-CREATE TABLE IF NOT EXISTS deleted_messages
-(
-    id SERIAL PRIMARY KEY,
-    message_id BIGINT UNIQUE NOT NULL,
-    CONSTRAINT fk_message
-        FOREIGN KEY (message_id)
-            REFERENCES messages(message_id)
-            ON DELETE CASCADE
-);
-
---edited messages query [2]
-CREATE TABLE IF NOT EXISTS edited_messages
-(
-    id SERIAL PRIMARY KEY,
-    message_id BIGINT NOT NULL,
-    before_content TEXT,
-    after_content TEXT,
-    CONSTRAINT fk_message
-        FOREIGN KEY (message_id)
-            REFERENCES messages(message_id)
-            ON DELETE CASCADE
-);
+--get message by id [0]
+SELECT id, message_id, user_id, timestamp, guild_name, channel_name, content, guild_id, channel_id
+FROM messages WHERE message_id = %s;
 
---get message by id [3]
-SELECT * FROM messages WHERE message_id = %s;
-
---add deleted message [4]
+--add deleted message [1]
 INSERT INTO deleted_messages (message_id)
 VALUES (%s); 
 
---add edited message [5]
+--add edited message [2]
 INSERT INTO edited_messages (message_id, before_content, after_content)
 VALUES (%s, %s, %s);
 
---add message [6]
-INSERT INTO messages (message_id, user_id, timestamp, guild_name, channel_name, content)
-VALUES (%s,%s,%s,%s,%s,%s);
+--add message [3]
+INSERT INTO messages (message_id, user_id, timestamp, guild_id, guild_name, channel_id, channel_name, content)
+VALUES (%s,%s,%s,%s,%s,%s,%s,%s);
 
---get all messages [7]
-SELECT * FROM messages;
+--get all messages in time range [4]
+SELECT id, message_id, user_id, timestamp, guild_name, channel_name, content, guild_id, channel_id
+FROM messages
+WHERE (%(since)s IS NULL OR timestamp >= %(since)s)
+    AND (%(until)s IS NULL OR timestamp < %(until)s);
 
---get members messages by username [8]
-SELECT u.username AS member_username, m.*
+--get members messages by username [5]
+SELECT u.username AS member_username,
+    m.id, m.message_id, m.user_id, m.timestamp, m.guild_name, m.channel_name, m.content, m.guild_id, m.channel_id
 FROM members AS u
 INNER JOIN messages AS m
     ON m.user_id = u.user_id
-    WHERE u.username = %s;
\ No newline at end of file
+    WHERE u.username = %s;
+
+--add messages batch and add them to hourly counts [6]
+WITH inserted AS (
+    INSERT INTO messages (message_id, user_id, timestamp, guild_id, guild_name, channel_id, channel_name, content)
+    VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING guild_id, channel_id, channel_name, user_id, date_trunc('hour', timestamp) AS hour
+),
+guild_counts AS (
+    INSERT INTO message_counts_guilds AS c (guild_id, hour, messages)
+    SELECT guild_id, hour, count(*)
+    FROM inserted
+    WHERE guild_id IS NOT NULL
+    GROUP BY guild_id, hour
+    ON CONFLICT (guild_id, hour) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+),
+channel_counts AS (
+    INSERT INTO message_counts_channels AS c (guild_id, hour, channel_id, channel_name, messages)
+    SELECT guild_id, hour, channel_id, max(channel_name), count(*)
+    FROM inserted
+    WHERE guild_id IS NOT NULL AND channel_id IS NOT NULL
+    GROUP BY guild_id, hour, channel_id
+    ON CONFLICT (guild_id, hour, channel_id) DO UPDATE SET
+        messages = c.messages + EXCLUDED.messages,
+        channel_name = EXCLUDED.channel_name
+)
+INSERT INTO message_counts_users AS c (guild_id, hour, user_id, messages)
+SELECT guild_id, hour, user_id, count(*)
+FROM inserted
+WHERE guild_id IS NOT NULL
+GROUP BY guild_id, hour, user_id
+ON CONFLICT (guild_id, hour, user_id) DO UPDATE SET messages = c.messages + EXCLUDED.messages;
+
+--add edited messages batch [7]
+INSERT INTO edited_messages (message_id, before_content, after_content)
+SELECT v.message_id, v.before_content, v.after_content
+FROM (VALUES %s) AS v(message_id, before_content, after_content)
+WHERE EXISTS (SELECT 1 FROM messages AS m WHERE m.message_id = v.message_id);
+
+--add deleted messages batch [8]
+INSERT INTO deleted_messages (message_id)
+SELECT v.message_id
+FROM (VALUES %s) AS v(message_id)
+WHERE EXISTS (SELECT 1 FROM messages AS m WHERE m.message_id = v.message_id)
+    AND NOT EXISTS (SELECT 1 FROM deleted_messages AS d WHERE d.message_id = v.message_id)
+ON CONFLICT DO NOTHING;
+
+--create channel ids mapping table [9]
+CREATE TEMP TABLE IF NOT EXISTS channel_ids_mapping
+(
+    guild_name TEXT,
+    channel_name TEXT,
+    guild_id BIGINT,
+    channel_id BIGINT,
+    PRIMARY KEY (guild_name, channel_name)
+);
+
+--fill channel ids mapping table [10]
+INSERT INTO channel_ids_mapping (guild_name, channel_name, guild_id, channel_id)
+VALUES %s
+ON CONFLICT DO NOTHING;
+
+--backfill guild and channel ids batch and add backfilled messages to hourly counts [11]
+WITH batch AS (
+    SELECT id FROM messages
+    WHERE id > %s AND guild_id IS NULL
+    ORDER BY id
+    LIMIT %s
+),
+updated AS (
+    UPDATE messages AS m
+    SET guild_id = c.guild_id, channel_id = c.channel_id
+    FROM channel_ids_mapping AS c
+    WHERE m.id IN (SELECT id FROM batch)
+        AND c.guild_name = m.guild_name
+        AND c.channel_name = m.channel_name
+    RETURNING m.guild_id, m.channel_id, m.channel_name, m.user_id, date_trunc('hour', m.timestamp) AS hour
+),
+guild_counts AS (
+    INSERT INTO message_counts_guilds AS c (guild_id, hour, messages)
+    SELECT guild_id, hour, count(*)
+    FROM updated
+    GROUP BY guild_id, hour
+    ON CONFLICT (guild_id, hour) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+),
+channel_counts AS (
+    INSERT INTO message_counts_channels AS c (guild_id, hour, channel_id, channel_name, messages)
+    SELECT guild_id, hour, channel_id, max(channel_name), count(*)
+    FROM updated
+    WHERE channel_id IS NOT NULL
+    GROUP BY guild_id, hour, channel_id
+    ON CONFLICT (guild_id, hour, channel_id) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+),
+user_counts AS (
+    INSERT INTO message_counts_users AS c (guild_id, hour, user_id, messages)
+    SELECT guild_id, hour, user_id, count(*)
+    FROM updated
+    GROUP BY guild_id, hour, user_id
+    ON CONFLICT (guild_id, hour, user_id) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+)
+SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated);
+
+--drop channel ids mapping table [12]
+DROP TABLE IF EXISTS channel_ids_mapping;
+
+--get member messages page [13]
+SELECT m.timestamp, m.message_id, m.channel_name, m.content
+FROM messages AS m
+WHERE m.user_id = %(user_id)s
+    AND m.guild_id = %(guild_id)s
+    AND (%(channel_id)s IS NULL OR m.channel_id = %(channel_id)s)
+    AND (%(since)s IS NULL OR m.timestamp >= %(since)s)
+    AND (%(until)s IS NULL OR m.timestamp < %(until)s)
+    AND (%(after_timestamp)s IS NULL OR (m.timestamp, m.message_id) < (%(after_timestamp)s, %(after_message_id)s))
+ORDER BY m.timestamp DESC, m.message_id DESC;
+
+--export messages [14]
+SELECT m.message_id, m.user_id, m.guild_id, m.guild_name, m.channel_id, m.channel_name, m.timestamp, m.content
+FROM messages AS m
+WHERE (%(guild_id)s IS NULL OR m.guild_id = %(guild_id)s)
+    AND (%(channel_id)s IS NULL OR m.channel_id = %(channel_id)s)
+    AND (%(user_id)s IS NULL OR m.user_id = %(user_id)s)
+    AND (%(since)s IS NULL OR m.timestamp >= %(since)s)
+    AND (%(until)s IS NULL OR m.timestamp < %(until)s)
+    AND (%(after_timestamp)s IS NULL OR (m.timestamp, m.message_id) > (%(after_timestamp)s, %(after_message_id)s))
+ORDER BY m.timestamp, m.message_id;
+
+--get top channels in time range [15]
+SELECT channel_id, (array_agg(channel_name ORDER BY hour DESC))[1], sum(messages)::BIGINT AS total
+FROM message_counts_channels
+WHERE guild_id = %(guild_id)s AND hour >= %(since)s AND hour < %(until)s
+GROUP BY channel_id
+ORDER BY total DESC
+LIMIT %(limit)s;
+
+--get top users in time range [16]
+SELECT user_id, sum(messages)::BIGINT AS total
+FROM message_counts_users
+WHERE guild_id = %(guild_id)s AND hour >= %(since)s AND hour < %(until)s
+GROUP BY user_id
+ORDER BY total DESC
+LIMIT %(limit)s;
+
+--get guild hourly counts in time range [17]
+SELECT hour, messages
+FROM message_counts_guilds
+WHERE guild_id = %(guild_id)s AND hour >= %(since)s AND hour < %(until)s
+ORDER BY hour;
+
+--search messages page [18]
+SELECT m.timestamp, m.message_id, m.user_id, m.channel_id, m.content, ts_rank(m.search_vector, q)::FLOAT8 AS rank
+FROM messages AS m, websearch_to_tsquery('simple', %(query)s) AS q
+WHERE m.search_vector @@ q
+    AND m.guild_id = %(guild_id)s
+    AND (%(user_id)s IS NULL OR m.user_id = %(user_id)s)
+    AND (%(channel_id)s IS NULL OR m.channel_id = %(channel_id)s)
+    AND (%(since)s IS NULL OR m.timestamp >= %(since)s)
+    AND (%(until)s IS NULL OR m.timestamp < %(until)s)
+    AND (%(after_rank)s IS NULL OR (ts_rank(m.search_vector, q)::FLOAT8, m.timestamp, m.message_id) < (%(after_rank)s, %(after_timestamp)s, %(after_message_id)s))
+ORDER BY rank DESC, m.timestamp DESC, m.message_id DESC
+LIMIT %(limit)s;
+
+--get messages page [19]
+SELECT m.timestamp, m.message_id, m.user_id, m.guild_id, m.channel_id, m.channel_name, m.content
+FROM messages AS m
+WHERE (%(guild_id)s IS NULL OR m.guild_id = %(guild_id)s)
+    AND (%(channel_id)s IS NULL OR m.channel_id = %(channel_id)s)
+    AND (%(user_id)s IS NULL OR m.user_id = %(user_id)s)
+    AND (%(since)s IS NULL OR m.timestamp >= %(since)s)
+    AND (%(until)s IS NULL OR m.timestamp < %(until)s)
+    AND (%(after_timestamp)s IS NULL OR (m.timestamp, m.message_id) < (%(after_timestamp)s, %(after_message_id)s))
+ORDER BY m.timestamp DESC, m.message_id DESC
+LIMIT %(limit)s;
+
+--assign messages of unknown guild batch and add them to hourly counts [20]
+WITH batch AS (
+    SELECT id FROM messages
+    WHERE id > %(last_id)s AND guild_id IS NULL
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+updated AS (
+    UPDATE messages AS m
+    SET guild_id = %(guild_id)s
+    WHERE m.id IN (SELECT id FROM batch)
+    RETURNING m.guild_id, m.channel_id, m.channel_name, m.user_id, date_trunc('hour', m.timestamp) AS hour
+),
+guild_counts AS (
+    INSERT INTO message_counts_guilds AS c (guild_id, hour, messages)
+    SELECT guild_id, hour, count(*)
+    FROM updated
+    GROUP BY guild_id, hour
+    ON CONFLICT (guild_id, hour) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+),
+channel_counts AS (
+    INSERT INTO message_counts_channels AS c (guild_id, hour, channel_id, channel_name, messages)
+    SELECT guild_id, hour, channel_id, max(channel_name), count(*)
+    FROM updated
+    WHERE channel_id IS NOT NULL
+    GROUP BY guild_id, hour, channel_id
+    ON CONFLICT (guild_id, hour, channel_id) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+),
+user_counts AS (
+    INSERT INTO message_counts_users AS c (guild_id, hour, user_id, messages)
+    SELECT guild_id, hour, user_id, count(*)
+    FROM updated
+    GROUP BY guild_id, hour, user_id
+    ON CONFLICT (guild_id, hour, user_id) DO UPDATE SET messages = c.messages + EXCLUDED.messages
+)
+SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated);
@@ -0,0 +1,80 @@
+--initial schema, same tables that bot was creating before migrations existed
+
+--members table
+CREATE TABLE IF NOT EXISTS members
+(
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT UNIQUE,
+    username TEXT
+);
+
+--member joins and leaves table
+CREATE TABLE IF NOT EXISTS member_joins_leaves
+(
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    time_stamp TEXT,
+    is_join BOOL,
+    is_leave BOOL,
+    CONSTRAINT fk_members
+        FOREIGN KEY (user_id)
+            REFERENCES members(user_id)
+            ON DELETE CASCADE
+);
+
+--messages table
+CREATE TABLE IF NOT EXISTS messages
+(
+    id SERIAL PRIMARY KEY,
+    message_id BIGINT UNIQUE,
+    user_id BIGINT,
+    timestamp TEXT,
+    guild_name TEXT,
+    channel_name TEXT,
+    content TEXT
+);
+
+--deleted messages table
+CREATE TABLE IF NOT EXISTS deleted_messages
+(
+    id SERIAL PRIMARY KEY,
+    message_id BIGINT UNIQUE NOT NULL,
+    CONSTRAINT fk_message
+        FOREIGN KEY (message_id)
+            REFERENCES messages(message_id)
+            ON DELETE CASCADE
+);
+
+--edited messages table
+CREATE TABLE IF NOT EXISTS edited_messages
+(
+    id SERIAL PRIMARY KEY,
+    message_id BIGINT NOT NULL,
+    before_content TEXT,
+    after_content TEXT,
+    CONSTRAINT fk_message
+        FOREIGN KEY (message_id)
+            REFERENCES messages(message_id)
+            ON DELETE CASCADE
+);
+
+--notes table
+CREATE TABLE IF NOT EXISTS notes(
+    id SERIAL PRIMARY KEY,
+    note_id BIGINT UNIQUE,
+    author_id BIGINT,
+    title TEXT,
+    content TEXT,
+    creation_date TEXT
+);
+
+--notes members table
+CREATE TABLE IF NOT EXISTS notes_users(
+    id SERIAL PRIMARY KEY,
+    member_id BIGINT,
+    note_id BIGINT NOT NULL,
+    CONSTRAINT fk_notes
+        FOREIGN KEY (note_id)
+            REFERENCES notes(note_id)
+            ON DELETE CASCADE
+);
@@ -0,0 +1,8 @@
+--new typed columns are added next to old text ones, adding nullable column does not rewrite table
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS timestamp_tz TIMESTAMPTZ;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS guild_id BIGINT;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS channel_id BIGINT;
+
+ALTER TABLE member_joins_leaves ADD COLUMN IF NOT EXISTS time_stamp_tz TIMESTAMPTZ;
+ALTER TABLE member_joins_leaves ADD COLUMN IF NOT EXISTS guild_id BIGINT;
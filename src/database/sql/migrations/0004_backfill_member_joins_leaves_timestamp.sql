@@ -0,0 +1,15 @@
+--migrate:batch
+--old timestamps were written as 'YYYY-MM-DD HH24:MI:SS' text, they are read in database session time zone
+WITH batch AS (
+    SELECT id FROM member_joins_leaves
+    WHERE id > %(last_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+updated AS (
+    UPDATE member_joins_leaves
+    SET time_stamp_tz = to_timestamp(time_stamp, 'YYYY-MM-DD HH24:MI:SS')
+    WHERE id IN (SELECT id FROM batch)
+        AND time_stamp ~ '^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$'
+)
+SELECT max(id) FROM batch
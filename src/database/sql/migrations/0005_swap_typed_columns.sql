@@ -0,0 +1,7 @@
+--replaces text columns with backfilled typed ones, dropping and renaming columns does not rewrite table
+
+ALTER TABLE messages DROP COLUMN timestamp;
+ALTER TABLE messages RENAME COLUMN timestamp_tz TO timestamp;
+
+ALTER TABLE member_joins_leaves DROP COLUMN time_stamp;
+ALTER TABLE member_joins_leaves RENAME COLUMN time_stamp_tz TO time_stamp;
@@ -0,0 +1,17 @@
+--migrate:no-transaction
+--indexes are built concurrently so tables stay writable while they are created
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_user_id_timestamp_idx
+    ON messages (user_id, timestamp);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_guild_id_channel_id_timestamp_idx
+    ON messages (guild_id, channel_id, timestamp);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS member_joins_leaves_user_id_time_stamp_idx
+    ON member_joins_leaves (user_id, time_stamp);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS members_username_idx
+    ON members (username);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS edited_messages_message_id_idx
+    ON edited_messages (message_id);
@@ -0,0 +1,80 @@
+--partitioned copies of messages tables, they are filled by next migrations and swapped with old ones at the end
+--unique keys of partitioned table must contain partition key, so foreign keys to messages(message_id) are dropped
+
+--creates monthly partition <prefix>_pYYYY_MM of table if it does not exist yet, used also by PartitionManager
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month DATE, prefix TEXT DEFAULT NULL) RETURNS BOOLEAN AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    partition_name TEXT := format('%s_p%s', coalesce(prefix, parent), to_char(start_date, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        parent,
+        start_date,
+        (start_date + interval '1 month')::date
+    );
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER SEQUENCE messages_id_seq AS BIGINT;
+
+CREATE TABLE messages_partitioned
+(
+    id BIGINT NOT NULL DEFAULT nextval('messages_id_seq'),
+    message_id BIGINT NOT NULL,
+    user_id BIGINT,
+    guild_name TEXT,
+    channel_name TEXT,
+    content TEXT,
+    guild_id BIGINT,
+    channel_id BIGINT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp),
+    UNIQUE (message_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE edited_messages_partitioned
+(
+    id BIGINT NOT NULL DEFAULT nextval('edited_messages_id_seq'),
+    message_id BIGINT NOT NULL,
+    before_content TEXT,
+    after_content TEXT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE deleted_messages_partitioned
+(
+    id BIGINT NOT NULL DEFAULT nextval('deleted_messages_id_seq'),
+    message_id BIGINT NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp),
+    UNIQUE (message_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+--rows without valid timestamp and rows outside of monthly partitions
+CREATE TABLE messages_default PARTITION OF messages_partitioned DEFAULT;
+CREATE TABLE edited_messages_default PARTITION OF edited_messages_partitioned DEFAULT;
+CREATE TABLE deleted_messages_default PARTITION OF deleted_messages_partitioned DEFAULT;
+
+--monthly partitions from first logged message to three months ahead
+DO $$
+DECLARE
+    month DATE;
+    first_month DATE := date_trunc('month', coalesce((SELECT min(timestamp) FROM messages), now()))::date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(first_month, date_trunc('month', now() + interval '3 months')::date, interval '1 month')::date
+    LOOP
+        PERFORM create_monthly_partition('messages_partitioned', month, 'messages');
+        PERFORM create_monthly_partition('edited_messages_partitioned', month, 'edited_messages');
+        PERFORM create_monthly_partition('deleted_messages_partitioned', month, 'deleted_messages');
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,15 @@
+--migrate:batch
+WITH batch AS (
+    SELECT * FROM messages
+    WHERE id > %(last_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+copied AS (
+    INSERT INTO messages_partitioned (id, message_id, user_id, guild_name, channel_name, content, guild_id, channel_id, timestamp)
+    SELECT id, message_id, user_id, guild_name, channel_name, content, guild_id, channel_id, coalesce(timestamp, to_timestamp(0))
+    FROM batch
+    WHERE message_id IS NOT NULL
+    ON CONFLICT DO NOTHING
+)
+SELECT max(id) FROM batch
@@ -0,0 +1,17 @@
+--migrate:batch
+--old edits have no time of their own, time of edited message is used
+WITH batch AS (
+    SELECT * FROM edited_messages
+    WHERE id > %(last_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+copied AS (
+    INSERT INTO edited_messages_partitioned (id, message_id, before_content, after_content, timestamp)
+    SELECT b.id, b.message_id, b.before_content, b.after_content, coalesce(m.timestamp, to_timestamp(0))
+    FROM batch AS b
+    LEFT JOIN messages AS m
+        ON m.message_id = b.message_id
+    ON CONFLICT DO NOTHING
+)
+SELECT max(id) FROM batch
@@ -0,0 +1,17 @@
+--migrate:batch
+--old deletes have no time of their own, time of deleted message is used
+WITH batch AS (
+    SELECT * FROM deleted_messages
+    WHERE id > %(last_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+copied AS (
+    INSERT INTO deleted_messages_partitioned (id, message_id, timestamp)
+    SELECT b.id, b.message_id, coalesce(m.timestamp, to_timestamp(0))
+    FROM batch AS b
+    LEFT JOIN messages AS m
+        ON m.message_id = b.message_id
+    ON CONFLICT DO NOTHING
+)
+SELECT max(id) FROM batch
@@ -0,0 +1,50 @@
+--copies rows written after batches, swaps tables and moves indexes to partitioned ones
+
+INSERT INTO messages_partitioned (id, message_id, user_id, guild_name, channel_name, content, guild_id, channel_id, timestamp)
+SELECT id, message_id, user_id, guild_name, channel_name, content, guild_id, channel_id, coalesce(timestamp, to_timestamp(0))
+FROM messages
+WHERE id > (SELECT coalesce(max(id), 0) FROM messages_partitioned) AND message_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO edited_messages_partitioned (id, message_id, before_content, after_content, timestamp)
+SELECT e.id, e.message_id, e.before_content, e.after_content, coalesce(m.timestamp, to_timestamp(0))
+FROM edited_messages AS e
+LEFT JOIN messages AS m
+    ON m.message_id = e.message_id
+WHERE e.id > (SELECT coalesce(max(id), 0) FROM edited_messages_partitioned)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO deleted_messages_partitioned (id, message_id, timestamp)
+SELECT d.id, d.message_id, coalesce(m.timestamp, to_timestamp(0))
+FROM deleted_messages AS d
+LEFT JOIN messages AS m
+    ON m.message_id = d.message_id
+WHERE d.id > (SELECT coalesce(max(id), 0) FROM deleted_messages_partitioned)
+ON CONFLICT DO NOTHING;
+
+--sequences would be dropped together with old tables
+ALTER SEQUENCE messages_id_seq OWNED BY NONE;
+ALTER SEQUENCE edited_messages_id_seq OWNED BY NONE;
+ALTER SEQUENCE deleted_messages_id_seq OWNED BY NONE;
+
+DROP TABLE deleted_messages;
+DROP TABLE edited_messages;
+DROP TABLE messages;
+
+ALTER TABLE messages_partitioned RENAME TO messages;
+ALTER TABLE edited_messages_partitioned RENAME TO edited_messages;
+ALTER TABLE deleted_messages_partitioned RENAME TO deleted_messages;
+
+ALTER SEQUENCE messages_id_seq OWNED BY messages.id;
+ALTER SEQUENCE edited_messages_id_seq OWNED BY edited_messages.id;
+ALTER SEQUENCE deleted_messages_id_seq OWNED BY deleted_messages.id;
+
+--indexes on partitioned table are created on every partition, also on partitions created later
+CREATE INDEX messages_user_id_timestamp_idx
+    ON messages (user_id, timestamp);
+
+CREATE INDEX messages_guild_id_channel_id_timestamp_idx
+    ON messages (guild_id, channel_id, timestamp);
+
+CREATE INDEX edited_messages_message_id_idx
+    ON edited_messages (message_id);
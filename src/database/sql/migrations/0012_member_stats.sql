@@ -0,0 +1,64 @@
+--counters of joins and leaves with last join and leave per guild, rows with unknown guild are counted under guild_id 0
+
+CREATE TABLE IF NOT EXISTS member_stats
+(
+    guild_id BIGINT PRIMARY KEY,
+    joins BIGINT NOT NULL DEFAULT 0,
+    leaves BIGINT NOT NULL DEFAULT 0,
+    last_join_user_id BIGINT,
+    last_join_time_stamp TIMESTAMPTZ,
+    last_leave_user_id BIGINT,
+    last_leave_time_stamp TIMESTAMPTZ
+);
+
+--counts history that was tracked before counters existed
+INSERT INTO member_stats (guild_id, joins, leaves, last_join_user_id, last_join_time_stamp, last_leave_user_id, last_leave_time_stamp)
+SELECT
+    coalesce(guild_id, 0),
+    count(*) FILTER (WHERE is_join),
+    count(*) FILTER (WHERE is_leave),
+    (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_join))[1],
+    max(time_stamp) FILTER (WHERE is_join),
+    (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_leave))[1],
+    max(time_stamp) FILTER (WHERE is_leave)
+FROM member_joins_leaves
+GROUP BY coalesce(guild_id, 0)
+ON CONFLICT (guild_id) DO NOTHING;
+
+--adds every inserted batch of joins and leaves to counters with one upsert
+CREATE OR REPLACE FUNCTION update_member_stats() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO member_stats AS s (guild_id, joins, leaves, last_join_user_id, last_join_time_stamp, last_leave_user_id, last_leave_time_stamp)
+    SELECT
+        coalesce(guild_id, 0),
+        count(*) FILTER (WHERE is_join),
+        count(*) FILTER (WHERE is_leave),
+        (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_join))[1],
+        max(time_stamp) FILTER (WHERE is_join),
+        (array_agg(user_id ORDER BY time_stamp DESC NULLS LAST, id DESC) FILTER (WHERE is_leave))[1],
+        max(time_stamp) FILTER (WHERE is_leave)
+    FROM new_rows
+    GROUP BY coalesce(guild_id, 0)
+    ON CONFLICT (guild_id) DO UPDATE SET
+        joins = s.joins + EXCLUDED.joins,
+        leaves = s.leaves + EXCLUDED.leaves,
+        last_join_user_id = CASE
+            WHEN EXCLUDED.last_join_user_id IS NOT NULL
+                AND (s.last_join_time_stamp IS NULL OR EXCLUDED.last_join_time_stamp >= s.last_join_time_stamp)
+            THEN EXCLUDED.last_join_user_id ELSE s.last_join_user_id END,
+        last_join_time_stamp = greatest(s.last_join_time_stamp, EXCLUDED.last_join_time_stamp),
+        last_leave_user_id = CASE
+            WHEN EXCLUDED.last_leave_user_id IS NOT NULL
+                AND (s.last_leave_time_stamp IS NULL OR EXCLUDED.last_leave_time_stamp >= s.last_leave_time_stamp)
+            THEN EXCLUDED.last_leave_user_id ELSE s.last_leave_user_id END,
+        last_leave_time_stamp = greatest(s.last_leave_time_stamp, EXCLUDED.last_leave_time_stamp);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS member_stats_on_insert ON member_joins_leaves;
+CREATE TRIGGER member_stats_on_insert
+    AFTER INSERT ON member_joins_leaves
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_member_stats();
@@ -0,0 +1,50 @@
+--hourly counters of messages per guild, channel and user, /message-stats reads only these tables
+
+CREATE TABLE IF NOT EXISTS message_counts_guilds
+(
+    guild_id BIGINT NOT NULL,
+    hour TIMESTAMPTZ NOT NULL,
+    messages BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS message_counts_channels
+(
+    guild_id BIGINT NOT NULL,
+    hour TIMESTAMPTZ NOT NULL,
+    channel_id BIGINT NOT NULL,
+    channel_name TEXT,
+    messages BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, hour, channel_id)
+);
+
+CREATE TABLE IF NOT EXISTS message_counts_users
+(
+    guild_id BIGINT NOT NULL,
+    hour TIMESTAMPTZ NOT NULL,
+    user_id BIGINT NOT NULL,
+    messages BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, hour, user_id)
+);
+
+--counts history logged before counters existed, rows without ids are counted after channel ids backfill
+INSERT INTO message_counts_guilds (guild_id, hour, messages)
+SELECT guild_id, date_trunc('hour', timestamp), count(*)
+FROM messages
+WHERE guild_id IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT DO NOTHING;
+
+INSERT INTO message_counts_channels (guild_id, hour, channel_id, channel_name, messages)
+SELECT guild_id, date_trunc('hour', timestamp), channel_id, max(channel_name), count(*)
+FROM messages
+WHERE guild_id IS NOT NULL AND channel_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT DO NOTHING;
+
+INSERT INTO message_counts_users (guild_id, hour, user_id, messages)
+SELECT guild_id, date_trunc('hour', timestamp), user_id, count(*)
+FROM messages
+WHERE guild_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT DO NOTHING;
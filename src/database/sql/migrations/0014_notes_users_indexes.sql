@@ -0,0 +1,8 @@
+--migrate:no-transaction
+--notes of member and members of note are looked up by these columns
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS notes_users_member_id_idx
+    ON notes_users (member_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS notes_users_note_id_idx
+    ON notes_users (note_id);
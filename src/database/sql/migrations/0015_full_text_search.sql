@@ -0,0 +1,64 @@
+--search vectors of notes and messages, 'simple' configuration is used because texts are in many languages
+--vectors are filled by triggers on insert, edits of message append new content to vector of message
+
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION notes_search_vector() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notes_search_vector_on_write ON notes;
+CREATE TRIGGER notes_search_vector_on_write
+    BEFORE INSERT OR UPDATE OF title, content ON notes
+    FOR EACH ROW
+    EXECUTE FUNCTION notes_search_vector();
+
+CREATE OR REPLACE FUNCTION messages_search_vector() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('simple', coalesce(NEW.content, ''));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+--trigger on partitioned table is cloned to every partition, also to partitions created later
+DROP TRIGGER IF EXISTS messages_search_vector_on_insert ON messages;
+CREATE TRIGGER messages_search_vector_on_insert
+    BEFORE INSERT ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION messages_search_vector();
+
+--every inserted batch of edits is added to vectors of edited messages with one update
+CREATE OR REPLACE FUNCTION messages_search_vector_on_edit() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE messages AS m
+    SET search_vector = coalesce(m.search_vector, to_tsvector('simple', coalesce(m.content, '')))
+        || to_tsvector('simple', e.after_content)
+    FROM (
+        SELECT message_id, string_agg(coalesce(after_content, ''), ' ' ORDER BY id) AS after_content
+        FROM new_rows
+        GROUP BY message_id
+    ) AS e
+    WHERE m.message_id = e.message_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS edited_messages_search_vector_on_insert ON edited_messages;
+CREATE TRIGGER edited_messages_search_vector_on_insert
+    AFTER INSERT ON edited_messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION messages_search_vector_on_edit();
+
+UPDATE notes SET search_vector =
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(content, '')), 'B');
+
+CREATE INDEX IF NOT EXISTS notes_search_vector_idx
+    ON notes USING GIN (search_vector);
@@ -0,0 +1,17 @@
+--migrate:batch
+WITH batch AS (
+    SELECT id FROM messages
+    WHERE id > %(last_id)s
+    ORDER BY id
+    LIMIT %(batch_size)s
+),
+updated AS (
+    UPDATE messages AS m
+    SET search_vector = to_tsvector('simple', coalesce(m.content, '')) || coalesce((
+        SELECT to_tsvector('simple', string_agg(coalesce(e.after_content, ''), ' ' ORDER BY e.id))
+        FROM edited_messages AS e
+        WHERE e.message_id = m.message_id
+    ), ''::TSVECTOR)
+    WHERE m.id IN (SELECT id FROM batch) AND m.search_vector IS NULL
+)
+SELECT max(id) FROM batch
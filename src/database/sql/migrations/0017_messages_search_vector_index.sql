@@ -0,0 +1,5 @@
+--index is built after backfill, building it once is faster than updating it for every backfilled row
+--index on partitioned table is created on every partition, also on partitions created later
+
+CREATE INDEX IF NOT EXISTS messages_search_vector_idx
+    ON messages USING GIN (search_vector);
@@ -0,0 +1,14 @@
+--persistent tier of ai response cache, rows are evicted by age and by least recent use over size limit
+
+CREATE TABLE IF NOT EXISTS ai_response_cache
+(
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_used TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ai_response_cache_last_used_idx
+    ON ai_response_cache (last_used);
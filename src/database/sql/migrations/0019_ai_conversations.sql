@@ -0,0 +1,14 @@
+--conversation memory of /ask, one row per user or channel conversation
+
+CREATE TABLE IF NOT EXISTS ai_conversations
+(
+    scope TEXT NOT NULL,
+    scope_id BIGINT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    turns JSONB NOT NULL DEFAULT '[]',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, scope_id)
+);
+
+CREATE INDEX IF NOT EXISTS ai_conversations_updated_at_idx
+    ON ai_conversations (updated_at);
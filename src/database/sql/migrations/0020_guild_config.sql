@@ -0,0 +1,12 @@
+--config of every guild (channels, roles, raid thresholds), before bot kept one config in config.json
+
+CREATE TABLE IF NOT EXISTS guild_config
+(
+    guild_id BIGINT PRIMARY KEY,
+    settings JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+--offline joins and leaves are reconciled per guild
+CREATE INDEX IF NOT EXISTS member_joins_leaves_guild_id_user_id_idx
+    ON member_joins_leaves (guild_id, user_id, id);
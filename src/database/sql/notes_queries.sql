@@ -1,25 +1,4 @@
---create table for notes [0]
-CREATE TABLE IF NOT EXISTS notes(
-    id SERIAL PRIMARY KEY,
-    note_id BIGINT UNIQUE,
-    author_id BIGINT,
-    title TEXT,
-    content TEXT,
-    creation_date TEXT
-);
-
---create table for notes members [1]
-CREATE TABLE IF NOT EXISTS notes_users(
-    id SERIAL PRIMARY KEY,
-    member_id BIGINT,
-    note_id BIGINT NOT NULL,
-    CONSTRAINT fk_notes
-        FOREIGN KEY (note_id)
-            REFERENCES notes(note_id)
-            ON DELETE CASCADE
-);
-
---add note [2]
+--add note [0]
 INSERT INTO notes (
     note_id, 
     author_id, 
@@ -29,18 +8,61 @@ INSERT INTO notes (
 )
 VALUES (%s,%s,%s,%s,%s);
 
---add note member [3]
+--add note member [1]
 INSERT INTO notes_users (
     member_id,
     note_id
 )
 VALUES (%s,%s);
 
---get note by id [4]
+--get note by id [2]
 SELECT * FROM notes WHERE note_id = %s;
 
---get note id by user id [5]
+--get note id by user id [3]
 SELECT * FROM notes_users WHERE member_id = %s;
 
---get note users by note id [6]
-SELECT * FROM notes WHERE note_id = %s;
\ No newline at end of file
+--get note users by note id [4]
+SELECT * FROM notes_users WHERE note_id = %s;
+
+--get note with members ids by note id [5]
+SELECT n.note_id, n.title, n.content, n.creation_date, n.author_id,
+    ARRAY(SELECT u.member_id FROM notes_users AS u WHERE u.note_id = n.note_id ORDER BY u.id)
+FROM notes AS n
+WHERE n.note_id = %s;
+
+--get notes with members ids by member id [6]
+SELECT n.note_id, n.title, n.content, n.creation_date, n.author_id,
+    ARRAY(SELECT u.member_id FROM notes_users AS u WHERE u.note_id = n.note_id ORDER BY u.id)
+FROM notes AS n
+WHERE n.note_id IN (SELECT note_id FROM notes_users WHERE member_id = %s)
+ORDER BY n.id;
+
+--get notes ids and titles by member id [7]
+SELECT n.note_id, n.title
+FROM notes AS n
+WHERE n.note_id IN (SELECT note_id FROM notes_users WHERE member_id = %s)
+ORDER BY n.id;
+
+--search member notes page [8]
+SELECT n.note_id, n.title, n.author_id, n.creation_date,
+    ts_headline('simple', coalesce(n.content, ''), q, 'MaxWords=25, MinWords=10, StartSel=**, StopSel=**'),
+    ts_rank(n.search_vector, q)::FLOAT8 AS rank
+FROM notes AS n, websearch_to_tsquery('simple', %(query)s) AS q
+WHERE n.search_vector @@ q
+    AND n.note_id IN (SELECT note_id FROM notes_users WHERE member_id = %(member_id)s)
+    AND (%(author_id)s IS NULL OR n.author_id = %(author_id)s)
+    AND (%(since)s IS NULL OR n.creation_date >= %(since)s)
+    AND (%(until)s IS NULL OR n.creation_date < %(until)s)
+    AND (%(after_rank)s IS NULL OR (ts_rank(n.search_vector, q)::FLOAT8, n.note_id) < (%(after_rank)s, %(after_note_id)s))
+ORDER BY rank DESC, n.note_id DESC
+LIMIT %(limit)s;
+
+--get notes with members ids page by member id [9]
+SELECT n.note_id, n.title, n.content, n.creation_date, n.author_id,
+    ARRAY(SELECT u.member_id FROM notes_users AS u WHERE u.note_id = n.note_id ORDER BY u.id),
+    n.id
+FROM notes AS n
+WHERE n.note_id IN (SELECT note_id FROM notes_users WHERE member_id = %(member_id)s)
+    AND (%(after_id)s IS NULL OR n.id > %(after_id)s)
+ORDER BY n.id
+LIMIT %(limit)s;
@@ -0,0 +1,17 @@
+--create monthly partition [0]
+SELECT create_monthly_partition(%s, %s);
+
+--get monthly partitions older than month [1]
+SELECT c.relname
+FROM pg_inherits AS i
+INNER JOIN pg_class AS c
+    ON c.oid = i.inhrelid
+INNER JOIN pg_class AS p
+    ON p.oid = i.inhparent
+WHERE p.relname = %s
+    AND c.relname ~ '_p\d{4}_\d{2}$'
+    AND to_date(right(c.relname, 7), 'YYYY_MM') < %s
+ORDER BY c.relname;
+
+--detach partition [2]
+ALTER TABLE {parent} DETACH PARTITION {partition};
@@ -0,0 +1,59 @@
+import hashlib
+import uuid
+from collections import defaultdict
+
+class DataVersions:
+    """
+    In-memory version counters of data sets ("members", "messages", "notes"),
+    database classes bump counter after every successful write.
+
+    Counters are used for ETags of REST API, so unchanged data is answered with 304
+    without any query. Boot id is part of every ETag, so tags from before restart never match.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex
+        self.counters = defaultdict(int)
+
+    def bump(self, *names: str):
+        """
+        Marks data sets as changed
+
+        :param names: names of data sets
+        :type names: str
+        """
+        for name in names:
+            self.counters[name] += 1
+
+    def get(self, name: str) -> int:
+        """
+        :return: current version of data set
+        :rtype: int
+        """
+        return self.counters[name]
+
+    def etag(self, names: list[str], *parts) -> str:
+        """
+        :param names: data sets that response is built from
+        :type names: list[str]
+        :param parts: anything else response depends on, for example path with query string
+        :return: strong ETag with quotes
+        :rtype: str
+        """
+        key = "|".join([self.boot_id] + [f"{name}:{self.counters[name]}" for name in names] + [str(part) for part in parts])
+        return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+_versions = None
+
+def get_versions() -> DataVersions:
+    """
+    :return: process wide version counters
+    :rtype: DataVersions
+    """
+    global _versions
+
+    if _versions is None:
+        _versions = DataVersions()
+
+    return _versions
@@ -0,0 +1,163 @@
+import asyncio
+import discord
+from datetime import datetime
+from .logging_database import Logging_Database
+from ..monitoring.metrics import QUEUE_DEPTH
+
+class WriteBehindQueue:
+    """
+    Bounded write-behind queue between message listeners and Logging_Database.
+
+    Listeners only put rows on the queue, a background task collects them into batches
+    and writes every batch with multi-row inserts. Batch is flushed when it reaches
+    batch_size rows or when its oldest row is older than max_age seconds.
+    When queue is full listeners wait for free place (backpressure).
+    """
+
+    MESSAGE = 0
+    EDIT = 1
+    DELETE = 2
+
+    def __init__(self, database: Logging_Database, *, max_size: int = 10000, batch_size: int = 500, max_age: float = 2.0):
+        """
+        :param database: database used for flushing batches
+        :type database: Logging_Database
+        :param max_size: max number of rows waiting in queue
+        :type max_size: int
+        :param batch_size: number of rows that triggers flush
+        :type batch_size: int
+        :param max_age: max time in seconds that row can wait for flush
+        :type max_age: float
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.task = None
+
+        QUEUE_DEPTH.labels(queue="messages_write").set_function(self.queue.qsize)
+
+    def start(self):
+        """
+        Starts background flushing task
+        """
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Stops background task and flushes all rows left in queue
+        """
+        if self.task is None:
+            return
+
+        #None is sentinel, everything put before it will be flushed,
+        #full queue is waited out only while task is alive to take from it
+        while not self.task.done():
+            try:
+                self.queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                await asyncio.wait({self.task}, timeout=0.1)
+
+        try:
+            await self.task
+        except Exception as e:
+            print("error: " + str(e))
+        self.task = None
+
+        #rows left by task that died are written here
+        batch = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+        if batch:
+            await self.flush(batch)
+
+    async def put_message(self, message: discord.Message, timestamp: datetime):
+        """
+        Queues new message
+
+        :param message: message to be logged
+        :type message: discord.Message
+        :param timestamp: time of sending message
+        :type timestamp: datetime
+        """
+        await self.queue.put((self.MESSAGE, (message.id, message.author.id, timestamp, message.guild.id, message.guild.name, message.channel.id, message.channel.name, message.content)))
+
+    async def put_edit(self, before: discord.Message, after: discord.Message):
+        """
+        Queues edited message
+
+        :param before: message before edit
+        :type before: discord.Message
+        :param after: message after edit
+        :type after: discord.Message
+        """
+        await self.queue.put((self.EDIT, (before.id, before.content, after.content)))
+
+    async def put_delete(self, message: discord.Message):
+        """
+        Queues deleted message
+
+        :param message: deleted message
+        :type message: discord.Message
+        """
+        await self.queue.put((self.DELETE, (message.id,)))
+
+    async def run(self):
+        """
+        Collects rows from queue into batches and flushes them until sentinel is received
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = loop.time() + self.max_age
+            stopping = False
+
+            while len(batch) < self.batch_size:
+                #takes everything that is already waiting without suspending
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self.flush(batch)
+
+            if stopping:
+                return
+
+    async def flush(self, batch: list):
+        """
+        Writes batch to database, messages go first so edits and deletes in the same
+        batch can reference them
+
+        :param batch: list of (kind, row) tuples
+        :type batch: list
+        """
+        messages = [row for kind, row in batch if kind == self.MESSAGE]
+        edits = [row for kind, row in batch if kind == self.EDIT]
+        deletes = [row for kind, row in batch if kind == self.DELETE]
+
+        if messages:
+            await self.database.add_messages_batch(messages)
+        if edits:
+            await self.database.add_edited_messages_batch(edits)
+        if deletes:
+            await self.database.add_deleted_messages_batch(deletes)
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import os
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from psycopg2.extensions import cursor as base_cursor
+
+#buckets of ai calls, responses take seconds not milliseconds
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0)
+
+LISTENER_SECONDS = Histogram(
+    "discord_listener_duration_seconds",
+    "Time spent in event listener",
+    ["listener"]
+)
+COMMAND_SECONDS = Histogram(
+    "discord_command_duration_seconds",
+    "Time from start of slash command to its end",
+    ["command", "status"]
+)
+QUERY_SECONDS = Histogram(
+    "database_query_duration_seconds",
+    "Time of named sql query, from file and comment name of query",
+    ["file", "query"]
+)
+AI_SECONDS = Histogram(
+    "ai_response_duration_seconds",
+    "Time of whole ai response",
+    ["source"],
+    buckets=AI_BUCKETS
+)
+AI_FIRST_TOKEN_SECONDS = Histogram(
+    "ai_time_to_first_token_seconds",
+    "Time to first token of model",
+    ["model"],
+    buckets=AI_BUCKETS
+)
+AI_FAILURES = Counter(
+    "ai_model_failures_total",
+    "Failed requests of model",
+    ["model"]
+)
+GATEWAY_LATENCY = Gauge(
+    "discord_gateway_latency_seconds",
+    "Latency between heartbeat and heartbeat ack of gateway shard",
+    ["shard"]
+)
+GATEWAY_EVENTS = Counter(
+    "discord_gateway_events_total",
+    "Events dispatched by bot per shard of their guild, events without guild are under shard \"none\"",
+    ["shard"]
+)
+LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Delay of event loop measured by late wake up of sleeping task"
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Number of items waiting in queue",
+    ["queue"]
+)
+
+#query text -> histogram of query, filled when sql files are loaded
+_query_timers = {}
+
+def register_queries(filename: str, queries: list[str]) -> list[str]:
+    """
+    Names queries loaded from sql file by their "--name [N]" comments, so their time is measured
+
+    :param filename: path of sql file
+    :type filename: str
+    :param queries: queries of file split on ';'
+    :type queries: list[str]
+    :return: the same queries
+    :rtype: list[str]
+    """
+    file = os.path.splitext(os.path.basename(filename))[0]
+
+    for query in queries:
+        lines = query.strip().splitlines()
+        if len(lines) < 2 or not lines[0].startswith("--"):
+            continue
+        name = lines[0][2:].split("[")[0].strip()
+        _query_timers[query] = QUERY_SECONDS.labels(file=file, query=name)
+
+    return queries
+
+def query_timer(query) -> Histogram:
+    """
+    :return: histogram of named query or None for other queries
+    :rtype: Histogram
+    """
+    return _query_timers.get(query) if type(query) is str else None
+
+class TimedCursor(base_cursor):
+    """
+    Cursor of pooled connections that measures time of named queries
+    """
+
+    def execute(self, query, vars=None):
+        timer = query_timer(query)
+        if timer is None:
+            return super().execute(query, vars)
+
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            timer.observe(time.perf_counter() - start)
+
+def timed_listener(func):
+    """
+    Measures time of event listener, used under @commands.Cog.listener() or on events of bot
+    """
+    #child is bound once, so hot path does not look up labels
+    timer = LISTENER_SECONDS.labels(listener=func.__qualname__)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            timer.observe(time.perf_counter() - start)
+
+    return wrapper
+
+async def measure_loop_lag(interval: float = 0.5):
+    """
+    Sets LOOP_LAG to how late sleeping task wakes up, runs until cancelled
+
+    :param interval: seconds between measurements
+    :type interval: float
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(max(0.0, loop.time() - start - interval))
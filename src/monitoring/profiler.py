@@ -0,0 +1,234 @@
+import asyncio
+import asyncio.events
+import inspect
+import os
+import signal
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+@dataclass
+class ProfileResult:
+    """
+    Result of profiling session
+
+    :param stacks: collapsed stacks ("frame;frame;frame") and number of samples of every stack
+    :type stacks: Counter
+    :param tasks: task or callback label -> [wall seconds, cpu seconds, steps] spent on event loop
+    :type tasks: dict
+    :param samples: number of taken samples
+    :type samples: int
+    :param duration: length of session in seconds
+    :type duration: float
+    :param interval: seconds between samples
+    :type interval: float
+    """
+    stacks: Counter
+    tasks: dict
+    samples: int
+    duration: float
+    interval: float
+
+class Profiler:
+    """
+    Sampling profiler with asyncio task tracing, turned on only for time of profiling session.
+
+    Stack of event loop thread is sampled every interval seconds of wall time by SIGALRM timer,
+    handler runs in loop thread between bytecodes, so samples are not biased by GIL like samples
+    taken from other thread. Where timer signals are not available (Windows, loop outside main thread)
+    sampling thread is used instead. Every sample is prefixed with task running at that moment,
+    so flamegraph is split per coroutine, idle loop is sampled as "idle".
+    Every step of every task is timed with wall and cpu time of loop thread by wrapping
+    asyncio.events.Handle._run. Timer, handler and wrapper are removed when session ends,
+    so profiler costs nothing when off.
+    """
+
+    #only one session can patch event loop at once
+    active = None
+
+    MAX_DEPTH = 128
+
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: seconds between samples
+        :type interval: float
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.tasks = defaultdict(lambda: [0.0, 0.0, 0])
+        self.samples = 0
+        #label of task running on event loop, read by sampling thread
+        self.current = None
+        self.labels = weakref.WeakKeyDictionary()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.original_run = None
+        self.original_handler = None
+        self.loop_thread_id = None
+        self.started = 0.0
+
+    def start(self):
+        """
+        Starts session, must be called from event loop thread
+
+        :raises RuntimeError: when other session is running
+        """
+        if Profiler.active is not None:
+            raise RuntimeError("profiler is already running")
+        Profiler.active = self
+
+        self.loop_thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.original_run = asyncio.events.Handle._run
+        profiler = self
+        original_run = self.original_run
+
+        def run(handle):
+            label = profiler.label(handle._callback)
+            profiler.current = label
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                return original_run(handle)
+            finally:
+                stats = profiler.tasks[label]
+                stats[0] += time.perf_counter() - wall
+                stats[1] += time.thread_time() - cpu
+                stats[2] += 1
+                profiler.current = None
+
+        asyncio.events.Handle._run = run
+
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.original_handler = signal.signal(signal.SIGALRM, lambda signum, frame: self.record(frame))
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        else:
+            self.thread = threading.Thread(target=self.sample, name="profiler", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> ProfileResult:
+        """
+        Stops session and restores event loop
+
+        :return: result of session
+        :rtype: ProfileResult
+        """
+        if self.thread is None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.original_handler)
+        else:
+            self.stopped.set()
+            self.thread.join()
+        asyncio.events.Handle._run = self.original_run
+        Profiler.active = None
+
+        return ProfileResult(
+            stacks=self.stacks,
+            tasks=dict(self.tasks),
+            samples=self.samples,
+            duration=time.perf_counter() - self.started,
+            interval=self.interval
+        )
+
+    async def profile(self, seconds: float) -> ProfileResult:
+        """
+        Profiles bot for given time
+
+        :param seconds: length of session
+        :type seconds: float
+        :return: result of session
+        :rtype: ProfileResult
+        """
+        self.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            result = self.stop()
+        return result
+
+    def label(self, callback) -> str:
+        """
+        :return: label of task that callback steps, or name of plain callback
+        :rtype: str
+        """
+        task = getattr(callback, "__self__", None)
+        if not isinstance(task, asyncio.Task):
+            return "callback " + getattr(callback, "__qualname__", type(callback).__name__)
+
+        label = self.labels.get(task)
+        if label is None:
+            label = self.labels[task] = self.task_label(task)
+        return label
+
+    @staticmethod
+    def task_label(task: asyncio.Task) -> str:
+        """
+        :return: qualified name of coroutine of task, for discord.py events name of listener
+        :rtype: str
+        """
+        coro = task.get_coro()
+        label = getattr(coro, "__qualname__", type(coro).__name__)
+
+        #discord.py runs every listener inside Client._run_event, its "coro" argument is listener function,
+        #timed_listener wraps it with functools.wraps, so original function is read from __wrapped__
+        frame = getattr(coro, "cr_frame", None)
+        listener = frame.f_locals.get("coro") if frame is not None else None
+        if callable(listener):
+            label = getattr(inspect.unwrap(listener), "__qualname__", label)
+        if not task.get_name().startswith("Task-"):
+            label += f" [{task.get_name()}]"
+        return label
+
+    def record(self, frame):
+        """
+        Adds sample of loop thread stack, prefixed with running task
+        """
+        stack = []
+        while frame is not None and len(stack) < self.MAX_DEPTH:
+            code = frame.f_code
+            stack.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(self.current or "idle")
+        stack.reverse()
+
+        self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def sample(self):
+        """
+        Body of sampling thread used when timer signals are not available
+        """
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self.record(frame)
+
+    @staticmethod
+    def write(result: ProfileResult, path: str) -> list[str]:
+        """
+        Writes collapsed stacks (flamegraph.pl, speedscope) to path.folded
+        and wall and cpu time of tasks to path.txt
+
+        :param result: result of session
+        :type result: ProfileResult
+        :param path: path without extension
+        :type path: str
+        :return: paths of written files
+        :rtype: list[str]
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(path + ".folded", 'w', encoding="UTF-8") as file:
+            for stack, count in result.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        with open(path + ".txt", 'w', encoding="UTF-8") as file:
+            file.write(f"duration {result.duration:.1f} s, {result.samples} samples every {result.interval * 1000:.0f} ms\n\n")
+            file.write(f"{'wall ms':>10} {'cpu ms':>10} {'steps':>8}  task\n")
+            for label, (wall, cpu, steps) in sorted(result.tasks.items(), key=lambda item: item[1][0], reverse=True):
+                file.write(f"{wall * 1000:10.1f} {cpu * 1000:10.1f} {steps:8d}  {label}\n")
+
+        return [path + ".folded", path + ".txt"]
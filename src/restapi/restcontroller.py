@@ -1,33 +1,447 @@
-import flask
-from flask import Flask
-import threading
-from werkzeug.serving import make_server
+import base64
+import binascii
+import hmac
+import ipaddress
+import json
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from ..database.logging_database import Logging_Database
+from ..database.notes_database import Note, Notes_Database
+from ..database.versions import DataVersions, get_versions
 
 class APIController():
-    def __init__(self):
-        self.app = Flask(__name__)
-        
-
-    def run(self):
-        self.server = make_server("127.0.0.1", 5000, self.app)
-        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
-        self.thread.start()
-        print("✅ Flask server started on http://127.0.0.1:5000")
-
-    def stop(self):
-            if self.server:
-                self.server.shutdown()
-                self.thread.join()
-                print("❌ Flask server stopped.")
-
-
-
-if __name__ == "__main__":
-    flask_app = APIController()
-    flask_app.run()
-    try:
-        while True:
-            pass  # Keep the script running
-    except KeyboardInterrupt:
-        print("\nStopping Flask app...")
-        flask_app.stop()
\ No newline at end of file
+    """
+    Read-only REST API for dashboards and Prometheus metrics on /metrics, served by aiohttp
+    inside event loop of bot, so handlers use the same database pool as cogs and never block.
+
+    Lists are paginated with opaque cursor: response has "items" and "next_cursor",
+    next page is requested with ?cursor=<next_cursor>. Every response has ETag built from
+    in-memory versions of data it was read from, request with matching If-None-Match
+    gets 304 without any database query. Failed database read is answered with 503 without ETag,
+    so error is never cached as valid empty result. Discord ids are sent as strings like in API of discord,
+    they are bigger than 2^53 and would lose precision as json numbers in javascript.
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    def __init__(self, *, logging: bool = True, notes: bool = True, host: str = "127.0.0.1", port: int = 5000,
+                 token: str = None, versions: DataVersions = None):
+        """
+        :param logging: if members, messages and stats routes are served
+        :type logging: bool
+        :param notes: if notes routes are served
+        :type notes: bool
+        :param host: address to listen on
+        :type host: str
+        :param port: port to listen on
+        :type port: int
+        :param token: when set, requests need "Authorization: Bearer <token>" header,
+            required when host is not loopback address
+        :type token: str
+        :param versions: data versions used for ETags, process wide versions by default
+        :type versions: DataVersions
+        :raises ValueError: when token is not set and host is not loopback address
+        """
+        if not token and not self.is_loopback(host):
+            raise ValueError(f"REST API on {host} needs API_TOKEN, without it messages and notes would be public")
+
+        self.host = host
+        self.port = port
+        self.token = token
+        self.versions = versions if versions is not None else get_versions()
+        self.runner = None
+
+        self.app = web.Application(middlewares=[self.errors_middleware])
+        routes = [web.get("/metrics", self.get_metrics)]
+
+        if logging:
+            self.logging_db = Logging_Database(raise_errors=True)
+            routes += [
+                web.get("/api/members", self.get_members),
+                web.get("/api/joins-leaves", self.get_joins_leaves),
+                web.get("/api/messages", self.get_messages),
+                web.get("/api/messages/search", self.search_messages),
+                web.get("/api/guilds/{guild_id}/member-stats", self.get_member_stats),
+                web.get("/api/guilds/{guild_id}/message-stats", self.get_message_stats)
+            ]
+
+        if notes:
+            self.notes_db = Notes_Database(raise_errors=True)
+            routes += [
+                web.get("/api/members/{user_id}/notes", self.get_member_notes),
+                web.get("/api/notes/{note_id}", self.get_note)
+            ]
+
+        self.app.add_routes(routes)
+
+    async def start(self):
+        """
+        Starts server on running event loop
+        """
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"REST API started on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        """
+        Stops server and waits for running requests
+        """
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+            print("REST API stopped")
+
+    @staticmethod
+    def is_loopback(host: str) -> bool:
+        """
+        :return: if host is reachable only from this machine
+        :rtype: bool
+        """
+        if host == "localhost":
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+
+    @web.middleware
+    async def errors_middleware(self, request: web.Request, handler):
+        """
+        Checks token and returns errors as json
+        """
+        #constant time comparison, so token can not be guessed from response times
+        if self.token and not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode("utf-8"),
+            f"Bearer {self.token}".encode("utf-8")
+        ):
+            return web.json_response({"error": "unauthorized"}, status=401)
+
+        try:
+            return await handler(request)
+        except web.HTTPException as e:
+            if e.status < 400:
+                raise
+            return web.json_response({"error": e.reason}, status=e.status)
+
+    @staticmethod
+    def snowflake(value: int) -> str:
+        """
+        :return: discord id as string, None stays None
+        :rtype: str
+        """
+        return None if value is None else str(value)
+
+    def note_json(self, note: Note) -> dict:
+        """
+        :return: note as json object with ids of discord users as strings
+        :rtype: dict
+        """
+        return {
+            **note.__dict__,
+            "author_id": self.snowflake(note.author_id),
+            "members_ids": [self.snowflake(member_id) for member_id in note.members_ids or []]
+        }
+
+    @staticmethod
+    def to_json(data) -> str:
+        return json.dumps(data, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+    async def conditional(self, request: web.Request, names: list[str], build, *parts) -> web.Response:
+        """
+        Answers with 304 when If-None-Match matches current ETag, otherwise builds response
+
+        :param request: request
+        :type request: web.Request
+        :param names: data sets response is read from
+        :type names: list[str]
+        :param build: async function returning json serializable data, raising when database read failed
+        :type build: Callable
+        :param parts: anything else response depends on
+        :return: response
+        :rtype: web.Response
+        """
+        etag = self.versions.etag(names, request.path_qs, *parts)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+            return web.Response(status=304, headers=headers)
+
+        try:
+            data = await build()
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            print("error: " + str(e))
+            return web.json_response({"error": "database unavailable"}, status=503, headers={"Cache-Control": "no-store"})
+
+        return web.json_response(data, headers=headers, dumps=self.to_json)
+
+    @staticmethod
+    def encode_cursor(key) -> str:
+        """
+        :param key: key of next page, tuple or single value
+        :return: url safe cursor or None when there is no next page
+        :rtype: str
+        """
+        if key is None:
+            return None
+        values = list(key) if isinstance(key, tuple) else [key]
+        data = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(request: web.Request, *types) -> tuple:
+        """
+        :param request: request with optional cursor parameter
+        :type request: web.Request
+        :param types: type of every value of cursor, int, float or datetime
+        :return: key of page or None for first page
+        :rtype: tuple
+        :raises web.HTTPBadRequest: when cursor is malformed
+        """
+        cursor = request.query.get("cursor")
+        if not cursor:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            if len(values) != len(types):
+                raise ValueError("wrong cursor length")
+            return tuple(
+                datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+                for value_type, value in zip(types, values)
+            )
+        except (ValueError, TypeError, binascii.Error):
+            raise web.HTTPBadRequest(reason="invalid cursor")
+
+    def limit(self, request: web.Request) -> int:
+        """
+        :return: page size from limit parameter, at most MAX_LIMIT
+        :rtype: int
+        """
+        return min(self.int_param(request, "limit", self.DEFAULT_LIMIT), self.MAX_LIMIT)
+
+    @staticmethod
+    def int_param(request: web.Request, name: str, default: int = None) -> int:
+        """
+        :return: positive integer parameter from query string or path
+        :rtype: int
+        :raises web.HTTPBadRequest: when value is not positive integer
+        """
+        value = request.match_info.get(name, request.query.get(name))
+        if value is None or value == "":
+            return default
+        if not value.isdigit() or int(value) < 1:
+            raise web.HTTPBadRequest(reason=f"{name} must be positive integer")
+        return int(value)
+
+    @staticmethod
+    def datetime_param(request: web.Request, name: str) -> datetime:
+        """
+        :return: ISO 8601 time from query string, UTC when time zone is not given
+        :rtype: datetime
+        :raises web.HTTPBadRequest: when value is not valid time
+        """
+        value = request.query.get(name)
+        if not value:
+            return None
+        try:
+            result = datetime.fromisoformat(value)
+        except ValueError:
+            raise web.HTTPBadRequest(reason=f"{name} must be ISO 8601 time")
+        return result if result.tzinfo is not None else result.replace(tzinfo=timezone.utc)
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        """
+        Metrics in Prometheus text format
+        """
+        return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    async def get_members(self, request: web.Request) -> web.Response:
+        guild_id = self.int_param(request, "guild_id")
+        if guild_id is None:
+            raise web.HTTPBadRequest(reason="guild_id is required")
+
+        after = self.decode_cursor(request, int)
+        limit = self.limit(request)
+
+        async def build():
+            rows, next_key = await self.logging_db.get_members_page(guild_id, after=after[0] if after else None, page_size=limit)
+            return {
+                "items": [{"user_id": self.snowflake(user_id), "username": username} for user_id, username in rows],
+                "next_cursor": self.encode_cursor(next_key)
+            }
+
+        return await self.conditional(request, ["members"], build)
+
+    async def get_joins_leaves(self, request: web.Request) -> web.Response:
+        guild_id = self.int_param(request, "guild_id")
+        user_id = self.int_param(request, "user_id")
+        after = self.decode_cursor(request, int)
+        limit = self.limit(request)
+
+        async def build():
+            rows, next_key = await self.logging_db.get_joins_leaves_page(
+                guild_id=guild_id,
+                user_id=user_id,
+                after=after[0] if after else None,
+                page_size=limit
+            )
+            return {
+                "items": [
+                    {
+                        "user_id": self.snowflake(user_id),
+                        "guild_id": self.snowflake(guild_id),
+                        "time_stamp": time_stamp,
+                        "is_join": is_join,
+                        "is_leave": is_leave
+                    }
+                    for _, user_id, guild_id, time_stamp, is_join, is_leave in rows
+                ],
+                "next_cursor": self.encode_cursor(next_key)
+            }
+
+        return await self.conditional(request, ["members"], build)
+
+    async def get_messages(self, request: web.Request) -> web.Response:
+        guild_id = self.int_param(request, "guild_id")
+        channel_id = self.int_param(request, "channel_id")
+        user_id = self.int_param(request, "user_id")
+        since = self.datetime_param(request, "since")
+        until = self.datetime_param(request, "until")
+        after = self.decode_cursor(request, datetime, int)
+        limit = self.limit(request)
+
+        async def build():
+            rows, next_key = await self.logging_db.get_logs_page(
+                guild_id=guild_id,
+                channel_id=channel_id,
+                user_id=user_id,
+                since=since,
+                until=until,
+                after=after,
+                page_size=limit
+            )
+            return {
+                "items": [
+                    {
+                        "timestamp": timestamp,
+                        "message_id": self.snowflake(message_id),
+                        "user_id": self.snowflake(user_id),
+                        "guild_id": self.snowflake(guild_id),
+                        "channel_id": self.snowflake(channel_id),
+                        "channel_name": channel_name,
+                        "content": content
+                    }
+                    for timestamp, message_id, user_id, guild_id, channel_id, channel_name, content in rows
+                ],
+                "next_cursor": self.encode_cursor(next_key)
+            }
+
+        return await self.conditional(request, ["messages"], build)
+
+    async def search_messages(self, request: web.Request) -> web.Response:
+        query = request.query.get("q")
+        guild_id = self.int_param(request, "guild_id")
+        if not query or guild_id is None:
+            raise web.HTTPBadRequest(reason="q and guild_id are required")
+
+        user_id = self.int_param(request, "user_id")
+        channel_id = self.int_param(request, "channel_id")
+        since = self.datetime_param(request, "since")
+        until = self.datetime_param(request, "until")
+        after = self.decode_cursor(request, float, datetime, int)
+        limit = self.limit(request)
+
+        async def build():
+            rows, next_key = await self.logging_db.search_messages(
+                query,
+                guild_id,
+                user_id=user_id,
+                channel_id=channel_id,
+                since=since,
+                until=until,
+                after=after,
+                page_size=limit
+            )
+            return {
+                "items": [
+                    {
+                        "timestamp": timestamp,
+                        "message_id": self.snowflake(message_id),
+                        "user_id": self.snowflake(user_id),
+                        "channel_id": self.snowflake(channel_id),
+                        "content": content,
+                        "rank": rank
+                    }
+                    for timestamp, message_id, user_id, channel_id, content, rank in rows
+                ],
+                "next_cursor": self.encode_cursor(next_key)
+            }
+
+        return await self.conditional(request, ["messages"], build)
+
+    async def get_member_stats(self, request: web.Request) -> web.Response:
+        guild_id = self.int_param(request, "guild_id")
+
+        async def build():
+            stats = await self.logging_db.get_member_stats(guild_id)
+            return {
+                **stats.__dict__,
+                "last_join_user_id": self.snowflake(stats.last_join_user_id),
+                "last_leave_user_id": self.snowflake(stats.last_leave_user_id)
+            }
+
+        return await self.conditional(request, ["members"], build)
+
+    async def get_message_stats(self, request: web.Request) -> web.Response:
+        guild_id = self.int_param(request, "guild_id")
+        hours = min(self.int_param(request, "hours", 24), 8760)
+
+        #counts are hourly, window moves once per hour
+        until = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        since = until - timedelta(hours=hours)
+
+        async def build():
+            stats = await self.logging_db.get_message_stats(guild_id, since, until)
+            return {
+                "since": since,
+                "until": until,
+                "total": sum(messages for hour, messages in stats.hourly if hour >= since),
+                "top_channels": [
+                    {"channel_id": self.snowflake(channel_id), "channel_name": channel_name, "messages": messages}
+                    for channel_id, channel_name, messages in stats.top_channels
+                ],
+                "top_users": [{"user_id": self.snowflake(user_id), "messages": messages} for user_id, messages in stats.top_users],
+                "hourly": [{"hour": hour, "messages": messages} for hour, messages in stats.hourly if hour >= since]
+            }
+
+        return await self.conditional(request, ["messages"], build, until)
+
+    async def get_member_notes(self, request: web.Request) -> web.Response:
+        user_id = self.int_param(request, "user_id")
+        after = self.decode_cursor(request, int)
+        limit = self.limit(request)
+
+        async def build():
+            notes, next_key = await self.notes_db.get_member_notes_page(user_id, after=after[0] if after else None, page_size=limit)
+            return {
+                "items": [self.note_json(note) for note in notes],
+                "next_cursor": self.encode_cursor(next_key)
+            }
+
+        return await self.conditional(request, ["notes"], build)
+
+    async def get_note(self, request: web.Request) -> web.Response:
+        note_id = self.int_param(request, "note_id")
+
+        async def build():
+            note = await self.notes_db.get_note_by_id(note_id)
+            if note is None:
+                raise web.HTTPNotFound(reason="note not found")
+            return self.note_json(note)
+
+        return await self.conditional(request, ["notes"], build)